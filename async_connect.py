@@ -0,0 +1,220 @@
+'''
+asyncio counterpart of oanda.connect.Connect. HTTP connections
+are pooled and reused per host, and the number of requests in flight
+for each host is capped, so that the candle requests of many
+trades can be awaited at the same time.
+
+The requests are blocking http.client calls run in the loop's default
+executor, so the concurrency comes from the executor threads (capped by
+'max_per_host' for each event loop using the AsyncConnect) and not from
+non-blocking sockets. The connection pool is shared by the threads and
+is protected by a lock. Candles keep the 'time' string returned by the
+API, as the ones returned by Connect.query, so both can be mixed in
+CANDLE_CACHE
+'''
+import asyncio
+import http.client
+import json
+import logging
+import threading
+import weakref
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from candle_source import align_candles, truncate_window, window_end
+from candle_cache import CANDLE_CACHE
+from instrumentation import STATS
+from utils import candle_time, periodToDelta
+from config import CONFIG
+
+# create logger
+ac_logger = logging.getLogger(__name__)
+ac_logger.setLevel(logging.INFO)
+
+class AsyncConnect(object):
+    '''
+    Class representing a pool of connections to the
+    OANDA REST API (/v1/candles)
+
+    Class variables
+    ---------------
+    url : str, Optional
+          Url of the candles endpoint. Default: [oanda_api] url
+    max_per_host : int, Optional
+                   Max number of requests in flight (and of pooled
+                   connections) per host and event loop. Default: 8
+    token : str, Optional
+            Access token sent as 'Authorization: Bearer <token>'.
+            Default: [oanda_api] token
+    timeout : int, Optional
+              Timeout in seconds for each request. Default: 30
+    '''
+
+    def __init__(self, url=None, max_per_host=8, token=None, timeout=30):
+        self.url = url if url is not None else CONFIG.get('oanda_api', 'url')
+        self.max_per_host = max_per_host
+        self.token = token if token is not None else CONFIG.get('oanda_api', 'token', fallback=None)
+        if not self.token:
+            raise ValueError("No access token for the OANDA API. Set [oanda_api] token "
+                             "or the 'token' argument")
+        self.timeout = timeout
+        self._pools = defaultdict(list)
+        self._lock = threading.Lock()
+        # event loop => {host: Semaphore}, as a Semaphore
+        # can only be used by one event loop
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        '''
+        Close all the pooled connections
+        '''
+        with self._lock:
+            for pool in self._pools.values():
+                for conn in pool:
+                    conn.close()
+            self._pools.clear()
+
+    def _semaphore(self, host):
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if host not in semaphores:
+            semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return semaphores[host]
+
+    def _new_connection(self, parts):
+        if parts.scheme == 'https':
+            return http.client.HTTPSConnection(parts.netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(parts.netloc, timeout=self.timeout)
+
+    def _request(self, parts, path):
+        '''
+        Blocking GET request using a pooled connection.
+        It is run in the loop's executor
+        '''
+        with self._lock:
+            pool = self._pools[parts.netloc]
+            conn = pool.pop() if pool else None
+        if conn is None:
+            conn = self._new_connection(parts)
+        headers = {'Connection': 'keep-alive',
+                   'Authorization': 'Bearer {0}'.format(self.token)}
+        try:
+            conn.request('GET', path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            raise
+        if resp.status != 200:
+            conn.close()
+            raise Exception("Request {0} failed with status {1}: {2}".format(path, resp.status, body))
+        with self._lock:
+            self._pools[parts.netloc].append(conn)
+        return json.loads(body)
+
+    async def query(self, instrument, granularity, start, end=None, count=None):
+        '''
+        Fetch candles from the API
+
+        Parameters
+        ----------
+        instrument : str, Required
+                     i.e. AUD_USD
+        granularity : str, Required
+                      i.e. D, H12, ...
+        start : datetime, Required
+        end : datetime, Optional
+        count : int, Optional
+
+        Returns
+        -------
+        dict with the same shape as the one returned by Connect.query
+        '''
+        params = {'instrument': instrument,
+                  'granularity': granularity,
+                  'candleFormat': 'bidask',
+                  'start': start.isoformat(),
+                  'alignmentTimezone': CONFIG.get('oanda_api', 'alignmentTimezone'),
+                  'dailyAlignment': CONFIG.get('oanda_api', 'dailyAlignment')}
+        if end is not None:
+            params['end'] = end.isoformat()
+        if count is not None:
+            params['count'] = count
+
+        parts = urlsplit(self.url)
+        path = "{0}?{1}".format(parts.path, urlencode(params))
+        async with self._semaphore(parts.netloc):
+            ac_logger.debug("Fetching: {0}".format(path))
+            loop = asyncio.get_running_loop()
+            with STATS.timer('api_query'):
+                resp = await loop.run_in_executor(None, self._request, parts, path)
+        STATS.count('api_queries')
+        STATS.count('candles_fetched', len(resp['candles']))
+
+        return resp
+
+    async def fetch_range(self, instrument, granularity, start, end):
+        '''
+        Fetch all the candles in a time range. The range is split
+        in chunks of [trade] chunk_size candles that are requested
+        concurrently
+
+        Parameters
+        ----------
+        instrument : str, Required
+        granularity : str, Required
+        start : datetime, Required
+        end : datetime, Required
+
+        Returns
+        -------
+        list with candles sorted by time
+        '''
+        cached = CANDLE_CACHE.lookup(instrument, granularity, start, end)
+        if cached is not None:
+            return cached
+
+        chunk = periodToDelta(CONFIG.getint('trade', 'chunk_size'), granularity)
+        bounds = []
+        cstart = start
+        while cstart < end:
+            cend = min(cstart + chunk, end)
+            bounds.append((cstart, cend))
+            cstart = cend
+
+        responses = await asyncio.gather(*[self.query(instrument, granularity, s, end=e)
+                                           for s, e in bounds])
+        candles = []
+        for res in responses:
+            for c in res['candles']:
+                # chunk boundaries can return the same candle twice
+                if candles and candle_time(c) <= candle_time(candles[-1]):
+                    continue
+                candles.append(c)
+        CANDLE_CACHE.put(instrument, granularity, start, end, candles)
+
+        return [dict(c) for c in candles]
+
+    async def fetch_window(self, instrument, granularity, date_list):
+        '''
+        Async version of candle_source.fetch_window
+
+        Parameters
+        ----------
+        instrument : str, Required
+        granularity : str, Required
+        date_list : list with datetimes sorted, Required
+
+        Returns
+        -------
+        list with one candle per datetime in date_list (truncated at
+        the end of the candles available, see candle_source.truncate_window)
+        '''
+        candles = await self.fetch_range(instrument, granularity, date_list[0],
+                                         window_end(date_list, granularity))
+        return truncate_window(align_candles(date_list, candles))
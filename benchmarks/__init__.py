@@ -0,0 +1,16 @@
+'''
+Offline benchmarks. Candles are generated by a synthetic market
+(see test/synthetic.py, shared with the tests) served through a stub
+of oanda.connect.Connect, so the results do not depend on the network
+or on live data
+'''
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (os.path.join(ROOT, 'test'), ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+# config.py reads the settings file when it is imported
+os.environ.setdefault('CONFIG_FILE', os.path.join(ROOT, 'data', 'settings.ini'))
@@ -0,0 +1,320 @@
+'''
+Offline benchmark suite. Synthetic journals (see test/synthetic.py)
+are run with the candles served by StubConnect, and the throughput (items
+per second) and the peak memory (tracemalloc) of each case are reported
+and compared against a saved baseline
+
+Usage (from the repository root):
+
+    python -m benchmarks.run_benchmarks --sizes 100,10000,100000 \
+        --output results.json --baseline benchmarks/baseline.json
+
+    # store the results as the new baseline
+    python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+
+The exit status is 1 if any case is slower (or uses more
+memory) than the baseline by more than --tolerance
+'''
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from synthetic import StubConnect, stub_connect, make_journal
+
+import trade_utils
+from candle_cache import CANDLE_CACHE
+from indicators import INDICATORS
+from trade_journal import TradeJournal
+
+WORKSHEET = 'trading_journal'
+SIZES = [100, 10000, 100000]
+# trade_utils features benchmarked
+FEATURES = ['is_entry_onrsi', 'get_lasttime', 'get_max_min_rsi',
+            'calc_trade_session', 'calc_pips_c_trend', 'calc_adr']
+MODES = ['candle', 'bulk', 'vectorized']
+GROUPS = ['journal_load', 'fetch_trades', 'run_trade', 'win_rate', 'feature', 'write_tradelist']
+
+def reset():
+    '''
+    Function to clear the process-wide caches, so
+    each case starts from the same state
+    '''
+    CANDLE_CACHE.clear()
+    INDICATORS.clear()
+    StubConnect.reset()
+
+def measure(setup, memory=True):
+    '''
+    Function to run a benchmark case
+
+    Parameters
+    ----------
+    setup : function, Required
+            Function (not measured) returning the function that is
+            measured. The latter returns the number of items processed
+    memory : bool, Optional
+             If True, then the case is run a second time under tracemalloc
+             to get the peak memory. It is not done in the timed run, as
+             tracemalloc slows down the allocations. Default: True
+
+    Returns
+    -------
+    dict with items, seconds, throughput (items/second), queries
+    (StubConnect queries) and peak_mb (if 'memory' is True)
+    '''
+    reset()
+    run = setup()
+    start = time.perf_counter()
+    items = run()
+    seconds = time.perf_counter()-start
+    res = {'items': items,
+           'seconds': round(seconds, 4),
+           'throughput': round(items/seconds, 2) if seconds > 0 else float('inf'),
+           'queries': StubConnect.queries}
+    if memory is True:
+        reset()
+        run = setup()
+        tracemalloc.start()
+        try:
+            run()
+            (_, peak) = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        res['peak_mb'] = round(peak/2**20, 2)
+
+    return res
+
+def journal_path(workdir, n, seed=0):
+    '''
+    Function to get the path of the synthetic journal with 'n'
+    trades. It is generated if it does not exist in 'workdir'
+    '''
+    url = os.path.join(workdir, "journal_{0}_{1}.xlsx".format(n, seed))
+    if not os.path.exists(url):
+        make_journal(url, n, seed=seed)
+    return url
+
+def quiet(func, *args, **kwargs):
+    # TradeJournal.win_rate prints its results
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+def journal_cases(url, n, workdir, mode='vectorized'):
+    '''
+    Generator of the (name, setup) cases run on a whole journal
+    '''
+    def load():
+        def run():
+            TradeJournal(url, WORKSHEET, cache=False)
+            return n
+        return run
+    yield "journal_load[{0}]".format(n), load
+
+    def fetch_trades():
+        tj = TradeJournal(url, WORKSHEET, cache=False)
+        return lambda: len(tj.fetch_trades())
+    yield "fetch_trades[{0}]".format(n), fetch_trades
+
+    def win_rate():
+        tj = TradeJournal(url, WORKSHEET, cache=False)
+        def run():
+            quiet(tj.win_rate, 'counter', mode=mode)
+            return n
+        return run
+    yield "win_rate[{0}]".format(n), win_rate
+
+    def write_tradelist():
+        copy = os.path.join(workdir, "write_{0}.xlsx".format(n))
+        shutil.copyfile(url, copy)
+        tj = TradeJournal(copy, WORKSHEET, cache=False)
+        trades = tj.fetch_trades()
+        def run():
+            tj.write_tradelist(trades, 'benchmark')
+            return len(trades)
+        return run
+    yield "write_tradelist[{0}]".format(n), write_tradelist
+
+def trade_cases(url, sample):
+    '''
+    Generator of the (name, setup) cases run on
+    each of the first 'sample' trades of a journal
+    '''
+    def trades():
+        return TradeJournal(url, WORKSHEET, cache=False).fetch_trades()[:sample]
+
+    for mode in MODES:
+        def run_trade(mode=mode):
+            sel = trades()
+            def run():
+                for t in sel:
+                    t.run_trade(expires=2, mode=mode)
+                return len(sel)
+            return run
+        yield "run_trade[{0}]".format(mode), run_trade
+
+    for name in FEATURES:
+        def feature(func=getattr(trade_utils, name)):
+            sel = trades()
+            def run():
+                for t in sel:
+                    func(t)
+                return len(sel)
+            return run
+        yield "feature[{0}]".format(name), feature
+
+def run_benchmarks(sizes=None, groups=None, sample=50, mode='vectorized',
+                   workdir=None, memory=True):
+    '''
+    Function to run the benchmark cases
+
+    Parameters
+    ----------
+    sizes : list, Optional
+            Number of trades of the synthetic journals. Default: SIZES
+    groups : list, Optional
+             Cases to run (see GROUPS). Default: all
+    sample : int, Optional
+             Number of trades used by the per-trade
+             cases (run_trade and feature). Default: 50
+    mode : str, Optional
+           Trade.run_trade mode used by win_rate. Default: 'vectorized'
+    workdir : str, Optional
+              Directory for the synthetic journals. Default: a temporary
+              directory removed at the end
+    memory : bool, Optional
+             See 'measure'. Default: True
+
+    Returns
+    -------
+    dict with 'meta' and 'cases' (case name => see 'measure')
+    '''
+    sizes = sizes or SIZES
+    groups = groups or GROUPS
+    tmpdir = None
+    if workdir is None:
+        workdir = tmpdir = tempfile.mkdtemp(prefix='tj_bench_')
+
+    results = {'meta': {'date': datetime.now().isoformat(timespec='seconds'),
+                        'python': platform.python_version(),
+                        'platform': platform.platform(),
+                        'sizes': sizes,
+                        'sample': sample,
+                        'mode': mode},
+               'cases': {}}
+    try:
+        with stub_connect():
+            cases = []
+            for n in sizes:
+                cases.extend(journal_cases(journal_path(workdir, n), n, workdir, mode=mode))
+            cases.extend(trade_cases(journal_path(workdir, max(sample, min(sizes))), sample))
+            for name, setup in cases:
+                if name.split('[')[0] not in groups:
+                    continue
+                res = measure(setup, memory=memory)
+                results['cases'][name] = res
+                print(format_result(name, res))
+                sys.stdout.flush()
+    finally:
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return results
+
+def format_result(name, res):
+    line = "{0:<32} {1:>10.3f}s {2:>12.1f} items/s {3:>8} queries".format(
+        name, res['seconds'], res['throughput'], res['queries'])
+    if 'peak_mb' in res:
+        line += " {0:>9.2f} MB peak".format(res['peak_mb'])
+    return line
+
+def compare(results, baseline, tolerance=0.2):
+    '''
+    Function to compare the results against a baseline
+
+    Parameters
+    ----------
+    results : dict, Required
+              Returned by 'run_benchmarks'
+    baseline : dict, Required
+               Results of a previous run
+    tolerance : float, Optional
+                Fraction of throughput loss (or of peak memory
+                increase) allowed. Default: 0.2
+
+    Returns
+    -------
+    list with a message for each regression
+    '''
+    regressions = []
+    for name, res in results['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None:
+            continue
+        if res['throughput'] < base['throughput']*(1-tolerance):
+            regressions.append("{0}: throughput {1} items/s (baseline: {2})".format(
+                name, res['throughput'], base['throughput']))
+        if 'peak_mb' in res and 'peak_mb' in base and \
+                res['peak_mb'] > base['peak_mb']*(1+tolerance):
+            regressions.append("{0}: peak memory {1} MB (baseline: {2})".format(
+                name, res['peak_mb'], base['peak_mb']))
+
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the trade journal")
+    parser.add_argument('--sizes', default=",".join(str(n) for n in SIZES),
+                        help="Comma-separated list of journal sizes. Default: %(default)s")
+    parser.add_argument('--cases', default=",".join(GROUPS),
+                        help="Comma-separated list of cases. Default: %(default)s")
+    parser.add_argument('--sample', type=int, default=50,
+                        help="Trades used by the run_trade and feature cases. Default: %(default)s")
+    parser.add_argument('--mode', default='vectorized', choices=MODES,
+                        help="run_trade mode used by win_rate. Default: %(default)s")
+    parser.add_argument('--workdir', help="Directory for the synthetic journals (reused across runs)")
+    parser.add_argument('--no-memory', action='store_true', help="Do not measure the peak memory")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Compare the results against this JSON file")
+    parser.add_argument('--save-baseline', help="Write the results as the new baseline to this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed regression (fraction). Default: %(default)s")
+    args = parser.parse_args(argv)
+
+    # the per-trade log messages are not part of what is measured
+    logging.disable(logging.WARNING)
+    if args.workdir is not None:
+        os.makedirs(args.workdir, exist_ok=True)
+    results = run_benchmarks(sizes=[int(n) for n in args.sizes.split(",")],
+                             groups=args.cases.split(","),
+                             sample=args.sample,
+                             mode=args.mode,
+                             workdir=args.workdir,
+                             memory=not args.no_memory)
+
+    for path in (args.output, args.save_baseline):
+        if path is not None:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), tolerance=args.tolerance)
+        for msg in regressions:
+            print("REGRESSION: {0}".format(msg))
+        if regressions:
+            return 1
+        print("No regressions against {0}".format(args.baseline))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
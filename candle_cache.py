@@ -0,0 +1,294 @@
+'''
+Process-wide cache of candles shared by all the Trade objects.
+For each (instrument, granularity) it keeps merged, contiguous
+time ranges, so overlapping requests only fetch what is missing
+and are then served by slicing
+'''
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from instrumentation import STATS
+from time_index import TimeIndex
+from utils import candle_time
+from config import CONFIG
+
+# create logger
+cc_logger = logging.getLogger(__name__)
+cc_logger.setLevel(logging.INFO)
+
+class Segment(object):
+    '''
+    Contiguous time range [start, end) for which
+    all the candles have been fetched
+
+    Class variables
+    ---------------
+    start : datetime
+    end : datetime
+    candles : list with candles sorted by time
+    '''
+
+    def __init__(self, start, end, candles):
+        self.start = start
+        self.end = end
+        self.candles = candles
+        self._index = None
+
+    def covers(self, start, end):
+        return self.start <= start and end <= self.end
+
+    def slice(self, start, end):
+        '''
+        Get the candles with start <= time < end
+        '''
+        if self._index is None:
+            # built on first lookup, as segments are replaced when merged
+            self._index = TimeIndex([candle_time(c) for c in self.candles])
+        return self.candles[self._index.slice(start, end)]
+
+class CandleCache(object):
+    '''
+    Candle store keyed by (instrument, granularity). Keys are evicted
+    in least recently used order when the estimated memory used
+    by the cached candles goes over 'max_bytes'
+
+    Class variables
+    ---------------
+    max_bytes : int, Optional
+                Memory budget. Default: [general] candle_cache_mb
+    hits : int
+           Number of requests served from the cache
+    misses : int
+             Number of requests that needed a fetch
+    evictions : int
+                Number of (instrument, granularity) keys evicted
+    '''
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = CONFIG.getint('general', 'candle_cache_mb', fallback=512)*1024*1024
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.evictions = 0
+        self._segments = OrderedDict()
+        self._candle_bytes = None
+        self._lock = threading.RLock()
+
+    def clear(self):
+        with self._lock:
+            self._segments.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        '''
+        Returns
+        -------
+        dict with hits, misses, evictions, number of keys,
+        number of candles and estimated bytes used
+        '''
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'keys': len(self._segments),
+                    'candles': self.__ncandles(),
+                    'bytes': self.__nbytes()}
+
+    def lookup(self, instrument, granularity, start, end):
+        '''
+        Get the candles in [start, end) if the range is cached
+
+        Parameters
+        ----------
+        instrument : str, Required
+        granularity : str, Required
+        start : datetime, Required
+        end : datetime, Required
+
+        Returns
+        -------
+        list with copies of the candles or None if the range
+        is not (completely) cached
+        '''
+        key = (instrument, granularity)
+        with self._lock:
+            for seg in self._segments.get(key, []):
+                if seg.covers(start, end):
+                    self.hits += 1
+                    STATS.count('cache_hits')
+                    self._segments.move_to_end(key)
+                    return [dict(c) for c in seg.slice(start, end)]
+            self.misses += 1
+            STATS.count('cache_misses')
+        return None
+
+    def first_after(self, instrument, granularity, d):
+        '''
+        Get the first candle with time >= d if it is cached. This is
+        the candle returned by Connect.query(start=d, count=1)
+
+        Returns
+        -------
+        Copy of the candle or None
+        '''
+        key = (instrument, granularity)
+        with self._lock:
+            for seg in self._segments.get(key, []):
+                if seg.start <= d < seg.end:
+                    candles = seg.slice(d, seg.end)
+                    if candles:
+                        self.hits += 1
+                        STATS.count('cache_hits')
+                        self._segments.move_to_end(key)
+                        return dict(candles[0])
+            self.misses += 1
+            STATS.count('cache_misses')
+        return None
+
+    def put(self, instrument, granularity, start, end, candles):
+        '''
+        Add the candles fetched for the range [start, end)
+        and merge them with the overlapping/adjacent ranges.
+        Incomplete candles are not stored: the range is only
+        cached until the first of them
+
+        Parameters
+        ----------
+        instrument : str, Required
+        granularity : str, Required
+        start : datetime, Required
+        end : datetime, Required
+        candles : list with candles sorted by time, Required
+        '''
+        # candles in the future are not complete yet
+        end = min(end, datetime.now().replace(microsecond=0))
+        complete = []
+        for c in candles:
+            if c.get('complete', True) is False:
+                end = min(end, candle_time(c))
+                break
+            complete.append(c)
+        candles = [c for c in complete if candle_time(c) < end]
+        if start >= end:
+            return
+        key = (instrument, granularity)
+        with self._lock:
+            if self._candle_bytes is None and candles:
+                c = candles[0]
+                self._candle_bytes = sys.getsizeof(c)+sum(sys.getsizeof(v) for v in c.values())
+            new = Segment(start, end, list(candles))
+            kept = []
+            for seg in self._segments.get(key, []):
+                if seg.end < new.start or seg.start > new.end:
+                    kept.append(seg)
+                    continue
+                new = Segment(min(seg.start, new.start),
+                              max(seg.end, new.end),
+                              merge_candles(seg.candles, new.candles))
+            kept.append(new)
+            kept.sort(key=lambda s: s.start)
+            self._segments[key] = kept
+            self._segments.move_to_end(key)
+            self.__evict()
+
+    def get_range(self, instrument, granularity, start, end, fetch):
+        '''
+        Get the candles in [start, end). Only the parts of the range
+        that are not cached are fetched
+
+        Parameters
+        ----------
+        instrument : str, Required
+        granularity : str, Required
+        start : datetime, Required
+        end : datetime, Required
+        fetch : function, Required
+                Function taking (start, end) and returning the list
+                of candles in that range
+
+        Returns
+        -------
+        list with copies of the candles
+        '''
+        candles = self.lookup(instrument, granularity, start, end)
+        if candles is not None:
+            return candles
+
+        fetched = []
+        gaps = self.gaps(instrument, granularity, start, end)
+        for (gstart, gend) in gaps:
+            cc_logger.debug("Cache miss for {0} {1}: {2}-{3}".format(instrument, granularity, gstart, gend))
+            candles = fetch(gstart, gend)
+            fetched.extend(candles)
+            self.put(instrument, granularity, gstart, gend, candles)
+
+        # candles after now and incomplete candles are not cached,
+        # so they are taken from the last range fetched
+        last = gaps[-1][0] if gaps else end
+        with self._lock:
+            for seg in self._segments.get((instrument, granularity), []):
+                if seg.start <= start < seg.end:
+                    cend = min(end, seg.end)
+                    if cend == end or cend >= last:
+                        return [dict(c) for c in seg.slice(start, cend)] + \
+                               [c for c in fetched if cend <= candle_time(c) < end]
+                    break
+            else:
+                if last <= start:
+                    return fetched
+        # the cache is too small to hold the range
+        return fetch(start, end)
+
+    def gaps(self, instrument, granularity, start, end):
+        '''
+        Get the parts of [start, end) that are not cached
+
+        Returns
+        -------
+        list with (start, end) tuples
+        '''
+        gaps = []
+        cstart = start
+        with self._lock:
+            for seg in self._segments.get((instrument, granularity), []):
+                if seg.end <= cstart:
+                    continue
+                if seg.start >= end:
+                    break
+                if seg.start > cstart:
+                    gaps.append((cstart, seg.start))
+                cstart = max(cstart, seg.end)
+        if cstart < end:
+            gaps.append((cstart, end))
+        return gaps
+
+    def __ncandles(self):
+        return sum(len(seg.candles) for segs in self._segments.values() for seg in segs)
+
+    def __nbytes(self):
+        return self.__ncandles()*(self._candle_bytes or 0)
+
+    def __evict(self):
+        while len(self._segments) > 1 and self.__nbytes() > self.max_bytes:
+            key, _ = self._segments.popitem(last=False)
+            self.evictions += 1
+            cc_logger.debug("Evicting {0}".format(key))
+
+def merge_candles(a, b):
+    '''
+    Merge two lists of candles sorted by time.
+    Candles in 'b' replace the ones with the same time in 'a'
+
+    Returns
+    -------
+    list with candles sorted by time
+    '''
+    merged = {candle_time(c): c for c in a}
+    for c in b:
+        merged[candle_time(c)] = c
+    return [merged[t] for t in sorted(merged)]
+
+# cache shared by all the Trade objects in this process
+CANDLE_CACHE = CandleCache()
@@ -0,0 +1,335 @@
+'''
+Helpers used by the Trade object to fetch candle data
+in bulk instead of issuing one Connect.query per candle
+'''
+import logging
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from oanda.connect import Connect
+from candle_cache import CANDLE_CACHE
+from candle_store import CandleStore
+from instrumentation import STATS
+from utils import candle_time, periodToDelta
+from config import CONFIG, get_settings
+
+# create logger
+cs_logger = logging.getLogger(__name__)
+cs_logger.setLevel(logging.INFO)
+
+# CandleStore used by 'fetch_stored'
+_store = None
+
+def get_ser_dir():
+    '''
+    Function to get the [general] ser_data_dir option
+    used as 'indir' in Connect.query
+
+    Returns
+    -------
+    str or None if option is not defined
+    '''
+    if CONFIG.has_option('general', 'ser_data_dir'):
+        return CONFIG.get('general', 'ser_data_dir')
+    return None
+
+def get_store():
+    '''
+    Function to get the CandleStore for the
+    [general] store_dir option
+
+    Returns
+    -------
+    CandleStore or None if option is not defined
+    '''
+    global _store
+    if not CONFIG.has_option('general', 'store_dir'):
+        return None
+    dirname = CONFIG.get('general', 'store_dir')
+    if _store is None or _store.dirname != dirname:
+        _store = CandleStore(dirname)
+    return _store
+
+def fetch_range(instrument, granularity, start, end):
+    '''
+    Function to fetch all the candles in a time range [start, end).
+    Candles are taken from CANDLE_CACHE and the parts of the range
+    that are not cached are fetched with 'fetch_stored'
+
+    Parameters
+    ----------
+    instrument : str, Required
+                 i.e. AUD_USD
+    granularity : str, Required
+                  i.e. D, H12, H8, ...
+    start : datetime, Required
+    end : datetime, Required
+
+    Returns
+    -------
+    list with candles sorted by time
+    '''
+    return CANDLE_CACHE.get_range(instrument, granularity, start, end,
+                                  fetch=lambda s, e: fetch_stored(instrument, granularity, s, e))
+
+def fetch_stored(instrument, granularity, start, end):
+    '''
+    Function to fetch all the candles in a time range [start, end)
+    from the CandleStore (if [general] store_dir is defined). Ranges
+    not in the store are fetched with 'query_range' and stored
+
+    Returns
+    -------
+    list with candles sorted by time
+    '''
+    store = get_store()
+    if store is None:
+        return query_range(instrument, granularity, start, end)
+
+    candles = store.read(instrument, granularity, start, end)
+    if candles is None:
+        candles = query_range(instrument, granularity, start, end)
+        store.write(instrument, granularity, start, end, candles)
+    return candles
+
+def fetch_resp(instrument, granularity, start, end):
+    '''
+    Function to fetch the candles in a time range [start, end)
+    with the same shape as the response of Connect.query, so it
+    can be used for initializing a CandleList
+
+    Returns
+    -------
+    dict
+    '''
+    return {'instrument': instrument,
+            'granularity': granularity,
+            'candles': fetch_range(instrument, granularity, start, end)}
+
+def query_candle(instrument, granularity, d, conn=None):
+    '''
+    Function to get the first candle with time >= d. It
+    is taken from CANDLE_CACHE if possible
+
+    Parameters
+    ----------
+    instrument : str, Required
+    granularity : str, Required
+    d : datetime, Required
+    conn : Connect object, Optional
+           Connection used if the candle is not cached
+
+    Returns
+    -------
+    candle or None if there is not any candle
+    with time >= d (i.e. d is after now)
+    '''
+    c = CANDLE_CACHE.first_after(instrument, granularity, d)
+    if c is not None:
+        return c
+    if conn is None:
+        conn = Connect(instrument=instrument,
+                       granularity=granularity)
+    with STATS.timer('api_query'):
+        res = conn.query(start=d.isoformat(),
+                         count=1,
+                         indir=get_ser_dir())
+    STATS.count('api_queries')
+    STATS.count('candles_fetched', len(res['candles']))
+    if not res['candles']:
+        return None
+    return res['candles'][0]
+
+def query_range(instrument, granularity, start, end):
+    '''
+    Function to fetch all the candles in a time range by
+    using ranged queries. The range is split in chunks
+    of [trade] chunk_size candles
+
+    Parameters
+    ----------
+    instrument : str, Required
+    granularity : str, Required
+    start : datetime, Required
+    end : datetime, Required
+
+    Returns
+    -------
+    list with candles sorted by time
+    '''
+    conn = Connect(instrument=instrument,
+                   granularity=granularity)
+    ser_dir = get_ser_dir()
+    chunk = periodToDelta(get_settings().trade.chunk_size, granularity)
+
+    candles = []
+    cstart = start
+    while cstart < end:
+        cend = min(cstart + chunk, end)
+        cs_logger.debug("Fetching range: {0}-{1}".format(cstart, cend))
+        with STATS.timer('api_query'):
+            res = conn.query(start=cstart.isoformat(),
+                             end=cend.isoformat(),
+                             indir=ser_dir)
+        STATS.count('api_queries')
+        STATS.count('candles_fetched', len(res['candles']))
+        for c in res['candles']:
+            # chunk boundaries can return the same candle twice
+            if candles and candle_time(c) <= candle_time(candles[-1]):
+                continue
+            candles.append(c)
+        cstart = cend
+
+    return candles
+
+def align_candles(date_list, candles):
+    '''
+    Function to get, for each datetime in 'date_list',
+    the candle that Connect.query(start=d, count=1) would return.
+    This is the first candle with time >= d
+
+    Parameters
+    ----------
+    date_list : list with datetimes
+    candles : list with candles sorted by time
+
+    Returns
+    -------
+    list with one candle (or None if 'candles' does not reach d)
+    per datetime in date_list
+    '''
+    aligned = []
+    for d in date_list:
+        ix = bisect_left(candles, d, key=candle_time)
+        aligned.append(candles[ix] if ix < len(candles) else None)
+
+    return aligned
+
+def window_end(date_list, granularity):
+    '''
+    Function to get the end datetime of the ranged query
+    covering all the datetimes in 'date_list'
+
+    Parameters
+    ----------
+    date_list : list with datetimes sorted, Required
+    granularity : str, Required
+
+    Returns
+    -------
+    datetime object
+    '''
+    # go a few days further to cover a closed market at the end of the window
+    end = date_list[-1] + periodToDelta(1, granularity) + timedelta(days=3)
+    if end > datetime.now():
+        end = datetime.now().replace(microsecond=0)
+
+    return end
+
+def truncate_window(aligned):
+    '''
+    Function to truncate the candles returned by 'align_candles'
+    at the first datetime without candle. 'align_candles' only
+    returns None after the last candle, so this is the end of the
+    candles available (i.e. the window goes beyond now)
+
+    Returns
+    -------
+    list with candles
+    '''
+    if None in aligned:
+        return aligned[:aligned.index(None)]
+    return aligned
+
+def fetch_window(instrument, granularity, date_list, candles=None):
+    '''
+    Function to fetch the candles for all the datetimes in 'date_list'
+    with ranged queries. Datetimes after the last candle available
+    (i.e. after now) are the end of the window, so fewer candles than
+    datetimes are returned for windows reaching the present
+
+    Parameters
+    ----------
+    instrument : str, Required
+    granularity : str, Required
+    date_list : list with datetimes sorted, Required
+    candles : list with candles sorted by time, Optional
+              Candle history already fetched for this instrument
+              and granularity. If provided, a ranged query will only
+              be done for the datetimes after its last candle
+
+    Returns
+    -------
+    list with one candle per datetime in date_list (truncated at
+    the end of the candles available, see 'truncate_window')
+    '''
+    end = window_end(date_list, granularity)
+    if candles is None:
+        candles = fetch_range(instrument, granularity, date_list[0], end)
+        return truncate_window(align_candles(date_list, candles))
+
+    aligned = align_candles(date_list, candles)
+    if None in aligned:
+        ix = aligned.index(None)
+        # the history does not reach the end of the window
+        if date_list[ix] < end:
+            rest = fetch_range(instrument, granularity, date_list[ix], end)
+            aligned[ix:] = align_candles(date_list[ix:], rest)
+
+    return truncate_window(aligned)
+
+def chunk_sizes(total, first=1, growth=8):
+    '''
+    Generator of growing chunk sizes (1, 8, 64, ...)
+    adding up to 'total'
+
+    Parameters
+    ----------
+    total : int, Required
+    first : int, Optional
+            Size of the first chunk. Default: 1
+    growth : int, Optional
+             Each chunk is 'growth' times larger than the previous one.
+             Default: 8
+    '''
+    size = first
+    while total > 0:
+        n = min(size, total)
+        yield n
+        total -= n
+        size *= growth
+
+def stream_window(instrument, granularity, date_list, candles=None, first=1, growth=8):
+    '''
+    Generator yielding the candles for the datetimes in 'date_list'
+    (see 'fetch_window') in chunks of growing size (see 'chunk_sizes').
+    Chunks are only fetched when requested, so a trade that is decided
+    in the first candles does not fetch the whole window, while long
+    running trades are still fetched with a few ranged queries
+
+    Parameters
+    ----------
+    instrument : str, Required
+    granularity : str, Required
+    date_list : list with datetimes sorted, Required
+    candles : list with candles sorted by time, Optional
+              See 'fetch_window'
+    first : int, Optional
+            See 'chunk_sizes'. Default: 1
+    growth : int, Optional
+             See 'chunk_sizes'. Default: 8
+
+    Returns
+    -------
+    generator with lists of candles (one per datetime). It stops
+    at the end of the candles available (see 'fetch_window')
+    '''
+    ix = 0
+    for size in chunk_sizes(len(date_list), first=first, growth=growth):
+        cs_logger.debug("Fetching chunk of {0} candles".format(size))
+        chunk = fetch_window(instrument, granularity, date_list[ix:ix+size], candles=candles)
+        if chunk:
+            yield chunk
+        if len(chunk) < size:
+            return
+        ix += size
@@ -0,0 +1,218 @@
+'''
+Columnar on-disk archive of candles. Each (instrument, granularity)
+is stored in a binary file of fixed-size records (time and OHLC bid/ask
+prices as typed columns) that is read through a memory map, and in a
+.json file with the time ranges that have been fetched completely (kept
+in memory after the first read)
+'''
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utils import candle_time, periodToDelta
+
+# create logger
+cst_logger = logging.getLogger(__name__)
+cst_logger.setLevel(logging.INFO)
+
+PRICE_COLS = ['openBid', 'highBid', 'lowBid', 'closeBid',
+              'openAsk', 'highAsk', 'lowAsk', 'closeAsk']
+
+CANDLE_DTYPE = np.dtype([('time', '<i8')] +
+                        [(c, '<f8') for c in PRICE_COLS] +
+                        [('volume', '<i8'), ('complete', '?')])
+
+EPOCH = datetime(1970, 1, 1)
+
+def to_epoch(d):
+    '''
+    Function to convert a datetime to seconds since epoch
+    '''
+    return int((d - EPOCH).total_seconds())
+
+def from_epoch(secs):
+    '''
+    Function to convert seconds since epoch to a datetime
+    '''
+    return EPOCH + timedelta(seconds=int(secs))
+
+class CandleStore(object):
+    '''
+    Class representing a directory with one archive
+    per instrument and granularity
+
+    Class variables
+    ---------------
+    dirname : str, Required
+              Directory with the archives
+    '''
+
+    def __init__(self, dirname):
+        self.dirname = dirname
+        os.makedirs(dirname, exist_ok=True)
+        self._maps = {}
+        self._ranges = {}
+        self._lock = threading.RLock()
+
+    def __path(self, instrument, granularity, ext):
+        return os.path.join(self.dirname, "{0}_{1}.{2}".format(instrument, granularity, ext))
+
+    def ranges(self, instrument, granularity):
+        '''
+        Get the time ranges stored for an instrument and granularity
+
+        Returns
+        -------
+        list with [start, end) tuples of seconds since epoch
+        '''
+        key = (instrument, granularity)
+        with self._lock:
+            if key not in self._ranges:
+                path = self.__path(instrument, granularity, 'json')
+                ranges = []
+                if os.path.exists(path):
+                    with open(path) as f:
+                        ranges = [tuple(r) for r in json.load(f)]
+                self._ranges[key] = ranges
+            return list(self._ranges[key])
+
+    def covers(self, instrument, granularity, start, end):
+        '''
+        Check if all the candles in [start, end) are stored
+
+        Returns
+        -------
+        bool
+        '''
+        (s, e) = (to_epoch(start), to_epoch(end))
+        return any(rs <= s and e <= re for rs, re in self.ranges(instrument, granularity))
+
+    def records(self, instrument, granularity):
+        '''
+        Get all the records stored for an instrument and granularity
+
+        Returns
+        -------
+        read-only memory-mapped structured array (with CANDLE_DTYPE)
+        sorted by time
+        '''
+        key = (instrument, granularity)
+        with self._lock:
+            if key not in self._maps:
+                path = self.__path(instrument, granularity, 'bin')
+                if not os.path.exists(path) or os.path.getsize(path) == 0:
+                    return np.empty(0, dtype=CANDLE_DTYPE)
+                self._maps[key] = np.memmap(path, dtype=CANDLE_DTYPE, mode='r')
+            return self._maps[key]
+
+    def read_arrays(self, instrument, granularity, start, end):
+        '''
+        Get the records with start <= time < end. The lookup is a binary
+        search on the time column and no data is copied
+
+        Returns
+        -------
+        structured array (view of the memory map) or None if the
+        range is not stored
+        '''
+        if not self.covers(instrument, granularity, start, end):
+            return None
+        rec = self.records(instrument, granularity)
+        i = np.searchsorted(rec['time'], to_epoch(start), side='left')
+        j = np.searchsorted(rec['time'], to_epoch(end), side='left')
+        return rec[i:j]
+
+    def read(self, instrument, granularity, start, end):
+        '''
+        Get the candles with start <= time < end
+
+        Returns
+        -------
+        list with candles (with the same keys as the ones returned
+        by Connect.query) or None if the range is not stored
+        '''
+        rec = self.read_arrays(instrument, granularity, start, end)
+        if rec is None:
+            return None
+        candles = []
+        for r in rec.tolist():
+            c = dict(zip(CANDLE_DTYPE.names, r))
+            c['time'] = from_epoch(c['time'])
+            candles.append(c)
+        return candles
+
+    def write(self, instrument, granularity, start, end, candles):
+        '''
+        Store the candles fetched for the range [start, end). Candles
+        after the last stored one are appended to the archive, otherwise
+        the archive is merged and rewritten. Incomplete candles are not stored.
+        If the range goes beyond now, then it is only recorded as stored
+        until the end of the last candle
+
+        Parameters
+        ----------
+        instrument : str, Required
+        granularity : str, Required
+        start : datetime, Required
+        end : datetime, Required
+        candles : list with candles sorted by time, Required
+        '''
+        complete = []
+        for c in candles:
+            if c.get('complete', True) is False:
+                # range is only complete until this candle
+                end = min(end, candle_time(c))
+                break
+            complete.append(c)
+        if end > datetime.now():
+            # candles after the last one can still come
+            last = candle_time(complete[-1])+periodToDelta(1, granularity) if complete else start
+            end = min(end, last)
+        if start >= end:
+            return
+
+        new = np.zeros(len(complete), dtype=CANDLE_DTYPE)
+        new['time'] = [to_epoch(candle_time(c)) for c in complete]
+        for col in PRICE_COLS:
+            new[col] = [c[col] for c in complete]
+        new['volume'] = [c.get('volume', 0) for c in complete]
+        new['complete'] = True
+
+        key = (instrument, granularity)
+        path = self.__path(instrument, granularity, 'bin')
+        with self._lock:
+            old = self.records(instrument, granularity)
+            self._maps.pop(key, None)
+            if len(old) == 0 or len(new) == 0 or new['time'][0] > old['time'][-1]:
+                with open(path, 'ab') as f:
+                    f.write(new.tobytes())
+            else:
+                cst_logger.debug("Rewriting archive: {0}".format(path))
+                merged = np.concatenate([old, new])
+                # keep the last occurrence of each time
+                (_, ix) = np.unique(merged['time'][::-1], return_index=True)
+                merged = merged[len(merged)-1-ix]
+                del old
+                tmp = path+'.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(merged.tobytes())
+                os.replace(tmp, path)
+            self.__add_range(instrument, granularity, to_epoch(start), to_epoch(end))
+
+    def __add_range(self, instrument, granularity, s, e):
+        ranges = sorted(self.ranges(instrument, granularity) + [(s, e)])
+        merged = [list(ranges[0])]
+        for rs, re in ranges[1:]:
+            if rs <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], re)
+            else:
+                merged.append([rs, re])
+        path = self.__path(instrument, granularity, 'json')
+        with open(path+'.tmp', 'w') as f:
+            json.dump(merged, f)
+        os.replace(path+'.tmp', path)
+        self._ranges[(instrument, granularity)] = [tuple(r) for r in merged]
@@ -3,7 +3,8 @@
 @author: Ernesto Lowy
 @email: ernestolowy@gmail.com
 '''
-from configparser import ConfigParser
+from configparser import ConfigParser, NoSectionError, NoOptionError
+from dataclasses import dataclass
 import os
 import pdb
 
@@ -13,9 +14,246 @@ def get_config_file():
 
 CONFIG_FILE = get_config_file()
 
+class Config(ConfigParser):
+    '''
+    ConfigParser that discards the Settings cached by 'get_settings'
+    when CONFIG is modified (i.e. CONFIG.set or CONFIG.read), so they
+    are parsed again on next 'get_settings' call
+    '''
+    def __modified(self):
+        global _SETTINGS
+        if globals().get('CONFIG') is self:
+            _SETTINGS = None
+
+    def set(self, section, option, value=None):
+        super().set(section, option, value)
+        self.__modified()
+
+    def remove_option(self, section, option):
+        existed = super().remove_option(section, option)
+        self.__modified()
+        return existed
+
+    def remove_section(self, section):
+        existed = super().remove_section(section)
+        self.__modified()
+        return existed
+
+    def read(self, filenames, encoding=None):
+        read_ok = super().read(filenames, encoding=encoding)
+        self.__modified()
+        return read_ok
+
+    def read_file(self, f, source=None):
+        super().read_file(f, source=source)
+        self.__modified()
+
 def create_config(config_file=None):
-    parser = ConfigParser()
+    parser = Config()
     parser.read(config_file or CONFIG_FILE)
     return parser
 
-CONFIG = create_config()
\ No newline at end of file
+_SETTINGS = None
+
+CONFIG = create_config()
+
+
+@dataclass(frozen=True)
+class GeneralSettings:
+    '''
+    [general] options
+    '''
+    part: str
+    bit: str
+    ic_perc: int
+    candle_cache_mb: int
+
+@dataclass(frozen=True)
+class TradeSettings:
+    '''
+    [trade] options
+    '''
+    hr_pips: int
+    numperiods: int
+    granularity: str
+    chunk_size: int
+    period_atr: int
+    fine_cross: bool
+
+@dataclass(frozen=True)
+class HAreaSettings:
+    '''
+    [harea] options
+    '''
+    min: int
+    hr_pips: int
+
+@dataclass(frozen=True)
+class TradeBotSettings:
+    '''
+    [trade_bot] options
+    '''
+    RR: float
+    period_range: int
+    add_pips: int
+
+@dataclass(frozen=True)
+class CounterSettings:
+    '''
+    [counter] options
+    '''
+    rsi_period: int
+
+@dataclass(frozen=True)
+class SessionsSettings:
+    '''
+    [sessions] options
+    '''
+    # (name, start, end) tuples. See 'parse_windows'
+    windows: tuple
+    tz: str
+
+@dataclass(frozen=True)
+class IndicatorsSettings:
+    '''
+    [indicators] options
+    '''
+    use_store: bool
+
+@dataclass(frozen=True)
+class Settings:
+    '''
+    Typed, read-only view of the options used in the hot paths
+    (i.e. Trade.run_trade), parsed and validated once from a
+    ConfigParser. See 'get_settings'
+    '''
+    general: GeneralSettings
+    trade: TradeSettings
+    harea: HAreaSettings
+    trade_bot: TradeBotSettings
+    counter: CounterSettings
+    sessions: SessionsSettings
+    indicators: IndicatorsSettings
+
+DEFAULT_WINDOWS = 'asian=23:00-07:00,european=07:00-15:00,namerican=12:00-19:00'
+
+def parse_windows(value):
+    '''
+    Function to parse the trading session windows.
+    i.e. asian=23:00-07:00,european=07:00-15:00
+
+    Parameters
+    ----------
+    value : str, Required
+
+    Returns
+    -------
+    tuple with (name, start, end) tuples. 'start' and 'end' are
+    seconds from midnight. Windows with start > end go over midnight
+
+    Raises
+    ------
+    ValueError if a window is not valid
+    '''
+    windows = []
+    for window in value.split(","):
+        (name, bounds) = window.strip().split("=")
+        secs = []
+        for bound in bounds.split("-"):
+            parts = [int(x) for x in bound.split(":")]
+            parts += [0]*(3-len(parts))
+            secs.append(parts[0]*3600+parts[1]*60+parts[2])
+        if len(secs) != 2:
+            raise ValueError("Invalid session window: {0}".format(window))
+        windows.append((name, secs[0], secs[1]))
+
+    return tuple(windows)
+
+def load_settings(parser):
+    '''
+    Function to parse and validate the options in 'parser'
+
+    Parameters
+    ----------
+    parser : ConfigParser object
+
+    Returns
+    -------
+    Settings object
+
+    Raises
+    ------
+    ValueError if an option is missing or is not valid
+    '''
+    try:
+        settings = Settings(
+            general=GeneralSettings(part=parser.get('general', 'part'),
+                                    bit=parser.get('general', 'bit'),
+                                    ic_perc=parser.getint('general', 'ic_perc'),
+                                    candle_cache_mb=parser.getint('general', 'candle_cache_mb', fallback=512)),
+            trade=TradeSettings(hr_pips=parser.getint('trade', 'hr_pips'),
+                                numperiods=parser.getint('trade', 'numperiods'),
+                                granularity=parser.get('trade', 'granularity'),
+                                chunk_size=parser.getint('trade', 'chunk_size', fallback=500),
+                                period_atr=parser.getint('trade', 'period_atr'),
+                                fine_cross=parser.getboolean('trade', 'fine_cross', fallback=True)),
+            harea=HAreaSettings(min=parser.getint('harea', 'min'),
+                                hr_pips=parser.getint('harea', 'hr_pips')),
+            trade_bot=TradeBotSettings(RR=parser.getfloat('trade_bot', 'RR'),
+                                       period_range=parser.getint('trade_bot', 'period_range'),
+                                       add_pips=parser.getint('trade_bot', 'add_pips')),
+            counter=CounterSettings(rsi_period=parser.getint('counter', 'rsi_period')),
+            sessions=SessionsSettings(windows=parse_windows(parser.get('sessions', 'windows',
+                                                                       fallback=DEFAULT_WINDOWS)),
+                                      tz=parser.get('sessions', 'tz', fallback=None) or None),
+            indicators=IndicatorsSettings(use_store=parser.getboolean('indicators', 'use_store',
+                                                                      fallback=False)))
+    except (NoSectionError, NoOptionError, ValueError) as e:
+        raise ValueError("Invalid settings: {0}".format(e))
+
+    if settings.general.bit not in ('Ask', 'Bid'):
+        raise ValueError("Invalid settings: [general] bit must be Ask or Bid. Got: {0}".format(settings.general.bit))
+    for name in ('numperiods', 'chunk_size', 'period_atr'):
+        if getattr(settings.trade, name) <= 0:
+            raise ValueError("Invalid settings: [trade] {0} must be > 0".format(name))
+    if settings.counter.rsi_period <= 0 or settings.trade_bot.period_range <= 0:
+        raise ValueError("Invalid settings: [counter] rsi_period and [trade_bot] period_range must be > 0")
+    if settings.trade.hr_pips < 0 or settings.harea.hr_pips < 0:
+        raise ValueError("Invalid settings: hr_pips must be >= 0")
+
+    return settings
+
+def get_settings():
+    '''
+    Function to get the Settings parsed from CONFIG. They are
+    parsed the first time this function is invoked and then reused
+    until CONFIG is modified
+
+    Returns
+    -------
+    Settings object
+    '''
+    global _SETTINGS
+    if _SETTINGS is None:
+        _SETTINGS = load_settings(CONFIG)
+    return _SETTINGS
+
+def reload_settings(parser=None):
+    '''
+    Function to parse the Settings again. Modifying CONFIG already
+    discards the cached Settings, so this is only needed for parsing
+    them from another ConfigParser
+
+    Parameters
+    ----------
+    parser : ConfigParser object, Optional
+             If defined, then the settings are parsed from it.
+             Default: CONFIG
+
+    Returns
+    -------
+    Settings object
+    '''
+    global _SETTINGS
+    _SETTINGS = load_settings(parser if parser is not None else CONFIG)
+    return _SETTINGS
@@ -0,0 +1,177 @@
+'''
+Pipeline calculating the features in trade_utils (RSI, session,
+ADR, ...) for all the trades in a TradeJournal. Trades are grouped
+by pair and timeframe: the candles for each group are fetched once
+and shared by all the trades and features in the group, and the
+groups can be processed in parallel
+'''
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from candle_source import fetch_range
+from indicators import INDICATORS, use_store
+from trade_utils import is_entry_onrsi, get_lasttime, get_max_min_rsi, \
+    calc_trade_session, calc_pips_c_trend, calc_adr
+
+# create logger
+f_logger = logging.getLogger(__name__)
+f_logger.setLevel(logging.INFO)
+
+class Feature(object):
+    '''
+    Class representing a feature calculated for each trade
+
+    Class variables
+    ---------------
+    name : str, Required
+           Name of the journal column with the values
+    func : function, Required
+           Function taking a Trade object and returning the value
+    candles : bool, Optional
+              True if 'func' uses Trade.period. Default: True
+    '''
+
+    def __init__(self, name, func, candles=True):
+        self.name = name
+        self.func = func
+        self.candles = candles
+
+# features available by name
+FEATURES = {}
+
+def register_feature(name, func, candles=True):
+    '''
+    Function to add a feature to FEATURES
+
+    Parameters
+    ----------
+    name : str, Required
+    func : function, Required
+    candles : bool, Optional
+              See Feature. Default: True
+    '''
+    FEATURES[name] = Feature(name, func, candles=candles)
+
+register_feature('entry_onrsi', is_entry_onrsi)
+register_feature('lasttime', get_lasttime)
+register_feature('max_min_rsi', get_max_min_rsi)
+register_feature('session', calc_trade_session, candles=False)
+register_feature('pips_c_trend', calc_pips_c_trend)
+register_feature('adr', calc_adr)
+
+def period_range(trades):
+    '''
+    Function to get the time range covering
+    the 'period' of all the trades
+
+    Parameters
+    ----------
+    trades : list with Trade objects with the same timeframe
+
+    Returns
+    -------
+    datetime : start
+    datetime : end
+    '''
+    bounds = [t.period_bounds() for t in trades]
+    return min(b[0] for b in bounds), max(b[1] for b in bounds)
+
+def calc_group(trades, features):
+    '''
+    Function to calculate the features for a group of trades with
+    the same pair and timeframe. If any of the features needs candles,
+    then the candles for the periods of all the trades are fetched at once
+    and are used by each of the trades through the candle cache
+
+    Parameters
+    ----------
+    trades : list with Trade objects
+    features : list with Feature objects
+
+    Returns
+    -------
+    list with a dict of feature values for each trade
+    list with (trade id, error message) tuples
+    '''
+    if trades and any(f.candles for f in features):
+        (start, end) = period_range(trades)
+        (pair, timeframe) = (trades[0].pair, trades[0].timeframe)
+        f_logger.info("Fetching candles for {0} {1} ({2} trades)".format(pair, timeframe, len(trades)))
+        fetch_range(pair, timeframe, start, end)
+        if use_store() is True:
+            INDICATORS.reserve(pair, timeframe, start, end)
+
+    results = []
+    errors = []
+    for t in trades:
+        values = {}
+        for f in features:
+            try:
+                values[f.name] = f.func(t)
+            except Exception as e:
+                f_logger.error("Feature {0} failed for trade with id: {1}: {2}".format(f.name, t.id, e))
+                errors.append((t.id, "{0}: {1}: {2}".format(f.name, type(e).__name__, e)))
+                values[f.name] = np.nan
+        results.append(values)
+        # the candles are not needed anymore
+        t.invalidate()
+
+    return results, errors
+
+def calc_features(tj, names=None, workers=None, overwrite=False):
+    '''
+    Function to calculate the features for all the trades in
+    a TradeJournal and to add them as columns to tj.df
+
+    Parameters
+    ----------
+    tj : TradeJournal object
+    names : list, Optional
+            Feature names (keys of FEATURES). Default: all
+    workers : int, Optional
+              If defined, then the groups of trades (see 'calc_group') are
+              processed in a pool of 'workers' processes. Default: None
+    overwrite : bool, Optional
+                If False, then features are only calculated for the
+                trades without a value in the feature column. Default: False
+
+    Returns
+    -------
+    DataFrame with the feature columns
+    '''
+    if names is None:
+        names = list(FEATURES)
+    for name in names:
+        if name not in FEATURES:
+            raise ValueError("Unknown feature: {0}. Available: {1}".format(name, ", ".join(FEATURES)))
+        if name not in tj.df.columns:
+            tj.df[name] = np.nan
+        # results are of different types
+        tj.df[name] = tj.df[name].astype(object)
+    features = [FEATURES[name] for name in names]
+
+    missing = tj.df[names].isnull()
+    groups = {}
+    for index, t, run in zip(tj.df.index, tj.fetch_trades(), missing.any(axis=1)):
+        if run or overwrite is True:
+            groups.setdefault((t.pair, t.timeframe), []).append((index, t))
+
+    tj.errors = []
+    items = list(groups.values())
+    trade_lists = [[t for index, t in group] for group in items]
+    if workers is not None:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            res = list(executor.map(calc_group, trade_lists, [features]*len(items)))
+    else:
+        res = [calc_group(trades, features) for trades in trade_lists]
+
+    for group, (results, errors) in zip(items, res):
+        tj.errors.extend(errors)
+        for (index, t), values in zip(group, results):
+            for name, value in values.items():
+                if overwrite is True or missing.at[index, name]:
+                    tj.df.at[index, name] = value
+
+    return tj.df[names]
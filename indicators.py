@@ -0,0 +1,214 @@
+'''
+Process-wide store of the indicators used by the Trade features. The RSI
+is calculated once per (instrument, granularity) over the time range
+covering all the trades, and each trade gets its values by slicing.
+The start of the trend (Trade.get_trend_i) is memoized per window
+'''
+import logging
+import threading
+
+import numpy as np
+
+from candle.candlelist import CandleList
+from candle_source import fetch_resp
+from candle_store import to_epoch
+from instrumentation import STATS
+from utils import candle_time
+from config import get_settings
+
+# create logger
+ind_logger = logging.getLogger(__name__)
+ind_logger.setLevel(logging.INFO)
+
+class IndicatorSeries(object):
+    '''
+    Values of an indicator for all the candles in [start, end)
+
+    Class variables
+    ---------------
+    start : datetime
+    end : datetime
+    times : int array with the candle times (seconds since epoch)
+    values : float array
+    '''
+
+    def __init__(self, start, end, times, values):
+        self.start = start
+        self.end = end
+        self.times = times
+        self.values = values
+
+    def covers(self, start, end):
+        return self.start <= start and end <= self.end
+
+    def slice(self, start, end):
+        '''
+        Get the values for the candles with start <= time < end
+        '''
+        i = np.searchsorted(self.times, to_epoch(start), side='left')
+        j = np.searchsorted(self.times, to_epoch(end), side='left')
+        return self.values[i:j]
+
+def concat_series(parts):
+    '''
+    Function to join consecutive IndicatorSeries
+
+    Parameters
+    ----------
+    parts : list with IndicatorSeries sorted by time. The end of
+            each series is the start of the next one
+
+    Returns
+    -------
+    IndicatorSeries
+    '''
+    times = []
+    values = []
+    for s in parts:
+        # candles returned beyond the end of a part are in the next one
+        ix = np.searchsorted(s.times, to_epoch(s.end), side='left')
+        times.append(s.times[:ix])
+        values.append(s.values[:ix])
+    return IndicatorSeries(parts[0].start, parts[-1].end,
+                           np.concatenate(times), np.concatenate(values))
+
+class IndicatorStore(object):
+    '''
+    Indicators keyed by (instrument, granularity)
+
+    Class variables
+    ---------------
+    calcs : int
+            Number of RSI series calculated
+    '''
+
+    def __init__(self):
+        self.calcs = 0
+        self._rsi = {}
+        self._reserved = {}
+        self._trend_i = {}
+        self._lock = threading.RLock()
+
+    def clear(self):
+        with self._lock:
+            self._rsi.clear()
+            self._reserved.clear()
+            self._trend_i.clear()
+            self.calcs = 0
+
+    def prepare(self, instrument, granularity, start, end):
+        '''
+        Calculate the RSI for all the candles in [start, end). This
+        can be used to calculate it once for a group of trades before
+        requesting the values of each trade. If the RSI is already
+        calculated for part of the range, then it is only calculated
+        for the candles before and after it (each side with its own
+        warm-up candles, see CandleList.calc_rsi)
+
+        Parameters
+        ----------
+        instrument : str, Required
+        granularity : str, Required
+        start : datetime, Required
+        end : datetime, Required
+        '''
+        key = (instrument, granularity)
+        with self._lock:
+            series = self._rsi.get(key)
+            if series is None:
+                self._rsi[key] = self.__calc_rsi(instrument, granularity, start, end)
+                return
+            if series.covers(start, end):
+                return
+            # the new series also covers the previous range
+            parts = [series]
+            if start < series.start:
+                parts.insert(0, self.__calc_rsi(instrument, granularity, start, series.start))
+            if end > series.end:
+                parts.append(self.__calc_rsi(instrument, granularity, series.end, end))
+            self._rsi[key] = concat_series(parts)
+
+    def reserve(self, instrument, granularity, start, end):
+        '''
+        Extend the range for which the RSI will be calculated
+        on the next call to 'rsi' that needs to calculate it
+        '''
+        key = (instrument, granularity)
+        with self._lock:
+            if key in self._reserved:
+                (rstart, rend) = self._reserved[key]
+                (start, end) = (min(start, rstart), max(end, rend))
+            self._reserved[key] = (start, end)
+
+    def rsi(self, instrument, granularity, start, end):
+        '''
+        Get the RSI values for the candles in [start, end)
+
+        Returns
+        -------
+        float array
+        '''
+        key = (instrument, granularity)
+        with self._lock:
+            series = self._rsi.get(key)
+            if (series is None or not series.covers(start, end)) and key in self._reserved:
+                (rstart, rend) = self._reserved.pop(key)
+                self.prepare(instrument, granularity, min(start, rstart), max(end, rend))
+        self.prepare(instrument, granularity, start, end)
+        with self._lock:
+            return self._rsi[(instrument, granularity)].slice(start, end)
+
+    def trend_i(self, instrument, granularity, type, start, end, calc):
+        '''
+        Get the start of the trend for the window [start, end).
+        The pivots used by CandleList.calc_itrend depend on where
+        the window starts (ZigZag is path dependent), so the value
+        can not be sliced from a longer series and it is memoized
+        for each window instead
+
+        Parameters
+        ----------
+        instrument : str, Required
+        granularity : str, Required
+        type : str, Required
+               Trade type ('long'/'short')
+        start : datetime, Required
+        end : datetime, Required
+        calc : function, Required
+               Function without arguments calculating the value
+
+        Returns
+        -------
+        datetime
+        '''
+        key = (instrument, granularity, type, start, end)
+        with self._lock:
+            if key in self._trend_i:
+                return self._trend_i[key]
+        value = calc()
+        with self._lock:
+            self._trend_i[key] = value
+        return value
+
+    def __calc_rsi(self, instrument, granularity, start, end):
+        ind_logger.debug("Calculating RSI for {0} {1}: {2}-{3}".format(instrument, granularity, start, end))
+        cl = CandleList(fetch_resp(instrument, granularity, start, end))
+        # same formula (and warm-up candles) than the RSI of each Trade.period
+        with STATS.timer('calc_rsi'):
+            cl.calc_rsi()
+        candles = cl.data['candles']
+        times = np.fromiter((to_epoch(candle_time(c)) for c in candles), dtype=np.int64, count=len(candles))
+        values = np.fromiter((c['rsi'] for c in candles), dtype=float, count=len(candles))
+        self.calcs += 1
+        return IndicatorSeries(start, end, times, values)
+
+def use_store():
+    '''
+    Returns
+    -------
+    bool with the [indicators] use_store option
+    '''
+    return get_settings().indicators.use_store
+
+# store shared by all the Trade objects in this process
+INDICATORS = IndicatorStore()
@@ -0,0 +1,213 @@
+'''
+Counters and timers for the hot paths (API queries, candle cache,
+HArea.get_cross_time, RSI, trend and trade_utils features, ...). They
+are recorded in the process-wide STATS object, which is disabled by
+default ([instrumentation] enabled), so the instrumented code only
+pays an attribute lookup. Counters and timers of the pool worker
+processes (i.e. TradeJournal.win_rate with 'workers') are returned
+with the results of each item and merged into STATS (see 'merge')
+'''
+import cProfile
+import json
+import logging
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+from config import CONFIG
+
+# create logger
+i_logger = logging.getLogger(__name__)
+i_logger.setLevel(logging.INFO)
+
+# context manager returned by Instrumentation.timer when disabled
+_NULL = nullcontext()
+
+class _Timer(object):
+    '''
+    Context manager adding the time spent in its block to a timer
+    '''
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.add_time(self.name, time.perf_counter()-self.start)
+        return False
+
+class Instrumentation(object):
+    '''
+    Class representing a set of named counters and timers
+
+    Class variables
+    ---------------
+    enabled : bool, Optional
+              If False, then nothing is recorded. Default: False
+    counters : dict
+               Counter name => int
+    timers : dict
+             Timer name => list with [calls, total, min, max] (seconds)
+    '''
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = {}
+        self.timers = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+
+    def count(self, name, n=1):
+        '''
+        Increase the counter 'name' by 'n'
+        '''
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0)+n
+
+    def add_time(self, name, elapsed):
+        '''
+        Add 'elapsed' seconds to the timer 'name'
+        '''
+        if not self.enabled:
+            return
+        with self._lock:
+            t = self.timers.get(name)
+            if t is None:
+                self.timers[name] = [1, elapsed, elapsed, elapsed]
+            else:
+                t[0] += 1
+                t[1] += elapsed
+                t[2] = min(t[2], elapsed)
+                t[3] = max(t[3], elapsed)
+
+    def timer(self, name):
+        '''
+        Get a context manager recording the time
+        spent in its block in the timer 'name'
+
+        Usage:
+            with STATS.timer('calc_rsi'):
+                cl.calc_rsi()
+        '''
+        if not self.enabled:
+            return _NULL
+        return _Timer(self, name)
+
+    def stats(self):
+        '''
+        Returns
+        -------
+        dict with 'counters' (name => int) and 'timers'
+        (name => dict with calls, total, mean, min and max seconds)
+        '''
+        with self._lock:
+            timers = {name: {'calls': calls,
+                             'total': total,
+                             'mean': total/calls,
+                             'min': tmin,
+                             'max': tmax}
+                      for name, (calls, total, tmin, tmax) in self.timers.items()}
+            return {'counters': dict(self.counters),
+                    'timers': timers}
+
+    def merge(self, stats):
+        '''
+        Add the counters and timers of another Instrumentation
+        (i.e. the one of a pool worker process)
+
+        Parameters
+        ----------
+        stats : dict returned by Instrumentation.stats
+        '''
+        if not self.enabled:
+            return
+        with self._lock:
+            for name, n in stats['counters'].items():
+                self.counters[name] = self.counters.get(name, 0)+n
+            for name, o in stats['timers'].items():
+                t = self.timers.get(name)
+                if t is None:
+                    self.timers[name] = [o['calls'], o['total'], o['min'], o['max']]
+                else:
+                    t[0] += o['calls']
+                    t[1] += o['total']
+                    t[2] = min(t[2], o['min'])
+                    t[3] = max(t[3], o['max'])
+
+    def dump_json(self, path):
+        '''
+        Write the output of 'stats' to a JSON file
+        '''
+        with open(path, 'w') as f:
+            json.dump(self.stats(), f, indent=2, sort_keys=True)
+        i_logger.info("Instrumentation stats written to {0}".format(path))
+
+# stats shared by all the instrumented code in this process
+STATS = Instrumentation(enabled=CONFIG.getboolean('instrumentation', 'enabled', fallback=False))
+
+def timed(name):
+    '''
+    Decorator recording the time spent in each
+    call to the function in the timer 'name'
+    '''
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not STATS.enabled:
+                return func(*args, **kwargs)
+            with _Timer(STATS, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def instrumented(json_file=None, pstats_file=None):
+    '''
+    Context manager enabling STATS (after resetting it) for
+    the block. i.e. for instrumenting a single run:
+
+        with instrumented(json_file='run.json', pstats_file='run.pstats'):
+            tj.win_rate(strats='counter')
+
+    Parameters
+    ----------
+    json_file : str, Optional
+                If defined, then STATS.stats() is written to this file
+    pstats_file : str, Optional
+                  If defined, then the block is also run under cProfile
+                  and the profile is written to this file (it can be
+                  read with pstats.Stats)
+
+    Returns
+    -------
+    Instrumentation object (STATS)
+    '''
+    enabled = STATS.enabled
+    STATS.reset()
+    STATS.enabled = True
+    profiler = cProfile.Profile() if pstats_file is not None else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        yield STATS
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            pstats.Stats(profiler).dump_stats(pstats_file)
+            i_logger.info("Profile written to {0}".format(pstats_file))
+        STATS.enabled = enabled
+        if json_file is not None:
+            STATS.dump_json(json_file)
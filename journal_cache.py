@@ -0,0 +1,104 @@
+'''
+Cache of the parsed trade journal worksheets. The DataFrame of each
+worksheet is pickled in a file of the user cache directory ([trade_journal]
+cache_dir, default: $XDG_CACHE_HOME/tradingjournal or ~/.cache/tradingjournal)
+and it is only used while the path, the modification time and the size of
+the workbook are the same than when it was stored. Cache files are never
+read from the directory of the workbook, so a shared journal cannot
+bring a pickle with it
+'''
+import hashlib
+import logging
+import os
+import pickle
+
+from config import CONFIG
+
+# create logger
+jc_logger = logging.getLogger(__name__)
+jc_logger.setLevel(logging.INFO)
+
+def cache_dir():
+    '''
+    Function to get the directory with the cache files
+
+    Returns
+    -------
+    str
+    '''
+    if CONFIG.has_option('trade_journal', 'cache_dir'):
+        return os.path.expanduser(CONFIG.get('trade_journal', 'cache_dir'))
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'tradingjournal')
+
+def cache_path(url, worksheet):
+    '''
+    Function to get the path of the cache file of a worksheet.
+    i.e. <cache_dir>/journal.xlsx.<hash of the path>.trading_journal.cache.pkl
+    '''
+    path = os.path.abspath(url)
+    digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir(), "{0}.{1}.{2}.cache.pkl".format(os.path.basename(path),
+                                                                     digest, worksheet))
+
+def cache_key(url, worksheet):
+    '''
+    Returns
+    -------
+    tuple with the path, worksheet, modification
+    time (ns) and size of the workbook
+    '''
+    st = os.stat(url)
+    return (os.path.abspath(url), worksheet, st.st_mtime_ns, st.st_size)
+
+def load_cached(url, worksheet):
+    '''
+    Function to get the DataFrame of a worksheet from the cache
+
+    Parameters
+    ----------
+    url : str, Required
+          Path to the .xlsx file
+    worksheet : str, Required
+
+    Returns
+    -------
+    DataFrame or None if it is not cached or the workbook
+    has changed since it was cached
+    '''
+    path = cache_path(url, worksheet)
+    if not os.path.exists(path) or not os.path.exists(url):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            (key, df) = pickle.load(f)
+    except Exception as e:
+        jc_logger.warning("Ignoring unreadable cache file {0}: {1}".format(path, e))
+        return None
+    if key != cache_key(url, worksheet):
+        jc_logger.debug("Cache file {0} is outdated".format(path))
+        return None
+
+    return df
+
+def store_cached(url, worksheet, df):
+    '''
+    Function to store the DataFrame of a worksheet in the cache.
+    Errors (i.e. read-only directory) are logged and ignored
+
+    Parameters
+    ----------
+    url : str, Required
+          Path to the .xlsx file
+    worksheet : str, Required
+    df : DataFrame, Required
+    '''
+    path = cache_path(url, worksheet)
+    tmp = path+'.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, 'wb') as f:
+            pickle.dump((cache_key(url, worksheet), df), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError as e:
+        jc_logger.warning("Could not write cache file {0}: {1}".format(path, e))
@@ -0,0 +1,99 @@
+'''
+Streaming reader of the trade journal worksheets. Rows are read with
+the openpyxl read-only mode and returned in DataFrame chunks, so the
+memory used does not depend on the size of the journal
+'''
+import logging
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from config import CONFIG
+
+# create logger
+jr_logger = logging.getLogger(__name__)
+jr_logger.setLevel(logging.INFO)
+
+# columns read as str (see TradeJournal.__init__)
+STR_COLS = ['start', 'end', 'trend_i']
+
+def normalize(df):
+    '''
+    Function to normalize a chunk of the journal in the same way than
+    TradeJournal.__init__: 'start', 'end' and 'trend_i' are converted to
+    str and the 'n.a.' values and the empty cells (None) are replaced by NaN
+
+    Parameters
+    ----------
+    df : DataFrame
+
+    Returns
+    -------
+    DataFrame
+    '''
+    for c in STR_COLS:
+        if c in df.columns:
+            # datetimes are converted to 'YYYY-MM-DD HH:MM:SS'
+            df[c] = df[c].map(str, na_action='ignore')
+    # empty cells are None in the openpyxl rows
+    df = df.fillna(np.nan)
+    return df.replace('n.a.', np.nan)
+
+def read_chunks(url, worksheet, columns=None, chunksize=1000):
+    '''
+    Function to read a worksheet in chunks
+
+    Parameters
+    ----------
+    url : str, Required
+          Path to the .xlsx file
+    worksheet : str, Required
+    columns : list, Optional
+              Columns to read. Only the cells of these columns are loaded.
+              Default: [trade_journal] colnames (all the columns if
+              this option is not defined)
+    chunksize : int, Optional
+                Number of rows in each chunk. Default: 1000
+
+    Returns
+    -------
+    generator with DataFrames
+    '''
+    if columns is None and CONFIG.has_option('trade_journal', 'colnames'):
+        columns = CONFIG.get('trade_journal', 'colnames').split(",")
+
+    wb = load_workbook(url, read_only=True, data_only=True)
+    try:
+        ws = wb[worksheet]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # remove trailing whitespaces from col names
+        header = [str(h).rstrip() if h is not None else None for h in header]
+        if columns is None:
+            ixs = [ix for ix, h in enumerate(header) if h is not None]
+        else:
+            ixs = [ix for ix, h in enumerate(header) if h in columns]
+        if not ixs:
+            return
+        names = [header[ix] for ix in ixs]
+        first = ixs[0]
+        # only the range of cells with the selected columns is parsed
+        rows = ws.iter_rows(min_row=2, min_col=first+1, max_col=ixs[-1]+1, values_only=True)
+        ixs = [ix-first for ix in ixs]
+
+        chunk = []
+        for row in rows:
+            values = [row[ix] if ix < len(row) else None for ix in ixs]
+            if all(v is None for v in values):
+                continue
+            chunk.append(values)
+            if len(chunk) == chunksize:
+                yield normalize(pd.DataFrame(chunk, columns=names))
+                chunk = []
+        if chunk:
+            yield normalize(pd.DataFrame(chunk, columns=names))
+    finally:
+        wb.close()
@@ -0,0 +1,196 @@
+'''
+Statistics calculated directly on the columns of a trade journal
+DataFrame (i.e. TradeJournal.df) with vectorized operations and groupby,
+without creating Trade objects
+'''
+import logging
+
+import numpy as np
+import pandas as pd
+
+from trade_utils import calc_trade_sessions
+
+# create logger
+js_logger = logging.getLogger(__name__)
+js_logger.setLevel(logging.INFO)
+
+# columns of the DataFrame returned by 'calc_stats'
+STATS_COLS = ['trades', 'wins', 'losses', 'win_rate', 'pips', 'expectancy',
+              'profit_factor', 'max_drawdown', 'max_losing_streak',
+              'R_mean', 'R_median', 'R_std', 'R_min', 'R_max']
+
+# dimensions used by 'breakdown'
+DIMENSIONS = ['strat', 'pair', 'timeframe', 'session']
+
+def r_multiples(df):
+    '''
+    Function to calculate the profit of each trade in R multiples.
+    This is the formula in trade_utils.calculate_profit applied to
+    the 'entry', 'SL', 'exit' and 'outcome' columns
+
+    Parameters
+    ----------
+    df : DataFrame with the trades
+
+    Returns
+    -------
+    float Series. NaN for the trades that are not a success or a failure
+    '''
+    entry = pd.to_numeric(df['entry'], errors='coerce')
+    R = (entry-pd.to_numeric(df['SL'], errors='coerce')).abs()
+    diff = (pd.to_numeric(df['exit'], errors='coerce')-entry).abs()
+    mult = np.select([df['outcome'].eq('success'), df['outcome'].eq('failure')],
+                     [1.0, -1.0], default=np.nan)
+
+    return (mult*diff/R).round(2)
+
+def session_labels(df):
+    '''
+    Function to get the sessions (see trade_utils.calc_trade_sessions)
+    each trade was entered in from the 'entry_time' column
+
+    Parameters
+    ----------
+    df : DataFrame with the trades
+
+    Returns
+    -------
+    str Series. 'n.a.' for the trades without entry_time
+    '''
+    if 'entry_time' not in df.columns:
+        return pd.Series('n.a.', index=df.index)
+
+    return calc_trade_sessions(df['entry_time'])
+
+def prepare(df, by=()):
+    '''
+    Function to select the trades that are a success or
+    a failure and to add the columns needed by 'calc_stats'
+
+    Parameters
+    ----------
+    df : DataFrame with the trades
+    by : list with the columns used for grouping
+
+    Returns
+    -------
+    DataFrame sorted by 'start' with the 'pips' column as float and with
+    'R', 'pair' and 'session' columns (the last one only if needed
+    and not already in 'df')
+    '''
+    data = df[df['outcome'].isin(['success', 'failure'])].copy()
+    data['pips'] = pd.to_numeric(data['pips'], errors='coerce').fillna(0.0)
+    data['R'] = r_multiples(data)
+    if 'pair' not in data.columns:
+        data['pair'] = data['id'].str.split(r'\.| ', regex=True).str[0]
+    data['pair'] = data['pair'].str.replace('/', '_')
+    if 'session' in by and 'session' not in data.columns:
+        data['session'] = session_labels(data)
+    for c in by:
+        data[c] = data[c].fillna('n.a.')
+    if 'start' in data.columns:
+        order = pd.to_datetime(data['start'], errors='coerce').argsort(kind='mergesort')
+        data = data.iloc[order]
+
+    return data
+
+def calc_stats(df, by=None):
+    '''
+    Function to calculate the statistics of the trades in 'df'.
+    Only trades with outcome 'success' or 'failure' are considered
+
+    Parameters
+    ----------
+    df : DataFrame with the trades. Required columns: id, start, entry, SL,
+         outcome, exit and pips (i.e. after running TradeJournal.run_all)
+    by : list, Optional
+         Columns (any of 'strat', 'pair', 'timeframe' and 'session')
+         used for grouping the trades. Default: no grouping
+
+    Returns
+    -------
+    DataFrame indexed by the 'by' columns and with the following columns:
+        trades : number of trades
+        wins : number of successes
+        losses : number of failures
+        win_rate : % of successes
+        pips : pips balance
+        expectancy : average number of pips per trade
+        profit_factor : gross profit/gross loss (in pips)
+        max_drawdown : max decrease in pips of the cumulative pips balance
+                       (trades sorted by 'start')
+        max_losing_streak : max number of consecutive failures
+        R_mean, R_median, R_std, R_min, R_max : distribution of the
+                                                profit in R multiples
+    '''
+    by = list(by) if by else []
+    data = prepare(df, by=by)
+    keys = by if by else ['all']
+    if not by:
+        data['all'] = 'all'
+    if data.empty:
+        return pd.DataFrame(columns=STATS_COLS, index=pd.MultiIndex.from_tuples([], names=keys)
+                            if len(keys) > 1 else pd.Index([], name=keys[0]))
+
+    data['win'] = data['outcome'].eq('success')
+    data['loss'] = data['outcome'].eq('failure')
+    data['gross_profit'] = data['pips'].clip(lower=0)
+    data['gross_loss'] = (-data['pips']).clip(lower=0)
+
+    # drawdown from the running max of the balance (that starts at 0)
+    groups = [data[k] for k in keys]
+    balance = data['pips'].groupby(groups).cumsum()
+    data['drawdown'] = balance.groupby(groups).cummax().clip(lower=0)-balance
+
+    # a new run starts when the win/loss state changes within the group
+    # (trades of the groups are interleaved). Cumulative sum of 'loss'
+    # within each run is the streak length
+    new_run = data['loss'].ne(data['loss'].groupby(groups).shift())
+    run = new_run.astype(int).groupby(groups).cumsum()
+    data['streak'] = data['loss'].astype(int).groupby(groups+[run]).cumsum()
+
+    res = data.groupby(keys, sort=True).agg(trades=('outcome', 'size'),
+                                            wins=('win', 'sum'),
+                                            losses=('loss', 'sum'),
+                                            pips=('pips', 'sum'),
+                                            expectancy=('pips', 'mean'),
+                                            gross_profit=('gross_profit', 'sum'),
+                                            gross_loss=('gross_loss', 'sum'),
+                                            max_drawdown=('drawdown', 'max'),
+                                            max_losing_streak=('streak', 'max'),
+                                            R_mean=('R', 'mean'),
+                                            R_median=('R', 'median'),
+                                            R_std=('R', 'std'),
+                                            R_min=('R', 'min'),
+                                            R_max=('R', 'max'))
+    res['win_rate'] = res['wins']*100/res['trades']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        res['profit_factor'] = res['gross_profit']/res['gross_loss']
+
+    return res[STATS_COLS]
+
+def breakdown(df, dimensions=None):
+    '''
+    Function to calculate the statistics (see 'calc_stats') of all the
+    trades and of the trades grouped by each of the dimensions
+
+    Parameters
+    ----------
+    df : DataFrame with the trades
+    dimensions : list, Optional
+                 Default: strat, pair, timeframe and session
+
+    Returns
+    -------
+    DataFrame with a (dimension, value) index. The first row
+    ('all', 'all') has the statistics of all the trades
+    '''
+    if dimensions is None:
+        dimensions = DIMENSIONS
+    data = prepare(df, by=dimensions)
+    frames = {'all': calc_stats(data)}
+    for dim in dimensions:
+        frames[dim] = calc_stats(data, by=[dim])
+
+    res = pd.concat(frames, names=['dimension', 'value'])
+    return res
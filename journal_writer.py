@@ -0,0 +1,379 @@
+'''
+Buffered writer of trades to a trade journal. Rows are collected and
+written in batches: new workbooks are created with the openpyxl write-only
+mode and, after the first batch (or with 'append'), rows are appended to
+existing worksheets by editing only the XML of that worksheet, so the rest
+of the workbook is not re-serialized.
+Optionally rows are written to a .csv sidecar file and the .xlsx is
+only generated on demand with 'export'
+'''
+import csv
+import logging
+import math
+import os
+import re
+import zipfile
+from datetime import datetime
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from config import CONFIG
+
+# create logger
+jw_logger = logging.getLogger(__name__)
+jw_logger.setLevel(logging.INFO)
+
+NS = {'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+      'rel': 'http://schemas.openxmlformats.org/package/2006/relationships'}
+R_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+def cell_value(value):
+    '''
+    Function to convert a value to a type
+    that can be written to a worksheet
+
+    Returns
+    -------
+    None (empty cell), bool, int, float or str
+    '''
+    if value is None:
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) else float(value)
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+def cell_xml(ref, value):
+    '''
+    Function to get the XML of a cell. Strings are written
+    inline, so the shared strings of the workbook are not modified
+    '''
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return '<c r="{0}" t="b"><v>{1}</v></c>'.format(ref, int(value))
+    if isinstance(value, (int, float)):
+        return '<c r="{0}"><v>{1}</v></c>'.format(ref, repr(value))
+    return '<c r="{0}" t="inlineStr"><is><t xml:space="preserve">{1}</t></is></c>'.format(ref, escape(value))
+
+def sheet_path(zf, sheet_name):
+    '''
+    Function to get the path in the .xlsx archive
+    of the XML file of a worksheet
+
+    Returns
+    -------
+    str or None if there is not a worksheet named 'sheet_name'
+    '''
+    wb = ElementTree.fromstring(zf.read('xl/workbook.xml'))
+    rid = None
+    for sheet in wb.iterfind('main:sheets/main:sheet', NS):
+        if sheet.get('name') == sheet_name:
+            rid = sheet.get(R_ID)
+    if rid is None:
+        return None
+    rels = ElementTree.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.iterfind('rel:Relationship', NS):
+        if rel.get('Id') == rid:
+            target = rel.get('Target')
+            return target.lstrip('/') if target.startswith('/') else 'xl/'+target
+    return None
+
+def shared_strings(zf):
+    '''
+    Function to get the shared strings of a workbook
+
+    Returns
+    -------
+    list with str
+    '''
+    if 'xl/sharedStrings.xml' not in zf.namelist():
+        return []
+    root = ElementTree.fromstring(zf.read('xl/sharedStrings.xml'))
+    return [''.join(t.text or '' for t in si.iter('{{{0}}}t'.format(NS['main'])))
+            for si in root.iterfind('main:si', NS)]
+
+def sheet_header(zf, path):
+    '''
+    Function to get the values in the first row of a worksheet
+
+    Returns
+    -------
+    dict with column index (starting at 1) => value (str). Empty cells are not included
+    '''
+    strings = None
+    header = {}
+    main = '{{{0}}}'.format(NS['main'])
+    with zf.open(path) as f:
+        for _, elem in ElementTree.iterparse(f):
+            if elem.tag != main+'row':
+                continue
+            for ncol, c in enumerate(elem.iterfind('main:c', NS), 1):
+                if c.get('r') is not None:
+                    ncol = column_index_from_string(re.match(r'[A-Z]+', c.get('r')).group(0))
+                if c.get('t') == 'inlineStr':
+                    value = ''.join(t.text or '' for t in c.iter(main+'t'))
+                else:
+                    v = c.find('main:v', NS)
+                    value = v.text if v is not None else None
+                    if value is not None and c.get('t') == 's':
+                        if strings is None:
+                            strings = shared_strings(zf)
+                        value = strings[int(value)]
+                if value not in (None, ''):
+                    header[ncol] = value
+            break
+    return header
+
+def header_columns(header, colnames):
+    '''
+    Function to get the column of the worksheet for each of 'colnames'
+
+    Parameters
+    ----------
+    header : dict returned by 'sheet_header'
+    colnames : list with the column names of the rows
+
+    Returns
+    -------
+    list with a column index per name in 'colnames'
+    '''
+    index = {str(value): ncol for ncol, value in header.items()}
+    missing = [c for c in colnames if c not in index]
+    if missing:
+        raise ValueError("Columns not in the worksheet header: {0}".format(", ".join(missing)))
+    return [index[c] for c in colnames]
+
+def append_rows(url, sheet_name, colnames, rows):
+    '''
+    Function to append rows to an existing worksheet. The values are
+    written in the columns with the same name in the first row of the
+    worksheet (i.e. worksheets with an index column are supported).
+    Only the XML of this worksheet is modified, the other parts of the
+    workbook are copied unchanged. Worksheets with tables are appended
+    with openpyxl, so the table ranges are updated
+
+    Parameters
+    ----------
+    url : str, Required
+          Path to the .xlsx file
+    sheet_name : str, Required
+    colnames : list with the column name of each value in the rows, Required
+    rows : list of lists with the values of each row, Required
+
+    Returns
+    -------
+    False if the worksheet does not exist. True otherwise
+    '''
+    with zipfile.ZipFile(url) as zin:
+        path = sheet_path(zin, sheet_name)
+        if path is None:
+            return False
+        xml = zin.read(path).decode('utf-8')
+        if '<tableParts' in xml:
+            zin.close()
+            append_tables(url, sheet_name, colnames, rows)
+            return True
+        header = sheet_header(zin, path)
+        cols = header_columns(header, colnames)
+
+        pos = xml.rfind('<row ')
+        last = 0
+        if pos != -1:
+            last = int(re.match(r'<row [^>]*?r="(\d+)"', xml[pos:]).group(1))
+        ncols = max(list(header)+[1])
+        lines = []
+        for nrow, row in enumerate(rows, last+1):
+            cells = ''.join(cell_xml("{0}{1}".format(get_column_letter(ncol), nrow), cell_value(v))
+                            for ncol, v in sorted(zip(cols, row)))
+            lines.append('<row r="{0}">{1}</row>'.format(nrow, cells))
+        new_rows = ''.join(lines)
+        if '</sheetData>' in xml:
+            xml = xml.replace('</sheetData>', new_rows+'</sheetData>', 1)
+        else:
+            xml = re.sub(r'<sheetData\s*/>', '<sheetData>'+new_rows+'</sheetData>', xml, count=1)
+
+        dim = re.search(r'<dimension ref="[A-Z]+\d+:?([A-Z]*)\d*"\s*/>', xml)
+        if dim is not None:
+            if dim.group(1):
+                ncols = max(ncols, column_index_from_string(dim.group(1)))
+            ref = "A1:{0}{1}".format(get_column_letter(ncols), last+len(rows))
+            xml = xml[:dim.start()]+'<dimension ref="{0}"/>'.format(ref)+xml[dim.end():]
+
+        tmp = str(url)+'.tmp'
+        with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as zout:
+            for item in zin.infolist():
+                if item.filename == path:
+                    zout.writestr(item, xml.encode('utf-8'))
+                else:
+                    zout.writestr(item, zin.read(item.filename))
+    os.replace(tmp, url)
+
+    return True
+
+def append_tables(url, sheet_name, colnames, rows):
+    '''
+    Function to append rows to a worksheet with tables by using
+    openpyxl. The tables ending at the last row are extended
+    to the new rows
+    '''
+    wb = load_workbook(url)
+    ws = wb[sheet_name]
+    header = {c.column: c.value for c in ws[1] if c.value not in (None, '')}
+    cols = header_columns(header, colnames)
+    last = ws.max_row
+    for row in rows:
+        values = dict(zip(cols, row))
+        ws.append([values.get(ncol) for ncol in range(1, max(cols)+1)])
+    for table in ws.tables.values():
+        (first, end) = table.ref.split(':')
+        if int(re.search(r'\d+', end).group(0)) == last:
+            table.ref = "{0}:{1}{2}".format(first, re.match(r'[A-Z]+', end).group(0), ws.max_row)
+    wb.save(url)
+
+class JournalWriter(object):
+    '''
+    Class representing a buffered writer of rows (i.e. trades)
+    to a worksheet
+
+    Class variables
+    ---------------
+    url : str, Required
+          Path to the .xlsx file
+    sheet_name : str, Required
+                 Worksheet name
+    colnames : list, Optional
+               Columns written for each trade.
+               Default: [trade_journal] colnames
+    batch_size : int, Optional
+                 Number of rows buffered before they are written.
+                 Default: [trade_journal] batch_size
+    sidecar : str, Optional
+              Path to a .csv file. If defined, then the rows are written
+              to this file and the .xlsx is only written by 'export'
+    append : bool, Optional
+             If True, then the rows are appended to the worksheet (and to
+             the sidecar file) if it already exists. The values are written
+             in the columns with the same name (see 'append_rows'). If False,
+             then the worksheet (and the sidecar file) is replaced.
+             Default: False
+    '''
+
+    def __init__(self, url, sheet_name, colnames=None, batch_size=None, sidecar=None, append=False):
+        self.url = url
+        self.sheet_name = sheet_name
+        if colnames is None:
+            colnames = CONFIG.get('trade_journal', 'colnames').split(",")
+        self.colnames = colnames
+        if batch_size is None:
+            batch_size = CONFIG.getint('trade_journal', 'batch_size', fallback=500)
+        self.batch_size = batch_size
+        self.sidecar = sidecar
+        self.append = append
+        # the existing worksheet (or sidecar) is replaced by the first batch
+        self._replace = not append
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, trade):
+        '''
+        Add a trade. The attributes not defined for the trade
+        are written as 'n.a.'
+
+        Parameters
+        ----------
+        trade : Trade object
+        '''
+        attrbs = trade.as_dict()
+        self.add_row([attrbs.get(key, "n.a.") for key in self.colnames])
+
+    def add_row(self, row):
+        '''
+        Add a row with one value per column in self.colnames
+        '''
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        '''
+        Write the buffered rows
+        '''
+        if not self._rows:
+            return
+        rows = [[cell_value(v) for v in row] for row in self._rows]
+        self._rows = []
+        if self.sidecar is not None:
+            self.__write_csv(rows)
+        else:
+            self.__write_xlsx(rows)
+
+    def close(self):
+        self.flush()
+
+    def export(self, url=None, sheet_name=None):
+        '''
+        Write the rows in the .csv sidecar file to a worksheet
+
+        Parameters
+        ----------
+        url : str, Optional
+              Path to the .xlsx file. Default: self.url
+        sheet_name : str, Optional
+                     Default: self.sheet_name
+        '''
+        self.flush()
+        df = pd.read_csv(self.sidecar, keep_default_na=False, na_values=[''])
+        rows = [[cell_value(v) for v in row] for row in df.itertuples(index=False)]
+        writer = JournalWriter(url if url is not None else self.url,
+                               sheet_name if sheet_name is not None else self.sheet_name,
+                               colnames=list(df.columns),
+                               append=self.append)
+        writer.__write_xlsx(rows)
+
+    def __write_csv(self, rows):
+        new = self._replace or not os.path.exists(self.sidecar)
+        self._replace = False
+        with open(self.sidecar, 'w' if new else 'a', newline='') as f:
+            out = csv.writer(f)
+            if new:
+                out.writerow(self.colnames)
+            out.writerows(rows)
+
+    def __write_xlsx(self, rows):
+        (replace, self._replace) = (self._replace, False)
+        if not os.path.exists(self.url):
+            jw_logger.info("Creating workbook {0} with worksheet: {1}".format(self.url, self.sheet_name))
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet(self.sheet_name)
+            ws.append(self.colnames)
+            for row in rows:
+                ws.append(row)
+            wb.save(self.url)
+        elif replace or not append_rows(self.url, self.sheet_name, self.colnames, rows):
+            jw_logger.info("Creating new worksheet with trades with name: {0}".format(self.sheet_name))
+            wb = load_workbook(self.url)
+            index = None
+            if self.sheet_name in wb.sheetnames:
+                index = wb.sheetnames.index(self.sheet_name)
+                wb.remove(wb[self.sheet_name])
+            ws = wb.create_sheet(self.sheet_name, index)
+            ws.append(self.colnames)
+            for row in rows:
+                ws.append(row)
+            wb.save(self.url)
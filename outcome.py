@@ -0,0 +1,194 @@
+'''
+NumPy helpers used for resolving the outcome of a Trade
+over a window of candles with vectorized comparisons
+'''
+import numpy as np
+
+from candle_source import fetch_range
+from utils import add_pips2price, substract_pips2price, candle_time, periodToDelta
+from config import get_settings
+
+def candle_arrays(candles):
+    '''
+    Function to load the high/low prices of a list of candles
+    into NumPy arrays
+
+    Parameters
+    ----------
+    candles : list with candles as returned by Connect.query
+              or structured array returned by CandleStore.read_arrays
+
+    Returns
+    -------
+    dict with 'high', 'low' (for the [general] bit), 'highAsk' and 'lowAsk'
+    float arrays
+    '''
+    bit = get_settings().general.bit
+    if isinstance(candles, np.ndarray):
+        # columns of the structured array can be used without copying
+        return {'high': candles['high{0}'.format(bit)],
+                'low': candles['low{0}'.format(bit)],
+                'highAsk': candles['highAsk'],
+                'lowAsk': candles['lowAsk']}
+    n = len(candles)
+    arrays = {}
+    for key, part in [('high', 'high{0}'.format(bit)),
+                      ('low', 'low{0}'.format(bit)),
+                      ('highAsk', 'highAsk'),
+                      ('lowAsk', 'lowAsk')]:
+        arrays[key] = np.fromiter((c[part] for c in candles), dtype=float, count=n)
+
+    return arrays
+
+def area_bounds(pair, price, pips):
+    '''
+    Function to get the lower and upper prices
+    of an area of 'pips' pips around 'price'
+
+    Parameters
+    ----------
+    pair : str, Required
+           i.e. AUD_USD
+    price : float, Required
+    pips : int, Required
+
+    Returns
+    -------
+    float : lower price
+    float : upper price
+    '''
+    return substract_pips2price(pair, price, pips), add_pips2price(pair, price, pips)
+
+def touch_mask(arrays, lower, upper):
+    '''
+    Function to check what candles have a high/low range
+    that touches the [lower, upper] price range
+
+    Parameters
+    ----------
+    arrays : dict returned by 'candle_arrays'
+    lower : float
+    upper : float
+
+    Returns
+    -------
+    bool array
+    '''
+    return (arrays['low'] <= upper) & (arrays['high'] >= lower)
+
+def gap_masks(arrays, type, SL, TP):
+    '''
+    Function to check what candles jump over the SL and the TP
+    prices (i.e. the whole candle is beyond them)
+
+    Parameters
+    ----------
+    arrays : dict returned by 'candle_arrays'
+    type : str
+           Trade type ('long'/'short')
+    SL : float
+    TP : float
+
+    Returns
+    -------
+    bool array for SL
+    bool array for TP
+    '''
+    if type == 'short':
+        return arrays['lowAsk'] > SL, arrays['highAsk'] < TP
+    elif type == 'long':
+        return arrays['highAsk'] < SL, arrays['lowAsk'] > TP
+    n = len(arrays['lowAsk'])
+    return np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)
+
+def first_index(mask, start=0, stop=None):
+    '''
+    Function to get the index of the first True
+    value in mask[start:stop]
+
+    Parameters
+    ----------
+    mask : bool array
+    start : int
+    stop : int
+
+    Returns
+    -------
+    int or None if there is not any True value
+    '''
+    sub = mask[start:stop]
+    if sub.size == 0:
+        return None
+    ix = int(np.argmax(sub))
+    if not sub[ix]:
+        return None
+    return start + ix
+
+class FineCandles(object):
+    '''
+    Candles of a finer granularity (i.e. M30) within each candle of a trade.
+    The fine candles of a candle are only fetched when first requested
+    (through the candle cache) and are then shared by the entry, SL and TP.
+    As in HArea.get_cross_time, the fine candle starting at the end of the
+    candle is included
+
+    Class variables
+    ---------------
+    pair : str, Required
+    timeframe : str, Required
+                Timeframe of the trade candles
+    granularity : str, Required
+                  Granularity of the fine candles
+    '''
+
+    def __init__(self, pair, timeframe, granularity):
+        self.pair = pair
+        self.timeframe = timeframe
+        self.granularity = granularity
+        self.bit = get_settings().general.bit
+        # [start, end] of the candle, as queried by HArea.get_cross_time
+        self._delta = periodToDelta(1, timeframe)+periodToDelta(1, granularity)
+        self._candles = {}
+
+    def get(self, candle):
+        '''
+        Get the fine candles within 'candle', including
+        the one starting at the end of 'candle'
+
+        Returns
+        -------
+        list with candles sorted by time
+        '''
+        start = candle_time(candle)
+        fine = self._candles.get(start)
+        if fine is None:
+            fine = fetch_range(self.pair, self.granularity, start, start+self._delta)
+            self._candles[start] = fine
+        return fine
+
+def cross_time(price, candle, fine):
+    '''
+    Function to get the time at which 'candle' crosses 'price'. It gives
+    the same result as HArea.get_cross_time: 'n.a.' if the candle range
+    (for the [general] bit) does not include the price, otherwise the
+    time of the first fine candle including it. The fine candles are
+    only fetched if the candle includes the price
+
+    Parameters
+    ----------
+    price : float, Required
+    candle : candle, Required
+    fine : FineCandles object, Required
+
+    Returns
+    -------
+    datetime or 'n.a.'
+    '''
+    (low, high) = ('low{0}'.format(fine.bit), 'high{0}'.format(fine.bit))
+    if not candle[low] <= price <= candle[high]:
+        return 'n.a.'
+    for c in fine.get(candle):
+        if c[low] <= price <= c[high]:
+            return candle_time(c)
+    return 'n.a.'
+
@@ -0,0 +1,373 @@
+'''
+Parameter sweep over the trades of a journal. For each combination of
+RR, SL lookback (see trade_utils.adjust_SL), add_pips (see
+trade_utils.prepare_trade) and expires (see Trade.run_trade) the trades
+are resolved in the same way as Trade.run_trade(mode='vectorized'), but
+the work shared by the combinations is only done once:
+
+    - The candle history is fetched once per pair and timeframe
+    - The candles and the NumPy arrays of each trade are shared by all
+      the combinations. If [trade] fine_cross is True, then the fine
+      candles (see outcome.FineCandles) are also shared
+    - The entry is searched once per entry price. 'expires' only
+      decides if the entry found is taken
+    - The exit is searched once per entry candle, SL and TP
+
+Groups of trades are processed in parallel and the results
+are summarized with journal_stats.calc_stats
+'''
+import logging
+import math
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import pandas as pd
+
+from candle_source import fetch_range, fetch_window, window_end
+from config import get_settings
+from harea import HArea
+from journal_stats import calc_stats
+from outcome import candle_arrays, area_bounds, touch_mask, gap_masks, first_index, \
+    FineCandles, cross_time
+from trade_utils import add_pips2trade
+from utils import candle_time, periodToDelta, calculate_pips
+
+# create logger
+sw_logger = logging.getLogger(__name__)
+sw_logger.setLevel(logging.INFO)
+
+# parameters of the sweep. None means the value of the journal
+# (RR, SL_number, add_pips) or no expiry (expires)
+PARAMS = ['RR', 'SL_number', 'add_pips', 'expires']
+
+def param_grid(grid):
+    '''
+    Function to get all the combinations of a parameter grid
+
+    Parameters
+    ----------
+    grid : dict, Required
+           Parameter name (see PARAMS) => list of values.
+           i.e. {'RR': [1.5, 2], 'expires': [1, 2]}
+
+    Returns
+    -------
+    list with a dict (with all the PARAMS) per combination
+    '''
+    for name in grid:
+        if name not in PARAMS:
+            raise ValueError("Unknown sweep parameter: {0}. Available: {1}".format(name, ", ".join(PARAMS)))
+    values = [list(grid.get(name, [None])) for name in PARAMS]
+
+    return [dict(zip(PARAMS, combo)) for combo in product(*values)]
+
+class TradeWindow(object):
+    '''
+    Candles used for resolving a trade, shared
+    by all the combinations of the sweep
+
+    Class variables
+    ---------------
+    trade : Trade object
+    candles : list with one candle per datetime in 'dates'
+    dates : list with the datetimes from trade.start (see Trade.run_trade)
+    before : list with the candles before trade.start
+    '''
+
+    def __init__(self, trade, history, times, numperiods, granularity):
+        settings = get_settings()
+        self.trade = trade
+        delta = periodToDelta(1, trade.timeframe)
+        self.dates = [trade.start+delta*x for x in range(numperiods)]
+        self.candles = fetch_window(trade.pair, trade.timeframe, self.dates, candles=history)
+        self.before = history[:bisect_left(times, trade.start)]
+        self.arrays = candle_arrays(self.candles)
+        self.fine = FineCandles(trade.pair, trade.timeframe, granularity)
+        self.fine_cross = settings.trade.fine_cross
+        self.hr_pips = settings.trade.hr_pips
+        self._entries = {}
+        self._exits = {}
+
+    def lookback_SL(self, number, bit):
+        '''
+        Get the SL calculated with trade_utils.adjust_SL on the
+        'number' candles before trade.start
+
+        Returns
+        -------
+        float or None if there are not candles before trade.start
+        '''
+        prices = [c['high{0}'.format(bit)] if self.trade.type == 'short' else c['low{0}'.format(bit)]
+                  for c in self.before[-number:]]
+        if not prices:
+            return None
+        return max(prices) if self.trade.type == 'short' else min(prices)
+
+    def cross_time(self, price, candle):
+        '''
+        Get the time at which 'candle' crosses 'price', in the
+        same way as Trade.run_trade (see trade._cross_time)
+
+        Returns
+        -------
+        datetime or 'n.a.'
+        '''
+        if self.fine_cross is True:
+            return cross_time(price, candle, self.fine)
+        area = HArea(price=price,
+                     instrument=self.trade.pair,
+                     pips=self.hr_pips,
+                     granularity=self.trade.timeframe)
+        return area.get_cross_time(candle=candle, granularity=self.fine.granularity)
+
+    def entry(self, price, hr_pips):
+        '''
+        Get the first candle crossing the entry 'price'
+
+        Returns
+        -------
+        int : index of the candle (None if not entered)
+        datetime : entry time
+        '''
+        if price not in self._entries:
+            mask = touch_mask(self.arrays, *area_bounds(self.trade.pair, price, hr_pips))
+            (ix, entry_time) = (0, None)
+            while True:
+                ix = first_index(mask, ix)
+                if ix is None:
+                    break
+                entry_time = self.cross_time(price, self.candles[ix])
+                if entry_time != 'n.a.':
+                    break
+                ix += 1
+            self._entries[price] = (ix, entry_time)
+        return self._entries[price]
+
+    def exit(self, start, SL, TP, hr_pips):
+        '''
+        Get the first candle from 'start' crossing the SL or the TP
+
+        Returns
+        -------
+        str : 'failure', 'success' or None if none of them is crossed
+        datetime : time of the exit
+        '''
+        key = (start, SL, TP)
+        if key not in self._exits:
+            pair = self.trade.pair
+            SL_m = touch_mask(self.arrays, *area_bounds(pair, SL, hr_pips))
+            TP_m = touch_mask(self.arrays, *area_bounds(pair, TP, hr_pips))
+            SL_gap, TP_gap = gap_masks(self.arrays, self.trade.type, SL, TP)
+            exit_m = SL_m | SL_gap | TP_m | TP_gap
+            res = (None, None)
+            ix = start
+            while True:
+                ix = first_index(exit_m, ix)
+                if ix is None:
+                    break
+                cl = self.candles[ix]
+                failure_time = self.cross_time(SL, cl) if SL_m[ix] else 'n.a.'
+                if SL_gap[ix]:
+                    failure_time = self.dates[ix]
+                if failure_time != 'n.a.':
+                    res = ('failure', failure_time)
+                    break
+                success_time = self.cross_time(TP, cl) if TP_m[ix] else 'n.a.'
+                if TP_gap[ix]:
+                    success_time = self.dates[ix]
+                if success_time != 'n.a.':
+                    res = ('success', success_time)
+                    break
+                ix += 1
+            self._exits[key] = res
+        return self._exits[key]
+
+def trade_prices(window, params, bit):
+    '''
+    Function to get the entry, SL and TP of a trade
+    for a combination of parameters
+
+    Returns
+    -------
+    float : entry
+    float : SL
+    float : TP
+    '''
+    t = window.trade
+    (entry, SL, TP) = (t.entry, t.SL, t.TP)
+    if params['SL_number'] is not None:
+        SL = window.lookback_SL(params['SL_number'], bit) or SL
+    if params['add_pips'] is not None:
+        # same adjustment than trade_utils.prepare_trade
+        (entry, SL) = add_pips2trade(t.pair, t.type, entry, SL, params['add_pips'])
+    if params['RR'] is not None:
+        # same formula than Trade.__init__
+        TP = entry+(entry-SL)*params['RR']
+
+    return entry, SL, TP
+
+def sweep_group(trades, combos):
+    '''
+    Function to resolve a group of trades with the same
+    pair and timeframe for each of the combinations
+
+    Parameters
+    ----------
+    trades : list with Trade objects
+    combos : list with dicts returned by 'param_grid'
+
+    Returns
+    -------
+    list with a dict (trade columns, parameters and outcome) per
+    trade and combination
+    list with (trade id, error message) tuples
+    '''
+    settings = get_settings()
+    (bit, hr_pips) = (settings.general.bit, settings.trade.hr_pips+1)
+    numperiods = settings.trade.numperiods
+    (pair, timeframe) = (trades[0].pair, trades[0].timeframe)
+    lookback = max([c['SL_number'] or 0 for c in combos])
+    starts = [t.start for t in trades]
+    last = max(starts)+periodToDelta(numperiods-1, timeframe)
+    sw_logger.info("Fetching history for {0} {1} ({2} trades)".format(pair, timeframe, len(trades)))
+    history = fetch_range(pair, timeframe, min(starts)-periodToDelta(lookback, timeframe),
+                          window_end([last], timeframe))
+    times = [candle_time(c) for c in history]
+
+    rows = []
+    errors = []
+    for t in trades:
+        try:
+            window = TradeWindow(t, history, times, numperiods, settings.trade.granularity)
+            for params in combos:
+                (entry, SL, TP) = trade_prices(window, params, bit)
+                row = {'id': t.id, 'pair': t.pair, 'timeframe': t.timeframe, 'strat': t.strat,
+                       'type': t.type, 'start': t.start, 'entry': entry, 'SL': SL, 'TP': TP,
+                       'entered': False, 'entry_time': None, 'outcome': 'n.a.',
+                       'end': None, 'exit': None, 'pips': 0.0}
+                row.update(params)
+                (ix, entry_time) = window.entry(entry, hr_pips)
+                if ix is not None and (params['expires'] is None or ix < params['expires']):
+                    row.update(entered=True, entry_time=entry_time)
+                    (outcome, end) = window.exit(ix, SL, TP, hr_pips)
+                    if outcome == 'failure':
+                        row.update(outcome=outcome, end=end, exit=SL,
+                                   pips=-float(calculate_pips(t.pair, abs(SL-entry))))
+                    elif outcome == 'success':
+                        row.update(outcome=outcome, end=end, exit=TP,
+                                   pips=float(calculate_pips(t.pair, abs(TP-entry))))
+                rows.append(row)
+        except Exception as e:
+            sw_logger.error("Sweep failed for trade with id: {0}: {1}".format(t.id, e))
+            errors.append((t.id, "{0}: {1}".format(type(e).__name__, e)))
+
+    return rows, errors
+
+def run_sweep(trades, grid, workers=None, batch_size=None):
+    '''
+    Function to resolve the trades for all the combinations of 'grid'
+
+    Parameters
+    ----------
+    trades : list with Trade objects
+    grid : dict, Required
+           See 'param_grid'
+    workers : int, Optional
+              If defined, then the groups of trades are processed
+              in a pool of 'workers' processes. Default: None
+    batch_size : int, Optional
+                 Max number of trades per group. Trades with the same pair
+                 and timeframe are split in groups of this size, so they
+                 can be processed in parallel. Default: all the trades with
+                 the same pair and timeframe are in the same group if 'workers'
+                 is not defined, otherwise they are split in 'workers' groups
+
+    Returns
+    -------
+    DataFrame with a row per trade and combination
+    list with (trade id, error message) tuples
+    '''
+    combos = param_grid(grid)
+    groups = {}
+    for t in trades:
+        groups.setdefault((t.pair, t.timeframe), []).append(t)
+
+    batches = []
+    for group in groups.values():
+        size = batch_size or (math.ceil(len(group)/workers) if workers else len(group))
+        batches.extend(group[ix:ix+size] for ix in range(0, len(group), size))
+
+    if workers is not None:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            res = list(executor.map(sweep_group, batches, [combos]*len(batches)))
+    else:
+        res = [sweep_group(batch, combos) for batch in batches]
+
+    rows = [row for batch_rows, _ in res for row in batch_rows]
+    errors = [error for _, batch_errors in res for error in batch_errors]
+    df = pd.DataFrame(rows, columns=['id', 'pair', 'timeframe', 'strat', 'type', 'start',
+                                     'entry', 'SL', 'TP', 'entered', 'entry_time',
+                                     'outcome', 'end', 'exit', 'pips']+PARAMS)
+    # ints and None would be converted to floats and NaN
+    for c in PARAMS:
+        df[c] = pd.Series([row[c] for row in rows], index=df.index, dtype=object)
+
+    return df, errors
+
+def summarize(df):
+    '''
+    Function to calculate the statistics (see journal_stats.calc_stats)
+    of each combination of parameters
+
+    Parameters
+    ----------
+    df : DataFrame returned by 'run_sweep'
+
+    Returns
+    -------
+    DataFrame with a row per combination, the PARAMS columns, the number
+    of trades run and entered and the journal_stats.STATS_COLS columns
+    '''
+    keys = df[PARAMS].where(df[PARAMS].notnull(), 'n.a.')
+    counts = pd.DataFrame({'run': 1, 'entered': df['entered'].astype(int)}).groupby(
+        [keys[c] for c in PARAMS], sort=False).sum()
+    data = df.copy()
+    data[PARAMS] = keys
+    stats = calc_stats(data, by=PARAMS)
+
+    res = counts.join(stats, how='left')
+    for c in ['trades', 'wins', 'losses']:
+        res[c] = res[c].fillna(0).astype(int)
+    res['pips'] = res['pips'].fillna(0.0)
+
+    return res.reset_index()
+
+def sweep(tj, grid, strats=None, workers=None, batch_size=None):
+    '''
+    Function to run a parameter sweep over the trades of a TradeJournal
+
+    Parameters
+    ----------
+    tj : TradeJournal object
+    grid : dict, Required
+           See 'param_grid'
+    strats : list, Optional
+             Strategies to include. Default: all
+    workers : int, Optional
+              See 'run_sweep'
+    batch_size : int, Optional
+                 See 'run_sweep'
+
+    Returns
+    -------
+    DataFrame returned by 'summarize'
+    '''
+    trades = tj.fetch_trades()
+    if strats is not None:
+        trades = [t for t in trades if t.strat in strats]
+
+    (df, errors) = run_sweep(trades, grid, workers=workers, batch_size=batch_size)
+    tj.errors = errors
+
+    return summarize(df)
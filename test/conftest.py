@@ -2,6 +2,7 @@ import pytest
 import glob
 import os
 
+from candle_cache import CANDLE_CACHE
 from trade import Trade
 from trade_journal import TradeJournal
 
@@ -13,6 +14,15 @@ def env_setup(monkeypatch):
     monkeypatch.setenv('DATADIR', '../data/')
     monkeypatch.setenv('CONFIG_FILE', '../data/settings.ini')
 
+@pytest.fixture(autouse=True)
+def clear_candle_cache():
+    '''
+    The candles cached by a test are not served to the next one
+    '''
+    CANDLE_CACHE.clear()
+    yield
+    CANDLE_CACHE.clear()
+
 @pytest.fixture
 def clean_tmp():
     yield
@@ -0,0 +1,262 @@
+'''
+Synthetic candle data used by the tests and by the benchmarks (see
+benchmarks/run_benchmarks.py). SyntheticMarket generates
+a deterministic price path for each instrument on a 30 minutes grid, and
+the candles of any granularity are built by aggregating it. The candles
+of the different granularities are therefore consistent (i.e. a D candle
+has the high/low of its M30 candles), and the same range always gets the
+same candles, whatever the queries used to fetch it
+'''
+import sys
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+from openpyxl import Workbook
+
+from utils import pip_size, try_parsing_date
+
+# number of M30 steps in a candle of each granularity
+STEPS = {'M30': 1, 'H1': 2, 'H2': 4, 'H3': 6, 'H4': 8,
+         'H6': 12, 'H8': 16, 'H12': 24, 'D': 48}
+STEP = timedelta(minutes=30)
+# time of the first candle. D candles start at 22:00 (UTC)
+ORIGIN = datetime(2000, 1, 1, 22, 0)
+# number of days generated at once
+BLOCK = 64
+
+def ceil_index(d, g):
+    '''
+    Function to get the index of the first candle
+    with time >= d for a granularity of 'g' steps
+    '''
+    (q, r) = divmod(d-ORIGIN, g*STEP)
+    return q+1 if r else q
+
+class SyntheticMarket(object):
+    '''
+    Class representing a deterministic market
+
+    Class variables
+    ---------------
+    seed : int, Optional
+           Default: 0
+    volatility : float, Optional
+                 Daily volatility of the log prices. Default: 0.006
+    '''
+
+    def __init__(self, seed=0, volatility=0.006):
+        self.seed = seed
+        self.volatility = volatility
+        self._opens = {}
+
+    def __key(self, instrument):
+        return zlib.crc32(instrument.encode())
+
+    def day_opens(self, instrument, ndays):
+        '''
+        Get the open prices of the first 'ndays'
+        days after ORIGIN for 'instrument'
+
+        Returns
+        -------
+        float array
+        '''
+        opens = self._opens.get(instrument)
+        if opens is None or opens.size < ndays:
+            # the prices of the past days do not depend on 'ndays'
+            n = max(ndays, 16384)
+            rng = np.random.default_rng([self.seed, self.__key(instrument)])
+            base = 100.0 if pip_size(instrument)[0] == 100 else 1.0
+            steps = rng.normal(0, self.volatility, n)
+            steps[0] = 0.0
+            opens = base*np.exp(np.cumsum(steps))
+            self._opens[instrument] = opens
+        return opens
+
+    def __block(self, instrument, block, opens):
+        # M30 path of BLOCK days, bridging the open of each day and the open of the next day
+        rng = np.random.default_rng([self.seed, self.__key(instrument), block])
+        inc = rng.normal(0, self.volatility/np.sqrt(48), (BLOCK, 48))
+        logs = np.log(opens[block*BLOCK:(block+1)*BLOCK+1])
+        path = logs[:-1, None]+np.cumsum(inc, axis=1) - \
+            np.arange(1, 49)/48*(inc.sum(axis=1)-np.diff(logs))[:, None]
+        points = np.exp(np.concatenate((logs[:-1, None], path), axis=1))
+        (o, c) = (points[:, :-1].ravel(), points[:, 1:].ravel())
+        wick = np.abs(rng.normal(0, self.volatility/20, (2, o.size)))*o
+        volume = rng.integers(10, 500, o.size)
+        return o, np.maximum(o, c)+wick[0], np.minimum(o, c)-wick[1], c, volume
+
+    def candles(self, instrument, granularity, start, end=None, count=None):
+        '''
+        Get the candles starting at or after 'start' with the
+        shape returned by Connect.query
+
+        Parameters
+        ----------
+        instrument : str, Required
+        granularity : str, Required
+        start : datetime, Required
+        end : datetime, Optional
+              Candles starting before 'end'
+        count : int, Optional
+                Number of candles. Used if 'end' is not defined
+
+        Returns
+        -------
+        list with candles (dict)
+        '''
+        g = STEPS[granularity]
+        first = max(ceil_index(start, g), 0)
+        now = datetime.now()
+        if end is None or end > now:
+            end = now
+        last = ceil_index(end, g)
+        if count is not None:
+            last = min(last, first+count)
+        if last <= first:
+            return []
+
+        (block0, block1) = (first*g//(48*BLOCK), (last*g-1)//(48*BLOCK))
+        opens = self.day_opens(instrument, (block1+1)*BLOCK+1)
+        blocks = [self.__block(instrument, block, opens) for block in range(block0, block1+1)]
+        offset = block0*BLOCK*48
+        (o, h, l, c, v) = [np.concatenate(cols)[first*g-offset:last*g-offset].reshape(-1, g)
+                           for cols in zip(*blocks)]
+        (o, h, l, c, v) = (o[:, 0], h.max(axis=1), l.min(axis=1), c[:, -1], v.sum(axis=1))
+        spread = 1.5/pip_size(instrument)[0]
+
+        candles = []
+        for ix, (po, ph, pl, pc, pv) in enumerate(zip(o.tolist(), h.tolist(), l.tolist(),
+                                                      c.tolist(), v.tolist())):
+            t = ORIGIN+(first+ix)*g*STEP
+            candles.append({'time': t.strftime('%Y-%m-%dT%H:%M:%S.000000Z'),
+                            'openAsk': po, 'highAsk': ph, 'lowAsk': pl, 'closeAsk': pc,
+                            'openBid': po-spread, 'highBid': ph-spread,
+                            'lowBid': pl-spread, 'closeBid': pc-spread,
+                            'volume': pv,
+                            'complete': True})
+        return candles
+
+def parse_time(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return try_parsing_date(value.split('.')[0].rstrip('Z'))
+
+class StubConnect(object):
+    '''
+    Stub of oanda.connect.Connect serving the
+    candles of StubConnect.market
+
+    Class variables
+    ---------------
+    market : SyntheticMarket shared by all the instances
+    queries : int
+              Number of queries done by all the instances
+    candles : int
+              Number of candles returned by all the instances
+    '''
+    market = SyntheticMarket()
+    queries = 0
+    candles = 0
+
+    def __init__(self, instrument, granularity, **kwargs):
+        self.instrument = instrument
+        self.granularity = granularity
+
+    def query(self, start, end=None, count=None, indir=None, **kwargs):
+        candles = self.market.candles(self.instrument, self.granularity,
+                                      parse_time(start), end=parse_time(end),
+                                      count=count if end is None else None)
+        StubConnect.queries += 1
+        StubConnect.candles += len(candles)
+        return {'instrument': self.instrument,
+                'granularity': self.granularity,
+                'candles': candles}
+
+    @classmethod
+    def reset(cls):
+        cls.queries = cls.candles = 0
+
+@contextmanager
+def stub_connect(market=None):
+    '''
+    Context manager replacing oanda.connect.Connect by StubConnect in
+    all the modules (i.e. candle_source, harea, candle.candlelist)
+
+    Parameters
+    ----------
+    market : SyntheticMarket, Optional
+             Default: StubConnect.market
+    '''
+    import oanda.connect
+    original = oanda.connect.Connect
+    patched = [oanda.connect]
+    for mod in list(sys.modules.values()):
+        if mod is not None and getattr(mod, 'Connect', None) is original:
+            patched.append(mod)
+    previous = StubConnect.market
+    if market is not None:
+        StubConnect.market = market
+    for mod in patched:
+        mod.Connect = StubConnect
+    try:
+        yield StubConnect
+    finally:
+        for mod in patched:
+            mod.Connect = original
+        StubConnect.market = previous
+
+JOURNAL_COLS = ['timeframe', 'strat', 'id', 'start', 'entry', 'SL', 'TP', 'SR', 'type', 'RR']
+PAIRS = ['EUR_USD', 'GBP_USD', 'AUD_USD', 'NZD_USD', 'USD_JPY', 'EUR_JPY']
+TIMEFRAMES = ['D', 'H12', 'H8']
+
+def make_journal(url, n, market=None, worksheet='trading_journal', seed=0,
+                 first=datetime(2012, 1, 1), last=datetime(2019, 12, 31), RR=1.5):
+    '''
+    Function to write a synthetic trade journal with the same columns
+    as data/testCounter.xlsx. The entry of each trade is the price at
+    open of its first candle, so the trades are entered
+
+    Parameters
+    ----------
+    url : str, Required
+          Path to the .xlsx file
+    n : int, Required
+        Number of trades
+    market : SyntheticMarket, Optional
+             Default: StubConnect.market
+    worksheet : str, Optional
+    seed : int, Optional
+    first : datetime, Optional
+            Trades start between 'first' and 'last'
+    last : datetime, Optional
+    RR : float, Optional
+    '''
+    market = market or StubConnect.market
+    rng = np.random.default_rng(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(worksheet)
+    ws.append(JOURNAL_COLS)
+    span = (last-first)//STEP
+    for ix in range(n):
+        pair = PAIRS[rng.integers(len(PAIRS))]
+        timeframe = TIMEFRAMES[rng.integers(len(TIMEFRAMES))]
+        g = STEPS[timeframe]
+        steps = ((first-ORIGIN)//STEP+int(rng.integers(span)))//g*g
+        start = ORIGIN+steps*STEP
+        type = 'long' if rng.random() < 0.5 else 'short'
+        entry = market.candles(pair, timeframe, start, count=1)[0]['openAsk']
+        risk = entry*rng.uniform(0.003, 0.02)
+        sign = 1 if type == 'long' else -1
+        (_, decimals) = pip_size(pair)
+        ws.append([timeframe, 'counter',
+                   "{0} {1}{2}".format(pair, start.strftime('%d%b%Y').upper(), timeframe),
+                   start.strftime('%Y-%m-%d %H:%M:%S'),
+                   entry,
+                   round(entry-sign*risk, decimals+1),
+                   round(entry+sign*RR*risk, decimals+1),
+                   round(entry-sign*risk/2, decimals+1),
+                   type, RR])
+    wb.save(url)
@@ -2,6 +2,8 @@ import pytest
 import pdb
 import datetime
 
+from synthetic import ORIGIN, stub_connect
+from candle_cache import CANDLE_CACHE
 from trade import Trade
 
 def test_fetch_candlelist(t_object):
@@ -112,8 +114,9 @@ def test_run_trade_4hrs(pair, start, type, SL, TP, entry, outcome):
     assert td.outcome == outcome
 
 def test_get_SLdiff(t_object):
-
-    assert 41.9 == t_object.get_SLdiff()
+    # entry=0.74960 and SL=0.74718, so the difference is 0.00242 (24.2 pips).
+    # 41.9 was never returned: calculate_pips used to fail with any price
+    assert 24.2 == t_object.get_SLdiff()
 
 @pytest.mark.parametrize("pair,"
                          "timeframe,"
@@ -166,3 +169,124 @@ def test_get_trend_i(pair, id, timeframe, start, type, SR, SL, TP, entry, trend_
         strat='counter_b1')
 
     assert trend_i == t.trend_i
+
+@pytest.mark.parametrize("pair,start,type,SL,TP,entry,expires", [
+        ('AUD/NZD', '2020-05-18 21:00:00', 'short', 1.08369, 1.06689, 1.07744, 2),
+        ('EUR/GBP', '2009-09-21 21:00:00', 'short', 0.90785, 0.8987, 0.90421, 2),
+        ('EUR/AUD', '2018-12-03 22:00:00', 'long', 1.53398, 1.55752, 1.54334, None),
+        ('EUR/GBP', '2016-10-05 22:00:00', 'short', 0.8848, 0.86483, 0.87691, 2)
+])
+def test_run_trade_bulk(pair, start, type, SL, TP, entry, expires):
+    '''
+    This test checks that run_trade with mode='bulk' and
+    mode='vectorized' give the same outcome as the default
+    per-candle mode
+    '''
+    res = []
+    for mode in ['candle', 'bulk', 'vectorized']:
+        td = Trade(
+                start=start,
+                entry=entry,
+                SL=SL,
+                TP=TP,
+                pair=pair,
+                type=type,
+                timeframe="D",
+                strat="counter_b2",
+                id="test")
+        td.run_trade(expires=expires, mode=mode)
+        res.append((td.outcome, getattr(td, 'end', None), getattr(td, 'exit', None),
+                    getattr(td, 'pips', None), getattr(td, 'entry_time', None)))
+
+    assert res[0] == res[1] == res[2]
+
+def test_run_trade_now():
+    '''
+    A trade starting less than [trade] numperiods candles before
+    now is run until the last candle available in all the modes
+    '''
+    now = datetime.datetime.now()
+    start = ORIGIN+(now-datetime.timedelta(days=13)-ORIGIN)//datetime.timedelta(days=1)*datetime.timedelta(days=1)
+    res = []
+    with stub_connect() as stub:
+        entry = stub.market.candles('EUR_USD', 'D', start, count=1)[0]['openAsk']
+        for mode in ['candle', 'bulk', 'vectorized']:
+            CANDLE_CACHE.clear()
+            td = Trade(
+                    start=start.strftime('%Y-%m-%d %H:%M:%S'),
+                    entry=entry,
+                    SL=entry-0.5,
+                    TP=entry+0.5,
+                    pair='EUR/USD',
+                    type='long',
+                    timeframe="D",
+                    strat="counter_b2",
+                    id="test")
+            td.run_trade(expires=None, mode=mode)
+            res.append((td.outcome, td.entered, getattr(td, 'entry_time', None)))
+    CANDLE_CACHE.clear()
+
+    assert res[0] == res[1] == res[2]
+    assert res[0][:2] == ('n.a.', True)
+
+def test_extra_attributes(t_object):
+    '''
+    This test checks that attributes that are not
+    Trade fields are kept in the overflow dict
+    '''
+    t_object.strength = 3
+
+    assert t_object.strength == 3
+    assert t_object.as_dict()['strength'] == 3
+    assert t_object.as_dict()['pair'] == 'AUD_USD'
+    assert not hasattr(t_object, 'outcome')
+    with pytest.raises(AttributeError):
+        t_object.__dict__
+
+def test_lazy_period(t_object):
+    '''
+    Check that 'period' is initialized on first access
+    and discarded when 'start' changes
+    '''
+    assert 'period' not in t_object.as_dict()
+
+    cl = t_object.period
+    assert t_object.period is cl
+    assert 'period' in t_object.as_dict()
+
+    t_object.timeframe = 'H8'
+    assert t_object.period is cl
+    t_object.start = t_object.start+datetime.timedelta(days=1)
+    assert 'period' not in t_object.as_dict()
+    assert t_object.period is not cl
+
+def test_from_columns():
+    '''
+    Check that the Trades created from columns are
+    the same as the ones created with the constructor
+    '''
+    columns = {'id': ['EUR_AUD 04DEC2018D', 'AUD_USD 10APR2017D'],
+               'start': ['2018-12-03 22:00:00', datetime.datetime(2017, 4, 10, 14, 0)],
+               'end': ['2018-12-10 22:00:00', float('nan')],
+               'pair': ['EUR/AUD', 'AUD_USD'],
+               'timeframe': ['D', 'D'],
+               'type': ['long', 'short'],
+               'strat': ['counter', 'counter_b1'],
+               'entry': [1.54334, 0.74960],
+               'SL': [1.53398, 0.74718],
+               'RR': [1.5, float('nan')],
+               'TP': [float('nan'), 0.75592],
+               'strength': [1, 2]}
+    tlist = Trade.from_columns(columns)
+
+    for i, t in enumerate(tlist):
+        args = {k: v[i] for k, v in columns.items()}
+        expected = Trade(**args).as_dict()
+        # NaN != NaN
+        assert repr(t.as_dict()) == repr(expected)
+    assert tlist[0].TP == 1.5574
+    assert tlist[0].end == '2018-12-10 22:00:00'
+
+    with pytest.raises(Exception):
+        Trade.from_columns({'id': ['EUR_AUD 04DEC2018D'], 'start': ['2018-12-03 22:00:00'],
+                            'pair': ['EUR_AUD'], 'strat': ['counter'], 'RR': [float('nan')]})
@@ -1,8 +1,10 @@
 import pytest
 import os
 import pdb
+import datetime
 
 from trade_journal import TradeJournal
+from instrumentation import STATS, instrumented
 from pathlib import Path
 
 @pytest.fixture
@@ -15,6 +17,31 @@ def test_fetch_trades(tjO):
     tlist = tjO.fetch_trades()
 
     assert len(tlist) == 4
+    assert tlist[0].pair == 'GBP_AUD'
+    assert tlist[0].start == datetime.datetime(2018, 10, 11, 21, 0)
+
+def test_fetch_trades_end(tjO):
+    '''
+    'end' keeps the value read from the journal
+    '''
+    tjO.df['end'] = ['2018-10-20 21:00:00', float('nan'), '2018-11-02 21:00:00', float('nan')]
+    tlist = tjO.fetch_trades()
+
+    assert tlist[0].end == '2018-10-20 21:00:00'
+    assert tlist[2].end == '2018-11-02 21:00:00'
+    assert isinstance(tlist[1].end, float)
+
+def test_fetch_trades_init_period(tjO):
+    '''
+    The 'period' and 'trend_i' of the trades are not
+    calculated until they are first accessed
+    '''
+    tlist = tjO.fetch_trades(init_period=True)
+
+    assert len(tlist) == 4
+    for t in tlist:
+        assert 'period' not in t.as_dict()
+        assert 'trend_i' not in t.as_dict()
 
 def test_win_rate(tjO):
 
@@ -31,3 +58,54 @@ def test_write_tradelist(t_object_list, clean_tmp):
     td.write_tradelist(t_object_list, 'outsheet')
 
     assert os.path.exists(os.getenv('DATADIR') + "/testCounter1.xlsx") == 1
+
+def test_run_all(tjO):
+
+    df = tjO.run_all(strats="counter", overwrite=True)
+
+    assert len(df.index) == 3
+    assert df['outcome'].value_counts()['success'] == 2
+    assert df['outcome'].value_counts()['failure'] == 1
+    assert round(df['pips'].sum(), 2) == 274.5
+
+def test_fetch_trades_workers(tjO):
+    tlist = tjO.fetch_trades(init_period=True, workers=2)
+
+    assert len(tlist)+len(tjO.errors) == 4
+    assert [t.id for t in tlist] == [i for i in tjO.df['id'] if i not in dict(tjO.errors)]
+
+def _count(n):
+    STATS.count('items', n)
+    return n, None
+
+def test_pool_stats(tjO):
+    '''
+    The counters of the worker processes are merged into STATS
+    '''
+    with instrumented() as stats:
+        res = tjO._TradeJournal__run_pool(_count, [1, 2, 3], ['a', 'b', 'c'], 2)
+
+    assert res == [1, 2, 3]
+    assert stats.stats()['counters']['items'] == 6
+
+def test_win_rate_workers(tjO):
+
+    (number_s, number_f, tot_pips) = tjO.win_rate(strats="counter", workers=2)
+
+    assert number_s == 2
+    assert number_f == 1
+    assert tot_pips == 274.5
+
+def test_stats(tjO):
+    tjO.run_all(strats="counter", overwrite=True)
+    res = tjO.stats(by="strat")
+
+    assert res.loc['counter', 'wins'] == 2
+    assert res.loc['counter', 'losses'] == 1
+    assert round(res.loc['counter', 'pips'], 2) == 274.5
+
+def test_iter_trades(tjO):
+    tlist = list(tjO.iter_trades(chunksize=3))
+
+    assert [t.id for t in tlist] == list(tjO.df['id'])
+    assert tlist[0].pair == 'GBP_AUD'
@@ -0,0 +1,188 @@
+import pytest
+import asyncio
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from async_connect import AsyncConnect
+from trade import Trade
+from utils import candle_time
+
+class CandlesHandler(BaseHTTPRequestHandler):
+    '''
+    Local stand-in for the OANDA /v1/candles endpoint
+    serving one daily candle at 21:00 per day
+    '''
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.inflight += 1
+            server.max_inflight = max(server.max_inflight, server.inflight)
+            server.clients.add(self.client_address)
+            server.tokens.add(self.headers.get('Authorization'))
+        time.sleep(0.02)
+        params = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        start = datetime.datetime.fromisoformat(params['start'])
+        t = start.replace(hour=21, minute=0, second=0)
+        if t < start:
+            t += datetime.timedelta(days=1)
+        end = None
+        if 'end' in params:
+            end = datetime.datetime.fromisoformat(params['end'])
+        count = int(params.get('count', 5000))
+        candles = []
+        while len(candles) < count and (end is None or t < end):
+            price = 1+t.toordinal() % 100/1000
+            candles.append({'time': t.strftime('%Y-%m-%dT%H:%M:%S.000000Z'),
+                            'openBid': price, 'highBid': price+0.001, 'lowBid': price-0.001,
+                            'closeBid': price, 'openAsk': price, 'highAsk': price+0.001,
+                            'lowAsk': price-0.001, 'closeAsk': price, 'volume': 10,
+                            'complete': True})
+            t += datetime.timedelta(days=1)
+        body = json.dumps({'instrument': params['instrument'],
+                           'granularity': params['granularity'],
+                           'candles': candles}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.inflight -= 1
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def candles_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CandlesHandler)
+    server.lock = threading.Lock()
+    server.inflight = server.max_inflight = 0
+    server.clients = set()
+    server.tokens = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def url(server):
+    return "http://127.0.0.1:{0}/v1/candles?".format(server.server_address[1])
+
+def test_query(candles_server):
+    async def run():
+        async with AsyncConnect(url=url(candles_server), token='test') as conn:
+            return await conn.query('EUR_AUD', 'D',
+                                    datetime.datetime(2018, 12, 3, 21, 0),
+                                    end=datetime.datetime(2018, 12, 6, 21, 0))
+
+    res = asyncio.run(run())
+
+    assert res['instrument'] == 'EUR_AUD'
+    assert [c['time'] for c in res['candles']] == ['2018-12-03T21:00:00.000000Z',
+                                                   '2018-12-04T21:00:00.000000Z',
+                                                   '2018-12-05T21:00:00.000000Z']
+    assert candles_server.tokens == {'Bearer test'}
+
+def test_token():
+    with pytest.raises(ValueError):
+        AsyncConnect(url='http://127.0.0.1/v1/candles?')
+
+def test_max_per_host(candles_server):
+    '''
+    Check that the requests in flight are capped and that
+    the connections are reused
+    '''
+    async def run():
+        async with AsyncConnect(url=url(candles_server), max_per_host=3, token='test') as conn:
+            return await asyncio.gather(*[conn.query('EUR_AUD', 'D',
+                                                     datetime.datetime(2018, 1, 1)+datetime.timedelta(days=x),
+                                                     count=1) for x in range(30)])
+
+    res = asyncio.run(run())
+
+    assert len(res) == 30
+    assert candles_server.max_inflight <= 3
+    assert len(candles_server.clients) <= 3
+
+def test_event_loops(candles_server):
+    '''
+    The same AsyncConnect can be used by several event loops
+    '''
+    conn = AsyncConnect(url=url(candles_server), max_per_host=2, token='test')
+
+    async def run():
+        return await asyncio.gather(*[conn.query('EUR_AUD', 'D',
+                                                 datetime.datetime(2018, 1, 1)+datetime.timedelta(days=x),
+                                                 count=1) for x in range(6)])
+
+    try:
+        assert len(asyncio.run(run())) == 6
+        assert len(asyncio.run(run())) == 6
+    finally:
+        conn.close()
+    assert candles_server.max_inflight <= 2
+
+def test_pool_threads(candles_server):
+    '''
+    The pooled connections are not shared by the threads
+    '''
+    conn = AsyncConnect(url=url(candles_server), token='test')
+    parts = urlsplit(url(candles_server))
+    path = "{0}?instrument=EUR_AUD&granularity=D&start=2018-01-01T00:00:00&count=1".format(parts.path)
+    conn._request(parts, path)
+    errors = []
+
+    def request():
+        try:
+            for x in range(20):
+                conn._request(parts, path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=request) for x in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    conn.close()
+
+    assert errors == []
+
+def test_fetch_window(candles_server):
+    date_list = [datetime.datetime(2018, 12, 3, 22, 0)+datetime.timedelta(days=x) for x in range(10)]
+
+    async def run():
+        async with AsyncConnect(url=url(candles_server), token='test') as conn:
+            return await conn.fetch_window('EUR_AUD', 'D', date_list)
+
+    aligned = asyncio.run(run())
+
+    assert len(aligned) == 10
+    assert candle_time(aligned[0]) == datetime.datetime(2018, 12, 4, 21, 0)
+
+def test_afetch_candlelist(candles_server):
+    t = Trade(
+        start="2017-04-10 14:00:00",
+        end="2017-04-26 14:00:00",
+        entry=0.74960,
+        TP=0.75592,
+        SL=0.74718,
+        pair="AUD/USD",
+        type="long",
+        timeframe="D",
+        strat="counter_b1",
+        id="AUD_USD 10APR2017D")
+
+    async def run():
+        async with AsyncConnect(url=url(candles_server), token='test') as conn:
+            return await t.afetch_candlelist(conn)
+
+    cl = asyncio.run(run())
+
+    assert len(cl.data['candles']) == 16
@@ -0,0 +1,21 @@
+import pytest
+
+from benchmarks.run_benchmarks import compare, measure
+
+def test_compare():
+    baseline = {'cases': {'win_rate[100]': {'throughput': 100.0, 'peak_mb': 10.0},
+                          'journal_load[100]': {'throughput': 1000.0, 'peak_mb': 1.0}}}
+    results = {'cases': {'win_rate[100]': {'throughput': 70.0, 'peak_mb': 10.0},
+                         'journal_load[100]': {'throughput': 900.0, 'peak_mb': 1.5},
+                         'fetch_trades[100]': {'throughput': 1.0, 'peak_mb': 1.0}}}
+
+    regressions = compare(results, baseline, tolerance=0.2)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('win_rate[100]: throughput')
+    assert regressions[1].startswith('journal_load[100]: peak memory')
+
+def test_measure():
+    res = measure(lambda: lambda: 10)
+
+    assert res['items'] == 10
+    assert res['peak_mb'] >= 0
@@ -0,0 +1,94 @@
+import pytest
+import datetime
+
+from candle_cache import CandleCache
+
+class Fetcher(object):
+    '''
+    Generates one candle per hour and records
+    the requested ranges
+    '''
+    def __init__(self):
+        self.ranges = []
+
+    def __call__(self, start, end):
+        self.ranges.append((start, end))
+        candles = []
+        t = start
+        while t < end:
+            candles.append({'time': t, 'closeAsk': 1.0})
+            t += datetime.timedelta(hours=1)
+        return candles
+
+def dt(hour):
+    return datetime.datetime(2018, 1, 1)+datetime.timedelta(hours=hour)
+
+def test_get_range():
+    cache = CandleCache()
+    fetch = Fetcher()
+
+    candles = cache.get_range('EUR_JPY', 'H1', dt(0), dt(10), fetch)
+    assert len(candles) == 10
+    assert cache.misses == 1
+
+    # sub-range is served by slicing
+    candles = cache.get_range('EUR_JPY', 'H1', dt(2), dt(5), fetch)
+    assert [c['time'] for c in candles] == [dt(2), dt(3), dt(4)]
+    assert cache.hits == 1
+    assert len(fetch.ranges) == 1
+
+    # only the missing part is fetched and the ranges are merged
+    candles = cache.get_range('EUR_JPY', 'H1', dt(5), dt(15), fetch)
+    assert len(candles) == 10
+    assert fetch.ranges[-1] == (dt(10), dt(15))
+    assert cache.stats()['candles'] == 15
+
+def test_copies():
+    '''
+    Candles returned by the cache can be modified
+    without affecting the cached ones
+    '''
+    cache = CandleCache()
+    fetch = Fetcher()
+
+    candles = cache.get_range('EUR_JPY', 'H1', dt(0), dt(3), fetch)
+    candles[0]['rsi'] = 50
+
+    assert 'rsi' not in cache.get_range('EUR_JPY', 'H1', dt(0), dt(3), fetch)[0]
+
+def test_first_after():
+    cache = CandleCache()
+    fetch = Fetcher()
+    cache.get_range('EUR_JPY', 'H1', dt(0), dt(3), fetch)
+
+    assert cache.first_after('EUR_JPY', 'H1', dt(1))['time'] == dt(1)
+    assert cache.first_after('EUR_JPY', 'H1', dt(5)) is None
+
+def test_eviction():
+    cache = CandleCache(max_bytes=1)
+    fetch = Fetcher()
+    cache.get_range('EUR_JPY', 'H1', dt(0), dt(3), fetch)
+    cache.get_range('EUR_GBP', 'H1', dt(0), dt(3), fetch)
+
+    assert cache.evictions == 1
+    assert cache.stats()['keys'] == 1
+    assert cache.lookup('EUR_JPY', 'H1', dt(0), dt(3)) is None
+
+def test_put_incomplete():
+    '''
+    Incomplete candles are not cached, so they are fetched again
+    '''
+    cache = CandleCache()
+    fetch = Fetcher()
+    candles = fetch(dt(0), dt(10))
+    candles[-1]['complete'] = False
+    cache.put('EUR_JPY', 'H1', dt(0), dt(10), candles)
+
+    assert cache.lookup('EUR_JPY', 'H1', dt(0), dt(9)) is not None
+    assert cache.lookup('EUR_JPY', 'H1', dt(0), dt(10)) is None
+    assert cache.gaps('EUR_JPY', 'H1', dt(0), dt(10)) == [(dt(9), dt(10))]
+
+    fetch = Fetcher()
+    res = cache.get_range('EUR_JPY', 'H1', dt(5), dt(12), fetch)
+    assert fetch.ranges == [(dt(9), dt(12))]
+    assert [c['time'] for c in res] == [dt(x) for x in range(5, 12)]
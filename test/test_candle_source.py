@@ -0,0 +1,72 @@
+import pytest
+import datetime
+
+from candle_cache import CANDLE_CACHE
+from candle_source import align_candles, chunk_sizes, stream_window, fetch_window
+from utils import candle_time
+
+def test_candle_time():
+    assert candle_time({'time': '2017-04-10T21:00:00.000000Z'}) == datetime.datetime(2017, 4, 10, 21, 0)
+    assert candle_time({'time': datetime.datetime(2017, 4, 10, 21, 0)}) == datetime.datetime(2017, 4, 10, 21, 0)
+
+def test_align_candles():
+    '''
+    Datetimes falling on a closed market get the next candle,
+    datetimes after the last candle get None
+    '''
+    candles = [{'time': datetime.datetime(2020, 5, 14, 21, 0)},
+               {'time': datetime.datetime(2020, 5, 17, 21, 0)}]
+    date_list = [datetime.datetime(2020, 5, 14, 21, 0),
+                 datetime.datetime(2020, 5, 15, 21, 0),
+                 datetime.datetime(2020, 5, 16, 21, 0),
+                 datetime.datetime(2020, 5, 18, 21, 0)]
+
+    aligned = align_candles(date_list, candles)
+
+    assert aligned == [candles[0], candles[1], candles[1], None]
+
+def test_chunk_sizes():
+    assert list(chunk_sizes(300)) == [1, 8, 64, 227]
+    assert list(chunk_sizes(5)) == [1, 4]
+    assert list(chunk_sizes(0)) == []
+
+def test_stream_window():
+    '''
+    Chunks are only taken from the history when requested
+    '''
+    history = [{'time': datetime.datetime(2020, 1, 1)+datetime.timedelta(days=ix)} for ix in range(100)]
+    date_list = [c['time'] for c in history[:80]]
+
+    chunks = stream_window('EUR_AUD', 'D', date_list, candles=history)
+    assert next(chunks) == history[:1]
+    assert next(chunks) == history[1:9]
+    assert [c for chunk in chunks for c in chunk] == history[9:80]
+
+def test_fetch_window_now():
+    '''
+    A window going beyond now is truncated at the
+    last candle, without querying the datetimes after it
+    '''
+    last = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)-datetime.timedelta(hours=1)
+    history = [{'time': last-datetime.timedelta(days=ix)} for ix in reversed(range(13))]
+    date_list = [history[0]['time']+datetime.timedelta(days=ix) for ix in range(300)]
+
+    assert fetch_window('EUR_AUD', 'D', date_list, candles=history) == history
+    chunks = stream_window('EUR_AUD', 'D', date_list, candles=history)
+    assert [c for chunk in chunks for c in chunk] == history
+
+def test_fetch_window_history():
+    '''
+    Datetimes after the last candle of the history are
+    fetched with a ranged query (here from CANDLE_CACHE)
+    '''
+    start = datetime.datetime(2020, 1, 1)
+    candles = [{'time': start+datetime.timedelta(days=ix)} for ix in range(30)]
+    CANDLE_CACHE.clear()
+    CANDLE_CACHE.put('EUR_AUD', 'D', start+datetime.timedelta(days=10),
+                     start+datetime.timedelta(days=30), candles[10:])
+
+    aligned = fetch_window('EUR_AUD', 'D', [c['time'] for c in candles[:20]], candles=candles[:10])
+    CANDLE_CACHE.clear()
+
+    assert aligned == candles[:20]
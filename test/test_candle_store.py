@@ -0,0 +1,77 @@
+import pytest
+import datetime
+import numpy as np
+
+from candle_store import CandleStore, to_epoch
+
+def make_candles(start, n):
+    candles = []
+    for x in range(n):
+        price = 1+x/100
+        candles.append({'time': start+datetime.timedelta(days=x),
+                        'openBid': price, 'highBid': price, 'lowBid': price, 'closeBid': price,
+                        'openAsk': price, 'highAsk': price, 'lowAsk': price, 'closeAsk': price,
+                        'volume': x, 'complete': True})
+    return candles
+
+def dt(day):
+    return datetime.datetime(2018, 1, 1, 22)+datetime.timedelta(days=day)
+
+def test_write_read(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.write('EUR_AUD', 'D', dt(0), dt(10), make_candles(dt(0), 10))
+
+    candles = store.read('EUR_AUD', 'D', dt(2), dt(5))
+    assert [c['time'] for c in candles] == [dt(2), dt(3), dt(4)]
+    assert candles[0]['closeAsk'] == 1.02
+    assert store.read('EUR_AUD', 'D', dt(5), dt(15)) is None
+
+    rec = store.read_arrays('EUR_AUD', 'D', dt(2), dt(5))
+    assert isinstance(rec.base, np.memmap) or isinstance(rec, np.memmap)
+
+def test_append_and_merge(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.write('EUR_AUD', 'D', dt(0), dt(5), make_candles(dt(0), 5))
+    # appended
+    store.write('EUR_AUD', 'D', dt(5), dt(10), make_candles(dt(5), 5))
+    # merged
+    store.write('EUR_AUD', 'D', dt(-5), dt(1), make_candles(dt(-5), 6))
+
+    assert store.ranges('EUR_AUD', 'D') == [(to_epoch(dt(-5)), to_epoch(dt(10)))]
+    candles = store.read('EUR_AUD', 'D', dt(-5), dt(10))
+    assert [c['time'] for c in candles] == [dt(x) for x in range(-5, 10)]
+
+def test_incomplete(tmp_path):
+    store = CandleStore(str(tmp_path))
+    candles = make_candles(dt(0), 5)
+    candles[-1]['complete'] = False
+    store.write('EUR_AUD', 'D', dt(0), dt(5), candles)
+
+    assert store.covers('EUR_AUD', 'D', dt(0), dt(4)) is True
+    assert store.covers('EUR_AUD', 'D', dt(0), dt(5)) is False
+
+def test_write_now(tmp_path):
+    '''
+    A range going beyond now is only covered
+    until the end of the last candle
+    '''
+    store = CandleStore(str(tmp_path))
+    start = datetime.datetime.now().replace(hour=22, minute=0, second=0, microsecond=0)-datetime.timedelta(days=5)
+    store.write('EUR_AUD', 'D', start, start+datetime.timedelta(days=30), make_candles(start, 4))
+
+    assert store.covers('EUR_AUD', 'D', start, start+datetime.timedelta(days=4)) is True
+    assert store.covers('EUR_AUD', 'D', start, start+datetime.timedelta(days=5)) is False
+
+def test_ranges_cached(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.write('EUR_AUD', 'D', dt(0), dt(5), make_candles(dt(0), 5))
+    assert store.covers('EUR_AUD', 'D', dt(0), dt(5)) is True
+
+    # the ranges are not read again from the .json file
+    (tmp_path / "EUR_AUD_D.json").write_text("[]")
+    assert store.covers('EUR_AUD', 'D', dt(0), dt(5)) is True
+    assert CandleStore(str(tmp_path)).covers('EUR_AUD', 'D', dt(0), dt(5)) is False
+
+    # but they are updated by 'write'
+    store.write('EUR_AUD', 'D', dt(5), dt(10), make_candles(dt(5), 5))
+    assert store.covers('EUR_AUD', 'D', dt(0), dt(10)) is True
@@ -0,0 +1,78 @@
+import pytest
+import dataclasses
+
+from config import CONFIG, create_config, load_settings, get_settings, reload_settings
+from utils import correct_timeframe
+
+def test_load_settings():
+    settings = load_settings(CONFIG)
+
+    assert settings.general.bit == 'Ask'
+    assert settings.trade.hr_pips == CONFIG.getint('trade', 'hr_pips')
+    assert settings.trade.granularity == CONFIG.get('trade', 'granularity')
+    assert settings.trade_bot.RR == CONFIG.getfloat('trade_bot', 'RR')
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        settings.trade.hr_pips = 2
+    assert settings.trade_bot.period_range == CONFIG.getint('trade_bot', 'period_range')
+    assert settings.sessions.windows[0] == ('asian', 23*3600, 7*3600)
+    assert settings.sessions.tz is None
+    assert settings.indicators.use_store is False
+
+def test_load_settings_invalid():
+    parser = create_config()
+    parser.set('general', 'bit', 'Mid')
+    with pytest.raises(ValueError):
+        load_settings(parser)
+
+    parser = create_config()
+    parser.remove_option('trade', 'numperiods')
+    with pytest.raises(ValueError):
+        load_settings(parser)
+
+    parser = create_config()
+    parser.set('sessions', 'windows', 'asian=23:00')
+    with pytest.raises(ValueError):
+        load_settings(parser)
+
+def test_reload_settings():
+    assert get_settings() is get_settings()
+
+    parser = create_config()
+    parser.set('trade', 'numperiods', '50')
+    try:
+        assert reload_settings(parser).trade.numperiods == 50
+        assert get_settings().trade.numperiods == 50
+    finally:
+        reload_settings()
+    assert get_settings().trade.numperiods == CONFIG.getint('trade', 'numperiods')
+
+def test_settings_config_set():
+    numperiods = CONFIG.get('trade', 'numperiods')
+    assert get_settings().trade.numperiods == int(numperiods)
+
+    CONFIG.set('trade', 'numperiods', '50')
+    try:
+        assert get_settings().trade.numperiods == 50
+    finally:
+        CONFIG.set('trade', 'numperiods', numperiods)
+    assert get_settings().trade.numperiods == int(numperiods)
+
+    # other parsers do not modify the settings
+    parser = create_config()
+    parser.set('trade', 'numperiods', '50')
+    assert get_settings().trade.numperiods == int(numperiods)
+
+def test_correct_timeframe():
+    parser = create_config()
+    corrected = correct_timeframe(parser, 'H12')
+
+    assert corrected is not parser
+    assert corrected.getint('harea', 'hr_pips') == 50
+    assert corrected.getint('trade', 'hr_pips') == parser.getint('trade', 'hr_pips')
+    # the original settings are not modified
+    assert parser.getint('harea', 'hr_pips') == 100
+
+    settings = correct_timeframe(load_settings(parser), 'H12')
+    assert settings.harea.hr_pips == 50
+    assert settings.trade_bot.add_pips == 100
+    assert settings.trade.hr_pips == parser.getint('trade', 'hr_pips')
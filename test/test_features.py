@@ -0,0 +1,25 @@
+import pytest
+
+from features import FEATURES, register_feature, calc_features
+
+def test_calc_features(tjO):
+    register_feature('SL_pips', lambda t: round(abs(t.entry-t.SL), 4), candles=False)
+    try:
+        df = calc_features(tjO, names=['SL_pips'])
+    finally:
+        del FEATURES['SL_pips']
+
+    assert list(df.columns) == ['SL_pips']
+    assert df['SL_pips'].notnull().all()
+    assert tjO.errors == []
+
+def test_calc_features_candles(tjO):
+    df = tjO.calc_features(names="adr,max_min_rsi")
+
+    assert len(df.index) == 4
+    assert len(tjO.errors) == 0
+    assert df['adr'].notnull().all()
+
+def test_unknown_feature(tjO):
+    with pytest.raises(ValueError):
+        calc_features(tjO, names=['unknown'])
@@ -0,0 +1,109 @@
+import pytest
+import datetime
+import numpy as np
+
+from indicators import IndicatorSeries, IndicatorStore, concat_series
+from candle_store import to_epoch
+from trade import Trade
+
+def test_slice():
+    start = datetime.datetime(2018, 12, 3, 22, 0)
+    times = np.array([to_epoch(start+datetime.timedelta(days=x)) for x in range(10)])
+    series = IndicatorSeries(start, start+datetime.timedelta(days=10), times, np.arange(10.0))
+
+    assert series.covers(start, start+datetime.timedelta(days=5))
+    assert not series.covers(start-datetime.timedelta(days=1), start)
+    assert list(series.slice(start+datetime.timedelta(days=2),
+                             start+datetime.timedelta(days=4))) == [2.0, 3.0]
+
+def test_rsi_same_as_period():
+    t = Trade(
+        start="2018-12-03 22:00:00",
+        entry=1.54334,
+        SL=1.53398,
+        TP=1.55752,
+        pair="EUR_AUD",
+        type="long",
+        timeframe="D",
+        strat="counter",
+        id="EUR_AUD 04DEC2018D")
+    store = IndicatorStore()
+    (start, end) = t.period_bounds()
+    store.prepare(t.pair, t.timeframe, start-datetime.timedelta(days=100), end)
+
+    rsi = store.rsi(t.pair, t.timeframe, start, end)
+    period = t.initclist()
+
+    assert store.calcs == 1
+    assert len(rsi) == len(period.data['candles'])
+    assert rsi[-1] == pytest.approx(period.data['candles'][-1]['rsi'], abs=0.01)
+
+def test_trend_i_memoized():
+    store = IndicatorStore()
+    calls = []
+
+    def calc():
+        calls.append(1)
+        return datetime.datetime(2018, 1, 1)
+
+    args = ('EUR_AUD', 'D', 'long', datetime.datetime(2017, 1, 1), datetime.datetime(2018, 1, 1))
+    assert store.trend_i(*args, calc) == datetime.datetime(2018, 1, 1)
+    assert store.trend_i(*args, calc) == datetime.datetime(2018, 1, 1)
+    assert len(calls) == 1
+
+def test_reserve():
+    t = Trade(
+        start="2018-12-03 22:00:00",
+        entry=1.54334,
+        SL=1.53398,
+        TP=1.55752,
+        pair="EUR_AUD",
+        type="long",
+        timeframe="D",
+        strat="counter",
+        id="EUR_AUD 04DEC2018D")
+    store = IndicatorStore()
+    (start, end) = t.period_bounds()
+    store.reserve(t.pair, t.timeframe, start, end+datetime.timedelta(days=30))
+
+    assert store.calcs == 0
+    store.rsi(t.pair, t.timeframe, start, end)
+    store.rsi(t.pair, t.timeframe, start, end+datetime.timedelta(days=30))
+    assert store.calcs == 1
+
+def test_prepare_extend(monkeypatch):
+    '''
+    Only the candles out of the range already calculated
+    are calculated when the range is extended
+    '''
+    ranges = []
+    day = datetime.timedelta(days=1)
+
+    def calc(instrument, granularity, start, end):
+        ranges.append((start, end))
+        days = [start+day*x for x in range((end-start).days)]
+        times = np.array([to_epoch(d) for d in days], dtype=np.int64)
+        return IndicatorSeries(start, end, times, np.array([d.day for d in days], dtype=float))
+
+    store = IndicatorStore()
+    monkeypatch.setattr(store, '_IndicatorStore__calc_rsi', calc)
+    start = datetime.datetime(2018, 1, 1)
+    store.prepare('EUR_AUD', 'D', start, start+day*10)
+    store.prepare('EUR_AUD', 'D', start+day*5, start+day*20)
+    store.prepare('EUR_AUD', 'D', start-day*5, start+day*25)
+
+    assert ranges == [(start, start+day*10), (start+day*10, start+day*20),
+                      (start-day*5, start), (start+day*20, start+day*25)]
+    rsi = store.rsi('EUR_AUD', 'D', start-day*5, start+day*25)
+    assert rsi.tolist() == [float((start+day*x).day) for x in range(-5, 25)]
+
+def test_concat_series():
+    start = datetime.datetime(2018, 1, 1)
+    day = datetime.timedelta(days=1)
+    times = np.array([to_epoch(start+day*x) for x in range(3)])
+    a = IndicatorSeries(start, start+day*2, times, np.arange(3.0))
+    b = IndicatorSeries(start+day*2, start+day*3, times[2:], np.array([5.0]))
+
+    series = concat_series([a, b])
+    assert series.values.tolist() == [0.0, 1.0, 5.0]
+    assert series.covers(start, start+day*3)
@@ -0,0 +1,77 @@
+import pytest
+import json
+import pstats
+
+from candle_cache import CandleCache
+from instrumentation import Instrumentation, STATS, timed, instrumented
+
+def test_disabled():
+    stats = Instrumentation()
+    stats.count('api_queries')
+    with stats.timer('api_query'):
+        pass
+
+    assert stats.stats() == {'counters': {}, 'timers': {}}
+
+def test_counters_timers():
+    stats = Instrumentation(enabled=True)
+    stats.count('api_queries')
+    stats.count('candles_fetched', 500)
+    for _ in range(3):
+        with stats.timer('api_query'):
+            pass
+
+    res = stats.stats()
+    assert res['counters'] == {'api_queries': 1, 'candles_fetched': 500}
+    assert res['timers']['api_query']['calls'] == 3
+    assert res['timers']['api_query']['min'] <= res['timers']['api_query']['max']
+
+    stats.reset()
+    assert stats.stats() == {'counters': {}, 'timers': {}}
+
+def test_merge():
+    stats = Instrumentation(enabled=True)
+    stats.count('api_queries')
+    stats.add_time('api_query', 2.0)
+    worker = Instrumentation(enabled=True)
+    worker.count('api_queries', 2)
+    worker.add_time('api_query', 1.0)
+    worker.add_time('calc_rsi', 3.0)
+
+    stats.merge(worker.stats())
+    res = stats.stats()
+    assert res['counters'] == {'api_queries': 3}
+    assert res['timers']['api_query'] == {'calls': 2, 'total': 3.0, 'mean': 1.5,
+                                          'min': 1.0, 'max': 2.0}
+    assert res['timers']['calc_rsi']['calls'] == 1
+
+@timed('double')
+def double(x):
+    return 2*x
+
+def test_instrumented(tmp_path):
+    json_file = str(tmp_path / "run.json")
+    pstats_file = str(tmp_path / "run.pstats")
+    enabled = STATS.enabled
+
+    assert double(1) == 2
+    with instrumented(json_file=json_file, pstats_file=pstats_file) as stats:
+        assert double(2) == 4
+        # cache misses are counted
+        CandleCache().first_after('EUR_JPY', 'H1', None)
+
+    assert STATS.enabled is enabled
+    with open(json_file) as f:
+        res = json.load(f)
+    assert res['timers']['double']['calls'] == 1
+    assert res['counters']['cache_misses'] == 1
+    assert pstats.Stats(pstats_file).total_calls > 0
+
+def test_run_trade_stats(t_object):
+    with instrumented() as stats:
+        t_object.run_trade(expires=2)
+
+    res = stats.stats()
+    assert res['timers']['run_trade']['calls'] == 1
+    assert res['timers']['get_cross_time']['calls'] >= 1
+    assert res['counters']['api_queries'] >= 1
@@ -0,0 +1,70 @@
+import pytest
+import os
+import datetime
+import pandas as pd
+
+from journal_cache import cache_path, load_cached, store_cached
+from journal_writer import JournalWriter, append_rows
+from trade_journal import TradeJournal
+
+COLNAMES = ['id', 'timeframe', 'strat', 'start', 'entry', 'SL', 'TP', 'type']
+
+def row(x):
+    return ["EUR_AUD {0}".format(x), 'D', 'counter',
+            datetime.datetime(2018, 12, 3, 22, 0)+datetime.timedelta(days=x),
+            1.54334, 1.53398, 'n.a.', 'long']
+
+@pytest.fixture(autouse=True)
+def user_cache(tmp_path, monkeypatch):
+    '''Cache files are written to a temporary directory'''
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "cache"))
+
+@pytest.fixture
+def journal_url(tmp_path):
+    '''Returns the path to a .xlsx file with 3 trades'''
+    url = str(tmp_path / "journal.xlsx")
+    with JournalWriter(url, 'trading_journal', colnames=COLNAMES) as writer:
+        for x in range(3):
+            writer.add_row(row(x))
+    return url
+
+def test_store_load(journal_url):
+    df = pd.DataFrame({'id': ['EUR_AUD 0']})
+    assert load_cached(journal_url, 'trading_journal') is None
+
+    store_cached(journal_url, 'trading_journal', df)
+
+    path = cache_path(journal_url, 'trading_journal')
+    assert os.path.basename(path).startswith('journal.xlsx.')
+    # nothing is written next to the workbook
+    assert os.path.dirname(path) != os.path.dirname(journal_url)
+    assert sorted(os.listdir(os.path.dirname(journal_url))) == ['cache', 'journal.xlsx']
+    assert load_cached(journal_url, 'trading_journal').equals(df)
+    assert load_cached(journal_url, 'other') is None
+
+def test_cached_journal(journal_url, monkeypatch):
+    td = TradeJournal(url=journal_url, worksheet="trading_journal", cache=True)
+    assert os.path.exists(cache_path(journal_url, 'trading_journal'))
+
+    # the second TradeJournal does not parse the .xlsx file
+    def fail(*args, **kwargs):
+        raise AssertionError("worksheet parsed")
+    monkeypatch.setattr(pd, 'ExcelFile', fail)
+    td2 = TradeJournal(url=journal_url, worksheet="trading_journal", cache=True)
+
+    assert td2.df.equals(td.df)
+    assert td2.df['start'].iloc[0] == '2018-12-03 22:00:00'
+    assert td2.df['TP'].isnull().all()
+
+def test_invalidated(journal_url):
+    TradeJournal(url=journal_url, worksheet="trading_journal", cache=True)
+
+    append_rows(journal_url, 'trading_journal', COLNAMES, [row(3)])
+    td = TradeJournal(url=journal_url, worksheet="trading_journal", cache=True)
+
+    assert len(td.df.index) == 4
+
+def test_cache_default(journal_url):
+    TradeJournal(url=journal_url, worksheet="trading_journal")
+
+    assert not os.path.exists(cache_path(journal_url, 'trading_journal'))
@@ -0,0 +1,62 @@
+import pytest
+import os
+import datetime
+import numpy as np
+import pandas as pd
+
+from journal_reader import read_chunks
+from journal_writer import JournalWriter
+
+@pytest.fixture
+def journal_url(tmp_path):
+    '''Returns the path to a .xlsx file with 25 trades'''
+    url = str(tmp_path / "journal.xlsx")
+    colnames = ['id', 'start', 'entry', 'SL ', 'TP', 'strat']
+    with JournalWriter(url, 'trading_journal', colnames=colnames) as writer:
+        for x in range(25):
+            writer.add_row(["EUR_AUD {0}".format(x),
+                            datetime.datetime(2018, 12, 3, 22, 0)+datetime.timedelta(days=x),
+                            1.54334, 1.53398, 'n.a.' if x % 5 == 0 else 1.55752, 'counter'])
+    return url
+
+def test_read_chunks(journal_url):
+    chunks = list(read_chunks(journal_url, 'trading_journal', columns=None, chunksize=10))
+
+    assert [len(c.index) for c in chunks] == [10, 10, 5]
+    df = pd.concat(chunks)
+    assert list(df.columns) == ['id', 'start', 'entry', 'SL', 'TP', 'strat']
+    assert df['start'].iloc[0] == '2018-12-03 22:00:00'
+    assert df['TP'].isnull().sum() == 5
+
+def test_read_chunks_columns(journal_url):
+    chunks = list(read_chunks(journal_url, 'trading_journal', columns=['start', 'SL'], chunksize=10))
+
+    assert list(chunks[0].columns) == ['start', 'SL']
+    assert chunks[-1]['SL'].iloc[-1] == 1.53398
+
+def test_read_chunks_same_as_parse():
+    url = os.getenv('DATADIR')+"/testCounter.xlsx"
+    df = pd.ExcelFile(url).parse('trading_journal', converters={'start': str, 'end': str, 'trend_i': str})
+    df = df.replace('n.a.', np.nan)
+    df.columns = df.columns.str.rstrip()
+
+    chunked = pd.concat(read_chunks(url, 'trading_journal', columns=list(df.columns), chunksize=2),
+                        ignore_index=True)
+
+    assert chunked['start'].tolist() == df['start'].tolist()
+    assert chunked['TP'].isnull().tolist() == df['TP'].isnull().tolist()
+
+def test_read_chunks_empty_cells(tmp_path):
+    '''
+    Empty cells are NaN, as in pd.ExcelFile.parse
+    '''
+    url = str(tmp_path / "journal.xlsx")
+    with JournalWriter(url, 'trading_journal', colnames=['id', 'RR', 'strat']) as writer:
+        writer.add_row(["EUR_AUD 0", None, None])
+        writer.add_row(["EUR_AUD 1", None, 'counter'])
+
+    df = pd.concat(read_chunks(url, 'trading_journal', columns=None, chunksize=1))
+
+    assert df['RR'].map(lambda v: isinstance(v, float) and np.isnan(v)).all()
+    assert df['strat'].isnull().tolist() == [True, False]
+    assert df['strat'].iloc[0] is not None
@@ -0,0 +1,86 @@
+import pytest
+import math
+import pandas as pd
+
+from journal_stats import r_multiples, session_labels, calc_stats, breakdown
+
+@pytest.fixture
+def trades_df():
+    '''Returns a DataFrame with the columns set by TradeJournal.run_all'''
+    return pd.DataFrame({
+        'id': ['EUR_AUD 04DEC2018D', 'GBP_AUD 11OCT2018H12', 'EUR_AUD 10DEC2018D',
+               'EUR_AUD 12DEC2018D', 'NZD_USD 07NOV2008D', 'CAD_JPY 24APR2007D'],
+        'strat': ['counter', 'counter', 'counter', 'counter', 'cont', 'counter'],
+        'timeframe': ['D', 'H12', 'D', 'D', 'D', 'D'],
+        'start': ['2018-12-03 22:00:00', '2018-10-11 21:00:00', '2018-12-09 22:00:00',
+                  '2018-12-11 22:00:00', '2008-11-06 22:00:00', '2007-04-23 22:00:00'],
+        'entry': [1.5, 1.8, 1.5, 1.5, 0.58, 105.3],
+        'SL': [1.49, 1.81, 1.49, 1.49, 0.59, 106.0],
+        'exit': [1.52, 1.79, 1.49, 1.49, 0.59, 'n.a.'],
+        'outcome': ['success', 'success', 'failure', 'failure', 'failure', 'n.a.'],
+        'entry_time': ['2018-12-04T08:00:00', '2018-10-12T13:00:00', '2018-12-10T02:00:00',
+                       '2018-12-12T08:00:00', '2008-11-07T21:00:00', None],
+        'pips': [200.0, 100.0, -100.0, -100.0, -100.0, 0]})
+
+def test_r_multiples(trades_df):
+    R = r_multiples(trades_df)
+
+    assert list(R[:5]) == [2.0, 1.0, -1.0, -1.0, -1.0]
+    assert math.isnan(R[5])
+
+def test_session_labels(trades_df):
+    sessions = session_labels(trades_df)
+
+    assert list(sessions) == ['european', 'european,namerican', 'asian',
+                              'european', 'nosession', 'n.a.']
+
+def test_calc_stats(trades_df):
+    res = calc_stats(trades_df)
+
+    assert res.loc['all', 'trades'] == 5
+    assert res.loc['all', 'wins'] == 2
+    assert res.loc['all', 'win_rate'] == 40
+    assert res.loc['all', 'pips'] == 0
+    assert res.loc['all', 'expectancy'] == 0
+    assert res.loc['all', 'profit_factor'] == 1
+    # trades sorted by start: -100, 100, 200, -100, -100
+    assert res.loc['all', 'max_drawdown'] == 200
+    assert res.loc['all', 'max_losing_streak'] == 2
+    assert res.loc['all', 'R_mean'] == 0
+
+def test_calc_stats_by(trades_df):
+    res = calc_stats(trades_df, by=['strat', 'pair'])
+
+    assert res.loc[('counter', 'EUR_AUD'), 'trades'] == 3
+    assert res.loc[('counter', 'EUR_AUD'), 'pips'] == 0
+    assert res.loc[('counter', 'EUR_AUD'), 'max_drawdown'] == 200
+    assert res.loc[('counter', 'GBP_AUD'), 'profit_factor'] == math.inf
+    assert res.loc[('cont', 'NZD_USD'), 'max_losing_streak'] == 1
+
+def test_calc_stats_interleaved():
+    '''
+    The losing streak is calculated within each group,
+    even if the trades of the groups are interleaved
+    '''
+    df = pd.DataFrame({'id': ['EUR_AUD {0}'.format(ix) for ix in range(6)],
+                       'strat': ['a', 'b', 'a', 'b', 'a', 'a'],
+                       'start': ['2018-12-0{0} 22:00:00'.format(ix+1) for ix in range(6)],
+                       'entry': [1.5]*6,
+                       'SL': [1.49]*6,
+                       'exit': [1.49, 1.52, 1.49, 1.52, 1.49, 1.52],
+                       'outcome': ['failure', 'success', 'failure', 'success', 'failure', 'success'],
+                       'pips': [-100.0, 200.0, -100.0, 200.0, -100.0, 200.0]})
+
+    res = calc_stats(df, by=['strat'])
+
+    assert res.loc['a', 'max_losing_streak'] == 3
+    assert res.loc['b', 'max_losing_streak'] == 0
+    assert res.loc['a', 'max_drawdown'] == 300
+
+def test_breakdown(trades_df):
+    res = breakdown(trades_df)
+
+    assert res.index[0] == ('all', 'all')
+    assert res.loc[('strat', 'counter'), 'trades'] == 4
+    assert res.loc[('timeframe', 'H12'), 'wins'] == 1
+    assert res.loc[('session', 'european'), 'trades'] == 2
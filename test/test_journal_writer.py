@@ -0,0 +1,120 @@
+import pytest
+import datetime
+import pandas as pd
+from openpyxl import load_workbook
+
+from journal_writer import JournalWriter, append_rows
+
+COLNAMES = ['id', 'start', 'entry', 'outcome', 'pips']
+
+def rows(n, offset=0):
+    return [["EUR_AUD {0}".format(x+offset),
+             datetime.datetime(2018, 12, 3, 22, 0)+datetime.timedelta(days=x+offset),
+             1.54334, 'success', 100.5] for x in range(n)]
+
+def test_write_new_workbook(tmp_path):
+    url = str(tmp_path / "journal.xlsx")
+    with JournalWriter(url, 'outsheet', colnames=COLNAMES, batch_size=4) as writer:
+        for row in rows(10):
+            writer.add_row(row)
+
+    df = pd.read_excel(url, sheet_name='outsheet')
+    assert list(df.columns) == COLNAMES
+    assert len(df.index) == 10
+    assert df['id'].iloc[-1] == 'EUR_AUD 9'
+    assert df['start'].iloc[0] == '2018-12-03 22:00:00'
+    assert df['pips'].sum() == 1005
+
+def test_append_existing_sheet(tmp_path):
+    url = str(tmp_path / "journal.xlsx")
+    with JournalWriter(url, 'outsheet', colnames=COLNAMES) as writer:
+        for row in rows(3):
+            writer.add_row(row)
+    with JournalWriter(url, 'other', colnames=COLNAMES) as writer:
+        writer.add_row(rows(1)[0])
+
+    assert append_rows(url, 'outsheet', COLNAMES, rows(2, offset=3)) is True
+    assert append_rows(url, 'missing', COLNAMES, rows(2)) is False
+
+    df = pd.read_excel(url, sheet_name='outsheet')
+    assert list(df['id']) == ["EUR_AUD {0}".format(x) for x in range(5)]
+    assert len(pd.read_excel(url, sheet_name='other').index) == 1
+    assert load_workbook(url)['outsheet'].max_row == 6
+
+def test_append_by_name(tmp_path):
+    '''
+    Rows are appended to a worksheet written by DataFrame.to_excel (with an
+    index column and shared strings) in the columns with the same name
+    '''
+    url = str(tmp_path / "journal.xlsx")
+    df = pd.DataFrame(rows(2), columns=COLNAMES)
+    df['start'] = df['start'].astype(str)
+    df.to_excel(url, sheet_name='outsheet')
+
+    # columns in a different order
+    order = ['pips', 'id', 'outcome', 'start', 'entry']
+    new = [[r[COLNAMES.index(c)] for c in order] for r in rows(2, offset=2)]
+    assert append_rows(url, 'outsheet', order, new) is True
+
+    res = pd.read_excel(url, sheet_name='outsheet', index_col=0)
+    assert list(res.columns) == COLNAMES
+    assert list(res['id']) == ["EUR_AUD {0}".format(x) for x in range(4)]
+    assert list(res['pips']) == [100.5]*4
+    assert res['start'].iloc[-1] == '2018-12-06 22:00:00'
+
+    with pytest.raises(ValueError):
+        append_rows(url, 'outsheet', ['id', 'SL'], [['EUR_AUD 4', 1.5]])
+
+def test_append_table(tmp_path):
+    '''
+    The range of the table in the worksheet is extended
+    '''
+    from openpyxl.worksheet.table import Table
+
+    url = str(tmp_path / "journal.xlsx")
+    with JournalWriter(url, 'outsheet', colnames=COLNAMES) as writer:
+        for row in rows(3):
+            writer.add_row(row)
+    wb = load_workbook(url)
+    wb['outsheet'].add_table(Table(displayName='trades', ref='A1:E4'))
+    wb.save(url)
+
+    assert append_rows(url, 'outsheet', COLNAMES, rows(2, offset=3)) is True
+
+    assert load_workbook(url)['outsheet'].tables['trades'].ref == 'A1:E6'
+    assert len(pd.read_excel(url, sheet_name='outsheet').index) == 5
+
+def test_sidecar_export(tmp_path):
+    url = str(tmp_path / "journal.xlsx")
+    sidecar = str(tmp_path / "journal.csv")
+    with JournalWriter(url, 'outsheet', colnames=COLNAMES, batch_size=2, sidecar=sidecar) as writer:
+        for row in rows(5):
+            writer.add_row(row)
+        writer.add_row(['EUR_AUD 5', 'n.a.', 1.5, 'n.a.', None])
+
+    assert not (tmp_path / "journal.xlsx").exists()
+    writer.export()
+
+    df = pd.read_excel(url, sheet_name='outsheet')
+    assert len(df.index) == 6
+    assert df['entry'].iloc[0] == 1.54334
+    assert df['outcome'].iloc[-1] == 'n.a.'
+
+    # the sidecar file and the worksheet are replaced
+    with JournalWriter(url, 'outsheet', colnames=COLNAMES, sidecar=sidecar) as writer:
+        writer.add_row(rows(1)[0])
+    writer.export()
+    assert len(pd.read_excel(url, sheet_name='outsheet').index) == 1
+
+def test_write_tradelist(t_object_list, tmp_path):
+    from trade_journal import TradeJournal
+
+    url = str(tmp_path / "journal.xlsx")
+    td = TradeJournal(url=url, worksheet="trading_journal")
+    td.write_tradelist(t_object_list, 'outsheet')
+    # the worksheet is replaced
+    td.write_tradelist(t_object_list, 'outsheet')
+    assert list(pd.read_excel(url, sheet_name='outsheet')['id']) == ['AUD_USD 10APR2017H8']
+
+    td.write_tradelist(t_object_list, 'outsheet', append=True)
+    assert list(pd.read_excel(url, sheet_name='outsheet')['id']) == ['AUD_USD 10APR2017H8']*2
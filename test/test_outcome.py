@@ -0,0 +1,76 @@
+import pytest
+import datetime
+import numpy as np
+
+from harea import HArea
+from candle_cache import CANDLE_CACHE
+from candle_source import fetch_range
+from synthetic import stub_connect
+from outcome import first_index, gap_masks, touch_mask, FineCandles, cross_time
+
+def test_first_index():
+    mask = np.array([False, True, False, True])
+
+    assert first_index(mask) == 1
+    assert first_index(mask, start=2) == 3
+    assert first_index(mask, start=2, stop=3) is None
+    assert first_index(mask, start=4) is None
+
+def test_touch_mask():
+    arrays = {'low': np.array([1.0, 1.2, 0.9]),
+              'high': np.array([1.1, 1.3, 1.25])}
+
+    assert touch_mask(arrays, 1.15, 1.16).tolist() == [False, False, True]
+
+@pytest.mark.parametrize("type,SL,TP,SL_gap,TP_gap", [('long', 1.0, 1.2, [True, False], [False, True]),
+                                                      ('short', 1.2, 1.0, [False, True], [True, False])])
+def test_gap_masks(type, SL, TP, SL_gap, TP_gap):
+    arrays = {'lowAsk': np.array([0.90, 1.30]),
+              'highAsk': np.array([0.95, 1.40])}
+
+    (SL_m, TP_m) = gap_masks(arrays, type, SL, TP)
+
+    assert SL_m.tolist() == SL_gap
+    assert TP_m.tolist() == TP_gap
+
+def test_cross_time():
+    '''
+    The fine candles are only fetched for the candles including the
+    price, and they are fetched once for all the areas
+    '''
+    start = datetime.datetime(2018, 3, 1, 22, 0)
+    # the fine candle starting at the end of the candle is included
+    fine_candles = [{'time': start+datetime.timedelta(minutes=30*ix),
+                     'lowAsk': 1.0+0.01*ix, 'highAsk': 1.01+0.01*ix} for ix in range(49)]
+    CANDLE_CACHE.clear()
+    CANDLE_CACHE.put('EUR_USD', 'M30', start, start+datetime.timedelta(days=1, minutes=30), fine_candles)
+    candle = {'time': start, 'lowAsk': 1.0, 'highAsk': 1.48}
+    fine = FineCandles('EUR_USD', 'D', 'M30')
+
+    assert cross_time(1.5, candle, fine) == 'n.a.'
+    assert CANDLE_CACHE.hits == 0
+    assert cross_time(1.105, candle, fine) == start+datetime.timedelta(hours=5)
+    assert cross_time(1.0, candle, fine) == start
+    candle['highAsk'] = 1.5
+    assert cross_time(1.485, candle, fine) == start+datetime.timedelta(days=1)
+    assert CANDLE_CACHE.hits == 1
+    CANDLE_CACHE.clear()
+
+def test_cross_time_harea():
+    '''
+    cross_time gets the same time as HArea.get_cross_time,
+    with the fine candles of each candle fetched once
+    '''
+    with stub_connect():
+        CANDLE_CACHE.clear()
+        candles = fetch_range('EUR_USD', 'D', datetime.datetime(2018, 3, 1, 22),
+                              datetime.datetime(2018, 3, 21, 22))
+        fine = FineCandles('EUR_USD', 'D', 'M30')
+        for candle in candles:
+            (low, high) = (candle['lowAsk'], candle['highAsk'])
+            for price in np.linspace(low-0.001, high+0.001, 9).tolist()+[low, high]:
+                area = HArea(price=price, instrument='EUR_USD', pips=1, granularity='D')
+                expected = area.get_cross_time(candle=candle, granularity='M30')
+                assert cross_time(price, candle, fine) == expected
+        assert len(fine._candles) == len(candles)
+    CANDLE_CACHE.clear()
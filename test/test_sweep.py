@@ -0,0 +1,110 @@
+import pytest
+import copy
+
+import pandas as pd
+
+from synthetic import stub_connect, make_journal
+from candle_cache import CANDLE_CACHE
+from candle_source import fetch_range
+from trade_journal import TradeJournal
+from trade_utils import add_pips2trade
+from utils import periodToDelta
+from sweep import param_grid, run_sweep, summarize, PARAMS
+
+def test_param_grid():
+    combos = param_grid({'RR': [1.5, 2], 'expires': [1, 2, None]})
+
+    assert len(combos) == 6
+    assert combos[0] == {'RR': 1.5, 'SL_number': None, 'add_pips': None, 'expires': 1}
+
+    with pytest.raises(ValueError):
+        param_grid({'TP': [1]})
+
+def test_run_sweep(tmp_path):
+    '''
+    Each trade and combination has the outcome obtained
+    with Trade.run_trade(mode='vectorized')
+    '''
+    url = str(tmp_path / "journal.xlsx")
+    grid = {'RR': [None, 2.0], 'SL_number': [None, 3], 'add_pips': [None, 5], 'expires': [1, None]}
+    with stub_connect():
+        make_journal(url, 4)
+        trades = TradeJournal(url, 'trading_journal', cache=False).fetch_trades()
+        CANDLE_CACHE.clear()
+        (df, errors) = run_sweep(trades, grid)
+
+        assert errors == []
+        assert len(df) == 4*16
+        for t in trades:
+            rows = df[df['id'] == t.id]
+            for _, row in rows.iterrows():
+                tr = copy.deepcopy(t)
+                (tr.entry, tr.SL, tr.TP) = (row['entry'], row['SL'], row['TP'])
+                tr.run_trade(expires=row['expires'], mode='vectorized')
+                assert row['outcome'] == tr.outcome
+                assert row['entered'] == tr.entered
+                if tr.outcome != 'n.a.':
+                    assert row['end'] == tr.end
+                    assert row['pips'] == pytest.approx(tr.pips)
+
+            # SL (before add_pips) from the 3 candles before the start
+            before = fetch_range(t.pair, t.timeframe, t.start-periodToDelta(3, t.timeframe), t.start)
+            row = rows[(rows['SL_number'] == 3) & rows['add_pips'].isnull()].iloc[0]
+            if t.type == 'long':
+                assert row['SL'] == min(c['lowAsk'] for c in before)
+            else:
+                assert row['SL'] == max(c['highAsk'] for c in before)
+
+            # same entry and SL than trade_utils.prepare_trade
+            row = rows[rows['SL_number'].isnull() & (rows['add_pips'] == 5)].iloc[0]
+            assert (row['entry'], row['SL']) == add_pips2trade(t.pair, t.type, t.entry, t.SL, 5)
+    CANDLE_CACHE.clear()
+
+def test_summarize():
+    df = pd.DataFrame({'id': ['EUR_USD 1', 'EUR_USD 2', 'EUR_USD 1', 'EUR_USD 2'],
+                       'start': ['2018-01-01 22:00:00', '2018-01-02 22:00:00']*2,
+                       'entry': [1.0]*4,
+                       'SL': [0.99]*4,
+                       'exit': [1.02, 0.99, 1.01, None],
+                       'outcome': ['success', 'failure', 'success', 'n.a.'],
+                       'pips': [200.0, -100.0, 100.0, 0.0],
+                       'entered': [True, True, True, False],
+                       'RR': [2.0, 2.0, 1.0, 1.0],
+                       'SL_number': [None]*4,
+                       'add_pips': [None]*4,
+                       'expires': [None]*4})
+    df[PARAMS] = df[PARAMS].astype(object)
+
+    res = summarize(df).set_index('RR')
+
+    assert res.loc[2.0, 'trades'] == 2
+    assert res.loc[2.0, 'win_rate'] == 50
+    assert res.loc[2.0, 'expectancy'] == 50
+    assert res.loc[1.0, 'run'] == 2
+    assert res.loc[1.0, 'entered'] == 1
+    assert res.loc[1.0, 'pips'] == 100
+    assert res.loc[1.0, 'SL_number'] == 'n.a.'
+
+def test_summarize_streak():
+    '''
+    The losing streak is calculated within each combination,
+    even if the rows of the combinations are interleaved
+    '''
+    df = pd.DataFrame({'id': ['EUR_USD {0}'.format(ix//2) for ix in range(6)],
+                       'start': ['2018-01-0{0} 22:00:00'.format(ix//2+1) for ix in range(6)],
+                       'entry': [1.0]*6,
+                       'SL': [0.99]*6,
+                       'exit': [0.99, 1.02]*3,
+                       'outcome': ['failure', 'success']*3,
+                       'pips': [-100.0, 200.0]*3,
+                       'entered': [True]*6,
+                       'RR': [1.0, 2.0]*3,
+                       'SL_number': [None]*6,
+                       'add_pips': [None]*6,
+                       'expires': [None]*6})
+    df[PARAMS] = df[PARAMS].astype(object)
+
+    res = summarize(df).set_index('RR')
+
+    assert res.loc[1.0, 'max_losing_streak'] == 3
+    assert res.loc[2.0, 'max_losing_streak'] == 0
@@ -0,0 +1,40 @@
+import pytest
+import datetime
+
+from synthetic import SyntheticMarket, StubConnect, stub_connect, make_journal
+from trade_journal import TradeJournal
+import candle_source
+
+def test_synthetic_candles():
+    market = SyntheticMarket(seed=1)
+    daily = market.candles('EUR_USD', 'D', datetime.datetime(2015, 1, 1),
+                           end=datetime.datetime(2015, 2, 1))
+    assert daily[0]['time'] == '2015-01-01T22:00:00.000000Z'
+    assert len(daily) == 31
+    # same candles whatever the query
+    assert SyntheticMarket(seed=1).candles('EUR_USD', 'D', datetime.datetime(2015, 1, 10),
+                                           count=2) == daily[9:11]
+
+    # candles of the different granularities are consistent
+    m30 = market.candles('EUR_USD', 'M30', datetime.datetime(2015, 1, 1, 22), count=48)
+    assert m30[0]['openAsk'] == daily[0]['openAsk']
+    assert m30[-1]['closeAsk'] == daily[0]['closeAsk']
+    assert max(c['highAsk'] for c in m30) == daily[0]['highAsk']
+    assert min(c['lowAsk'] for c in m30) == daily[0]['lowAsk']
+
+def test_stub_connect():
+    with stub_connect():
+        candles = candle_source.query_range('AUD_USD', 'H12', datetime.datetime(2018, 1, 1),
+                                            datetime.datetime(2018, 6, 1))
+        assert StubConnect.queries > 0
+    assert len(candles) == 302
+    assert candle_source.Connect is not StubConnect
+
+def test_make_journal(tmp_path):
+    url = str(tmp_path / "journal.xlsx")
+    make_journal(url, 10)
+
+    tj = TradeJournal(url, 'trading_journal', cache=False)
+    trades = tj.fetch_trades()
+    assert len(trades) == 10
+    assert all(t.strat == 'counter' for t in trades)
@@ -0,0 +1,44 @@
+import pytest
+import random
+import datetime
+
+from time_index import TimeIndex
+from utils import get_ixfromdatetimes_list, get_ixfromdatetimes_batch
+
+def closest_ix(datetimes_list, d):
+    '''Linear scan returning the lowest index of the closest datetime'''
+    diffs = [abs(ad-d) for ad in datetimes_list]
+    return diffs.index(min(diffs))
+
+@pytest.fixture
+def datetimes():
+    '''Returns a list of datetimes that is not sorted and has repeated values'''
+    random.seed(0)
+    start = datetime.datetime(2018, 12, 3, 22, 0)
+    return [start+datetime.timedelta(hours=random.randrange(0, 200, 4)) for x in range(100)]
+
+def test_nearest(datetimes):
+    start = datetime.datetime(2018, 12, 3, 0, 0)
+    ds = [start+datetime.timedelta(hours=x) for x in range(0, 240)]
+
+    assert get_ixfromdatetimes_batch(datetimes, ds) == [closest_ix(datetimes, d) for d in ds]
+    for d in ds[:50]:
+        assert get_ixfromdatetimes_list(datetimes, d) == closest_ix(datetimes, d)
+
+def test_nearest_tie():
+    dl = [datetime.datetime(2018, 1, 3), datetime.datetime(2018, 1, 1),
+          datetime.datetime(2018, 1, 3)]
+
+    # equally close to 2018-01-01 and 2018-01-03
+    assert get_ixfromdatetimes_list(dl, datetime.datetime(2018, 1, 2)) == 0
+    assert get_ixfromdatetimes_list([], datetime.datetime(2018, 1, 2)) is None
+
+def test_asof_slice():
+    start = datetime.datetime(2018, 12, 3, 22, 0)
+    index = TimeIndex([start+datetime.timedelta(days=x) for x in range(10)])
+
+    assert index.asof(start-datetime.timedelta(hours=1)) is None
+    assert index.asof(start+datetime.timedelta(days=2, hours=1)) == 2
+    assert index.first_after_batch([start+datetime.timedelta(days=2, hours=1)]).tolist() == [3]
+    assert index.slice(start+datetime.timedelta(days=2),
+                       start+datetime.timedelta(days=4)) == slice(2, 4)
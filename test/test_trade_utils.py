@@ -164,6 +164,55 @@ def test_calc_trade_session(t_object):
     t_object.run_trade()
     assert calc_trade_session(t_object) == 'european,namerican'
 
+def test_calc_trade_sessions():
+    entry_times = ['2018-12-04T07:00:00', '2018-12-04T13:30:00', '2018-12-04T23:00:00',
+                   '2018-12-04T20:00:00', None]
+
+    sessions = calc_trade_sessions(entry_times)
+    assert sessions.tolist() == ['asian,european', 'european,namerican', 'asian',
+                                 'nosession', 'n.a.']
+
+    # 06:30 UTC is 07:30 in London during summer time
+    sessions = calc_trade_sessions(['2018-07-04T06:30:00', '2018-12-04T06:30:00'],
+                                   tz='Europe/London')
+    assert sessions.tolist() == ['european', 'asian']
+
+    sessions = calc_trade_sessions(entry_times, windows=[('tokyo', 0, 9*3600)])
+    assert sessions.tolist() == ['tokyo', 'nosession', 'nosession', 'nosession', 'n.a.']
+
+def test_add_pips2trade():
+    # short trades are rounded to 4 decimals, as in prepare_trade
+    (entry, SL) = add_pips2trade('AUD_USD', 'short', 0.74961, 0.75203, 5)
+    assert (entry, SL) == (0.7491, 0.7525)
+    (entry, SL) = add_pips2trade('AUD_USD', 'long', 0.74960, 0.74718, 5)
+    assert entry == pytest.approx(0.7501)
+    assert SL == pytest.approx(0.7467)
+
+def test_calc_trade_session_scalar():
+    '''
+    Check that calc_trade_session gets the same sessions
+    than calc_trade_sessions
+    '''
+    class T(object):
+        pass
+
+    entry_times = ['2018-12-04T07:00:00', '2018-12-04T13:30:00', '2018-12-04T23:00:00',
+                   '2018-12-04T20:00:00', '2018-07-04T06:30:00']
+    for tz in [None, 'Europe/London']:
+        expected = calc_trade_sessions(entry_times, tz=tz).tolist()
+        if tz is not None:
+            CONFIG.set('sessions', 'tz', tz)
+        try:
+            sessions = []
+            for entry_time in entry_times:
+                t = T()
+                t.entry_time = entry_time
+                sessions.append(calc_trade_session(t))
+        finally:
+            CONFIG.remove_option('sessions', 'tz')
+        assert sessions == expected
+    assert calc_trade_session(T()) == 'n.a.'
+
 @pytest.mark.parametrize("start,"
                          "end,"
                          "type",
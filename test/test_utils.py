@@ -0,0 +1,32 @@
+import pytest
+import numpy as np
+
+from utils import *
+
+def test_calculate_pips():
+    assert calculate_pips('AUD_USD', 0.00242) == '24.2'
+    assert calculate_pips('CAD_JPY', 0.747) == '74.7'
+    assert calculate_pips('AUD_USD', np.float32(0.00242)) == '24.2'
+
+def test_calculate_pips_array():
+    pips = calculate_pips_array(['AUD_USD', 'CAD_JPY', 'AUD_USD'], [0.00242, 0.747, 0.0101])
+
+    assert pips.tolist() == [24.2, 74.7, 101.0]
+    assert calculate_pips_array('AUD_USD', [0.00242]).tolist() == [24.2]
+
+def test_add_substract_pips2prices():
+    pairs = ['AUD_USD', 'CAD_JPY', 'EUR_AUD']
+    prices = [0.74960, 105.293, 1.54334]
+
+    added = add_pips2prices(pairs, prices, 10)
+    substracted = substract_pips2prices(pairs, prices, np.array([10, 20, 30]))
+
+    assert added == pytest.approx([add_pips2price(p, x, 10) for p, x in zip(pairs, prices)])
+    assert substracted == pytest.approx([substract_pips2price(p, x, n)
+                                         for p, x, n in zip(pairs, prices, [10, 20, 30])])
+
+def test_pip_size():
+    assert pip_size('USD_JPY') == (100, 2)
+    (divisors, round_numbers) = pip_sizes(np.array(['USD_JPY', 'EUR_USD']))
+    assert divisors.tolist() == [100, 10000]
+    assert round_numbers.tolist() == [2, 4]
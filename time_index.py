@@ -0,0 +1,164 @@
+'''
+Sorted index over a list of datetimes (i.e. the times of a list
+of candles) stored as an int64 array, so lookups are binary
+searches (np.searchsorted) instead of scans of the list
+'''
+import numpy as np
+
+def to_int64(times):
+    '''
+    Function to convert datetimes to int64
+    microseconds since epoch
+
+    Parameters
+    ----------
+    times : datetime or list of datetimes
+
+    Returns
+    -------
+    int64 array (or int64 for a single datetime)
+    '''
+    return np.asarray(times, dtype='datetime64[us]').astype(np.int64)
+
+class TimeIndex(object):
+    '''
+    Class representing a sorted index of datetimes. The input
+    does not need to be sorted: lookups return the positions in
+    the original list
+
+    Class variables
+    ---------------
+    times : list with datetimes, Required
+    '''
+
+    def __init__(self, times):
+        values = to_int64(list(times))
+        self.order = None
+        if values.size > 1 and np.any(values[1:] < values[:-1]):
+            # stable, so equal datetimes keep their original order
+            self.order = np.argsort(values, kind='stable')
+            values = values[self.order]
+        self.values = values
+
+    def __len__(self):
+        return self.values.size
+
+    def __original(self, pos):
+        return pos if self.order is None else self.order[pos]
+
+    def nearest_batch(self, ds):
+        '''
+        Get the index of the datetime closest to each of 'ds'.
+        For ties, the lowest index is returned
+
+        Parameters
+        ----------
+        ds : list with datetimes
+
+        Returns
+        -------
+        int array. -1 if the index is empty
+        '''
+        q = to_int64(list(ds))
+        n = self.values.size
+        if n == 0:
+            return np.full(q.size, -1, dtype=np.int64)
+        pos = np.searchsorted(self.values, q, side='left')
+        left = np.clip(pos-1, 0, n-1)
+        right = np.clip(pos, 0, n-1)
+        # first position of each run of equal datetimes
+        left = np.searchsorted(self.values, self.values[left], side='left')
+        right = np.searchsorted(self.values, self.values[right], side='left')
+        (ileft, iright) = (self.__original(left), self.__original(right))
+        dleft = np.abs(q-self.values[left])
+        dright = np.abs(self.values[right]-q)
+
+        return np.where(dleft < dright, ileft,
+                        np.where(dright < dleft, iright, np.minimum(ileft, iright)))
+
+    def nearest(self, d):
+        '''
+        Get the index of the datetime closest to 'd'.
+        For ties, the lowest index is returned
+
+        Returns
+        -------
+        int or None if the index is empty
+        '''
+        if self.values.size == 0:
+            return None
+        return int(self.nearest_batch([d])[0])
+
+    def asof_batch(self, ds):
+        '''
+        Get the index of the last datetime <= each of 'ds'
+
+        Parameters
+        ----------
+        ds : list with datetimes
+
+        Returns
+        -------
+        int array. -1 where all the datetimes are > d
+        '''
+        pos = np.searchsorted(self.values, to_int64(list(ds)), side='right')-1
+        res = np.full(pos.size, -1, dtype=np.int64)
+        found = pos >= 0
+        res[found] = self.__original(pos[found])
+        return res
+
+    def asof(self, d):
+        '''
+        Get the index of the last datetime <= d
+
+        Returns
+        -------
+        int or None if all the datetimes are > d
+        '''
+        ix = int(self.asof_batch([d])[0])
+        return ix if ix >= 0 else None
+
+    def first_after_batch(self, ds):
+        '''
+        Get the index of the first datetime >= each of 'ds'
+
+        Parameters
+        ----------
+        ds : list with datetimes
+
+        Returns
+        -------
+        int array. -1 where all the datetimes are < d
+        '''
+        pos = np.searchsorted(self.values, to_int64(list(ds)), side='left')
+        res = np.full(pos.size, -1, dtype=np.int64)
+        found = pos < self.values.size
+        res[found] = self.__original(pos[found])
+        return res
+
+    def bounds(self, start, end):
+        '''
+        Get the positions (in sorted order) of the
+        datetimes with start <= time < end
+
+        Returns
+        -------
+        int : first position
+        int : last position (excluded)
+        '''
+        (i, j) = np.searchsorted(self.values, to_int64([start, end]), side='left')
+        return int(i), int(j)
+
+    def slice(self, start, end):
+        '''
+        Get the indices of the datetimes with start <= time < end
+
+        Returns
+        -------
+        slice if the datetimes are sorted or int array
+        with the indices sorted by time otherwise
+        '''
+        (i, j) = self.bounds(start, end)
+        if self.order is None:
+            return slice(i, j)
+        return self.order[i:j]
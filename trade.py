@@ -1,19 +1,56 @@
 from __future__ import division
 
 import math
+import numpy as np
+import asyncio
 import logging
 import datetime as dt
+from functools import partial
 
 from oanda.connect import Connect
 from candle.candlelist import CandleList
 from harea import HArea
+from candle_source import fetch_resp, query_candle, stream_window, window_end
+from indicators import INDICATORS, use_store
+from instrumentation import STATS, timed
+from outcome import candle_arrays, area_bounds, touch_mask, gap_masks, first_index, \
+    FineCandles, cross_time
 from utils import *
-from config import CONFIG
+from config import CONFIG, get_settings
 
 # create logger
 t_logger = logging.getLogger(__name__)
 t_logger.setLevel(logging.INFO)
 
+# attributes of Trade stored in slots
+FIELDS = ('id', 'strat', 'start', 'end', 'pair', 'timeframe', 'type', 'entered',
+          'entry', 'entry_time', 'exit', 'SL', 'TP', 'SR', 'RR', 'pips', 'outcome',
+          'period', 'trend_i')
+# attributes calculated on first access. Their values are stored in '_<name>'
+_LAZY = ('period', 'trend_i')
+_SLOTS = frozenset(FIELDS + tuple('_'+name for name in _LAZY) + ('_extra',))
+
+@timed('get_cross_time')
+def _cross_time(area, candle, fine):
+    '''
+    Get the time at which 'candle' crosses 'area'. If [trade] fine_cross
+    is True, then the fine candles are shared through 'fine' (see
+    outcome.cross_time), otherwise HArea.get_cross_time is used
+
+    Parameters
+    ----------
+    area : HArea
+    candle : candle
+    fine : FineCandles object for the trade
+
+    Returns
+    -------
+    datetime or 'n.a.'
+    '''
+    if get_settings().trade.fine_cross is True:
+        return cross_time(area.price, candle, fine)
+    return area.get_cross_time(candle=candle, granularity=fine.granularity)
+
 class Trade(object):
     '''
     This class represents a single row from the dataframe in the trade_journal class
@@ -24,7 +61,7 @@ class Trade(object):
     entered: Boolean, Optional
              False if trade not taken (price did not cross self.entry). True otherwise
              Default : False
-    start: datetime, Required
+    start: datetime or str, Required
            Time/date when the trade was taken. i.e. 20-03-2017 08:20:00s
     pair: str, Required
           Currency pair used in the trade. i.e. AUD_USD
@@ -57,15 +94,27 @@ class Trade(object):
     id : str, Required
          Id used for this object
     period : CandleList
-             CandleList from trade.start-CONFIG.getint('trade_bot', 'period_range') to trade.start
+             CandleList from trade.start-CONFIG.getint('trade_bot', 'period_range') to trade.start.
+             It is initialized with 'initclist' on first access
     trend_i : Start of the trend. Datetime
+              It is calculated with 'get_trend_i' on first access
     init : Bool
-           If true then invoke the 'self.__initclist()' function to initialize the self.period
-           class attribute. Default: False
+           If true then self.period and self.trend_i are calculated (on first access)
+           even if they were passed as arguments. Default: False
+
+    The attributes above are stored in slots. Any other keyword argument (i.e. extra
+    columns in the trade journal) is stored in an overflow dict and is accessed
+    as a normal attribute. self.period and self.trend_i are not calculated when
+    the Trade is created: the candles are fetched the first time they are read
+    and are then kept. Changing self.start or self.timeframe discards them
     '''
+    __slots__ = tuple(name for name in FIELDS if name not in _LAZY) + \
+        tuple('_'+name for name in _LAZY) + ('_extra',)
 
     def __init__(self, strat, start, type=None, entered=False, init=False, **kwargs):
-        self.__dict__.update(kwargs)
+        self._extra = None
+        for key, value in kwargs.items():
+            setattr(self, key, value)
         if not hasattr(self, 'TP') and not hasattr(self, 'RR'):
             raise Exception("Neither the RR not "
                             "the TP is defined. Please provide RR")
@@ -77,15 +126,120 @@ class Trade(object):
             self.TP = round(self.entry + diff, 4)
 
         self.strat = strat
-        self.start = datetime.strptime(start,
-                                      '%Y-%m-%d %H:%M:%S')
-        self.pair = re.sub('/', '_', self.pair)
+        if isinstance(start, datetime):
+            self.start = start
+        else:
+            self.start = datetime.strptime(start,
+                                          '%Y-%m-%d %H:%M:%S')
+        if '/' in self.pair:
+            self.pair = re.sub('/', '_', self.pair)
         self.strat = strat
         self.entered = entered
         self.type = type
         if init is True:
-            self.period = self.initclist()
-            self.trend_i = self.get_trend_i()
+            self.invalidate()
+
+    @classmethod
+    def from_columns(cls, columns, init=False):
+        '''
+        Create one Trade per row of a table (i.e. the trade journal).
+        The result is the same as calling the constructor with the values
+        of each row, but the checks, the TP calculation and the parsing
+        of 'start' are done for the whole column
+
+        Parameters
+        ----------
+        columns : dict, Required
+                  Column name => sequence with one value per Trade.
+                  'strat', 'start' and 'pair' are required
+        init : Bool, Optional
+               See the class docstring. Default: False
+
+        Returns
+        -------
+        list with Trade objects
+        '''
+        values = {k: np.asarray(v, dtype=object) for k, v in columns.items()}
+        n = len(values['start'])
+        if 'RR' in values:
+            RR = values['RR'].astype(float)
+            if 'TP' not in values and np.isnan(RR).any():
+                raise Exception("Neither the RR not "
+                                "the TP is defined. Please provide RR")
+            has_rr = ~np.isnan(RR)
+            if has_rr.any():
+                entry = values['entry'][has_rr].astype(float)
+                SL = values['SL'][has_rr].astype(float)
+                TP = values['TP'].copy() if 'TP' in values else np.full(n, None, dtype=object)
+                TP[has_rr] = [round(x, 4) for x in (entry + (entry - SL) * RR[has_rr]).tolist()]
+                values['TP'] = TP
+        elif 'TP' not in values:
+            raise Exception("Neither the RR not "
+                            "the TP is defined. Please provide RR")
+
+        values['start'] = [s if isinstance(s, datetime) else datetime.strptime(s, '%Y-%m-%d %H:%M:%S')
+                           for s in values['start']]
+        values['pair'] = [re.sub('/', '_', p) if '/' in p else p for p in values['pair']]
+        values.setdefault('entered', np.full(n, False, dtype=object))
+        values.setdefault('type', np.full(n, None, dtype=object))
+
+        slots = [k for k in values if k in _SLOTS and k not in _LAZY]
+        lazy = [k for k in values if k in _LAZY]
+        extra = [k for k in values if k not in _SLOTS and k not in _LAZY]
+        trades = []
+        for i in range(n):
+            t = cls.__new__(cls)
+            object.__setattr__(t, '_extra', {k: values[k][i] for k in extra} if extra else None)
+            for k in slots:
+                object.__setattr__(t, k, values[k][i])
+            if init is not True:
+                for k in lazy:
+                    object.__setattr__(t, '_'+k, values[k][i])
+            trades.append(t)
+        return trades
+
+    @property
+    def period(self):
+        try:
+            return self._period
+        except AttributeError:
+            self._period = self.initclist()
+            return self._period
+
+    @period.setter
+    def period(self, value):
+        self._period = value
+
+    @period.deleter
+    def period(self):
+        del self._period
+
+    @property
+    def trend_i(self):
+        try:
+            return self._trend_i
+        except AttributeError:
+            self._trend_i = self.get_trend_i()
+            return self._trend_i
+
+    @trend_i.setter
+    def trend_i(self, value):
+        self._trend_i = value
+
+    @trend_i.deleter
+    def trend_i(self):
+        del self._trend_i
+
+    def invalidate(self):
+        '''
+        Discard self.period and self.trend_i, so they
+        are calculated again on next access
+        '''
+        for name in _LAZY:
+            try:
+                object.__delattr__(self, '_'+name)
+            except AttributeError:
+                pass
 
     def initclist(self):
         '''
@@ -96,42 +250,89 @@ class Trade(object):
         -------
         CandleList
         '''
-        delta_period = periodToDelta(CONFIG.getint('trade_bot', 'period_range'),
-                                     self.timeframe)
-        delta_1 = periodToDelta(1, self.timeframe)
-        start = self.start - delta_period  # get the start datetime for this CandleList period
-        end = self.start + delta_1  # increase self.start by one candle to include self.start
-        if end > datetime.now():
-            end = datetime.now().replace(microsecond=0)
+        (start, end) = self.period_bounds()
 
         t_logger.debug("Fetching candlelist for period: {0}-{1}".format(start, end))
 
-        conn = Connect(instrument=self.pair,
-                       granularity=self.timeframe)
+        t_logger.debug("Fetching data")
+        with STATS.timer('fetch_period'):
+            resp = fetch_resp(self.pair, self.timeframe, start, end)
+
+        cl = CandleList(resp, type=self.type)
 
-        ser_dir = None
-        if CONFIG.has_option('general', 'ser_data_dir'):
-            ser_dir = CONFIG.get('general', 'ser_data_dir')
+        if use_store() is True:
+            # RSI is sliced from the series calculated for the whole history
+            rsi = INDICATORS.rsi(self.pair, self.timeframe, start, end)
+            if len(rsi) == len(cl.data['candles']):
+                for c, value in zip(cl.data['candles'], rsi):
+                    c['rsi'] = value
+                return cl
+            t_logger.debug("RSI series not aligned with the period. Calculating it")
+        with STATS.timer('calc_rsi'):
+            cl.calc_rsi()
+        return cl
 
-        t_logger.debug("Fetching data")
-        resp = conn.query(start=start.isoformat(),
-                          end=end.isoformat(),
-                          indir=ser_dir)
+    async def ainitclist(self, conn):
+        '''
+        Awaitable version of 'initclist'
+
+        Parameters
+        ----------
+        conn : AsyncConnect object
+
+        Returns
+        -------
+        CandleList
+        '''
+        (start, end) = self.period_bounds()
+
+        t_logger.debug("Fetching candlelist for period: {0}-{1}".format(start, end))
+        resp = await conn.query(self.pair, self.timeframe, start, end=end)
 
         cl = CandleList(resp, type=self.type)
 
-        cl.calc_rsi()
+        await asyncio.get_running_loop().run_in_executor(None, cl.calc_rsi)
         return cl
 
+    def period_bounds(self):
+        '''
+        Function to get the start and end datetimes
+        of the CandleList used for self.period
+
+        Returns
+        -------
+        datetime : start
+        datetime : end
+        '''
+        delta_period = periodToDelta(get_settings().trade_bot.period_range,
+                                     self.timeframe)
+        delta_1 = periodToDelta(1, self.timeframe)
+        start = self.start - delta_period  # get the start datetime for this CandleList period
+        end = self.start + delta_1  # increase self.start by one candle to include self.start
+        if end > datetime.now():
+            end = datetime.now().replace(microsecond=0)
+
+        return start, end
+
     def get_trend_i(self):
         '''
-        Function to calculate the start of the trend
+        Function to calculate the start of the trend. If [indicators] use_store
+        is True, then the value is memoized for the period of this trade
 
         Returns
         -------
         Datetime
         '''
-        merged_s = self.period.calc_itrend()
+        if use_store() is True:
+            (start, end) = self.period_bounds()
+            return INDICATORS.trend_i(self.pair, self.timeframe, self.type, start, end,
+                                      self.__calc_trend_i)
+        return self.__calc_trend_i()
+
+    def __calc_trend_i(self):
+        period = self.period
+        with STATS.timer('calc_itrend'):
+            merged_s = period.calc_itrend()
 
         if self.type == "long":
             candle = merged_s.get_highest()
@@ -150,13 +351,43 @@ class Trade(object):
         A CandleList object
 
         '''
-        conn = Connect(instrument=self.pair,
-                       granularity=self.timeframe)
+        (astart, anend) = self.__start_end()
+
+        t_logger.debug("Fetching data from API")
+        res = fetch_resp(self.pair, self.timeframe, astart, anend)
+
+        cl = CandleList(res, type=self.type)
+        return cl
+
+    async def afetch_candlelist(self, conn):
+        '''
+        Awaitable version of 'fetch_candlelist'
+
+        Parameters
+        ----------
+        conn : AsyncConnect object
+
+        Returns
+        -------
+        A CandleList object
+        '''
+        (astart, anend) = self.__start_end()
+
+        t_logger.debug("Fetching data from API")
+        res = await conn.query(self.pair, self.timeframe, astart, end=anend)
 
-        ser_dir = None
-        if CONFIG.has_option('general', 'ser_data_dir'):
-            ser_dir = CONFIG.get('general', 'ser_data_dir')
+        cl = CandleList(res, type=self.type)
+        return cl
 
+    def __start_end(self):
+        '''
+        Function to get self.start and self.end as datetimes
+
+        Returns
+        -------
+        datetime : start
+        datetime : end
+        '''
         if isinstance(self.start, datetime) is True:
             astart = self.start
         else:
@@ -167,15 +398,10 @@ class Trade(object):
         else:
             anend = try_parsing_date(self.end)
 
-        t_logger.debug("Fetching data from API")
-        res = conn.query(start=astart.isoformat(),
-                         end=anend.isoformat(),
-                         indir=ser_dir)
-
-        cl = CandleList(res, type=self.type)
-        return cl
+        return astart, anend
 
-    def run_trade(self, expires=2):
+    @timed('run_trade')
+    def run_trade(self, expires=2, mode='candle', history=None):
         '''
         Run the trade until conclusion from a start date
 
@@ -184,23 +410,102 @@ class Trade(object):
         expires : int
                   Number of candles after start datetime to check
                   for entry. Default: 2
+        mode : str
+               How the candles are fetched. Possible values are:
+               'candle': one Connect.query per candle
+               'bulk': the evaluation window is fetched with ranged queries
+                       in chunks of growing size (see candle_source.stream_window)
+                       and the candles are walked in memory. Chunks are only
+                       fetched until the outcome is decided
+               'vectorized': same fetch as 'bulk', but the candles crossing
+                             the entry, SL and TP are found with NumPy and
+                             the crossing time (see _cross_time) is only
+                             calculated for them
+               Default: 'candle'
+        history : list, Optional
+                  List with candles sorted by time for self.pair and
+                  self.timeframe (i.e. shared across trades by TradeJournal.run_all).
+                  If provided, the 'bulk' and 'vectorized' modes will take
+                  the candles from it instead of fetching them
         '''
 
         t_logger.info("Run run_trade with id: {0}".format(self.id))
 
+        if mode not in ('candle', 'bulk', 'vectorized'):
+            raise ValueError("Invalid run_trade mode: {0}".format(mode))
+
+        hr_pips = get_settings().trade.hr_pips
         entry = HArea(price=self.entry,
                       instrument=self.pair,
-                      pips=CONFIG.getint('trade', 'hr_pips'),
+                      pips=hr_pips,
                       granularity=self.timeframe)
         SL = HArea(price=self.SL,
                    instrument=self.pair,
-                   pips=CONFIG.getint('trade', 'hr_pips'),
+                   pips=hr_pips,
                    granularity=self.timeframe)
         TP = HArea(price=self.TP,
                    instrument=self.pair,
-                   pips=CONFIG.getint('trade', 'hr_pips'),
+                   pips=hr_pips,
                    granularity=self.timeframe)
 
+        date_list = self.__get_date_list()
+
+        self.entered = False
+        if mode == 'vectorized':
+            chunks = stream_window(self.pair, self.timeframe, date_list, candles=history)
+            self.__resolve_vectorized(entry, SL, TP, date_list, chunks, expires)
+        else:
+            self.__resolve_loop(entry, SL, TP, date_list, mode, expires, history)
+        try:
+            assert getattr(self, 'outcome')
+        except:
+            t_logger.warning("No outcome could be calculated")
+            self.outcome = "n.a."
+            self.pips = 0
+
+        t_logger.info("Done run_trade")
+
+    async def arun_trade(self, conn, expires=2, mode='vectorized'):
+        '''
+        Awaitable version of 'run_trade'. The candles for the
+        evaluation window are fetched with 'conn' and the trade
+        is then run over them with 'run_trade' in the loop's default
+        executor. The [trade] granularity candles needed for the
+        crossing times (see _cross_time) are fetched in that executor
+        thread with oanda.connect.Connect, so they are thread-pooled
+        blocking requests and are not sent through 'conn'
+
+        Parameters
+        ----------
+        conn : AsyncConnect object
+        expires : int
+                  See 'run_trade'. Default: 2
+        mode : str
+               'bulk' or 'vectorized'. See 'run_trade'.
+               Default: 'vectorized'
+        '''
+        if mode not in ('bulk', 'vectorized'):
+            raise ValueError("Invalid arun_trade mode: {0}".format(mode))
+
+        date_list = self.__get_date_list()
+        history = await conn.fetch_range(self.pair, self.timeframe, date_list[0],
+                                         window_end(date_list, self.timeframe))
+
+        await asyncio.get_running_loop().run_in_executor(None, partial(self.run_trade,
+                                                                       expires=expires,
+                                                                       mode=mode,
+                                                                       history=history))
+
+    def __get_date_list(self):
+        '''
+        Function to generate the list of datetimes (one per candle) used
+        for running the trade. It goes from self.start to
+        [trade] numperiods candles later
+
+        Returns
+        -------
+        list with datetimes
+        '''
         period = None
         if self.timeframe == "D":
             period = 24
@@ -210,41 +515,51 @@ class Trade(object):
         # generate a range of dates starting at self.start and ending numperiods later in order to assess the outcome
         # of trade and also the entry time
         self.start = datetime.strptime(str(self.start), '%Y-%m-%d %H:%M:%S')
-        numperiods = CONFIG.getint('trade', 'numperiods')
+        numperiods = get_settings().trade.numperiods
         # date_list will contain a list with datetimes that will be used for running self
         date_list = [datetime.strptime(str(self.start.isoformat()), '%Y-%m-%dT%H:%M:%S')
                      + timedelta(hours=x*period) for x in range(0, numperiods)]
 
-        conn = Connect(instrument=self.pair,
-                       granularity=self.timeframe)
+        return date_list
 
-        ser_dir = None
-        if CONFIG.has_option('general', 'ser_data_dir'):
-            ser_dir = CONFIG.get('general', 'ser_data_dir')
+    def __resolve_loop(self, entry, SL, TP, date_list, mode, expires, history=None):
+        '''
+        Walk the candles one by one and check if they cross
+        the entry, SL and TP HAreas
+
+        Parameters
+        ----------
+        entry : HArea
+        SL : HArea
+        TP : HArea
+        date_list : list with datetimes
+        mode : str
+               'candle' or 'bulk'. See 'run_trade'
+        expires : int
+        history : list with candles. See 'run_trade'
+        '''
+        candles = self.__iter_candles(date_list, mode, history)
+        fine = FineCandles(self.pair, self.timeframe, get_settings().trade.granularity)
         count = 0
-        self.entered = False
         for d in date_list:
             count += 1
             if expires is not None:
                 if count > expires and self.entered is False:
                     self.outcome = 'n.a.'
                     break
-            t_logger.debug("Fetching data from API")
-            res = conn.query(start=d.isoformat(),
-                             count=1,
-                             indir=ser_dir)
-            cl = res['candles'][0]
+            cl = next(candles, None)
+            if cl is None:
+                # end of the candles available
+                break
             if self.entered is False:
-                entry_time = entry.get_cross_time(candle=cl,
-                                                  granularity=CONFIG.get('trade', 'granularity'))
+                entry_time = _cross_time(entry, candle=cl, fine=fine)
                 if entry_time != 'n.a.':
                     t_logger.info("Trade entered")
                     self.entry_time = entry_time.isoformat()
                     self.entered = True
             if self.entered is True:
                 # will be n.a. is cl does not cross SL
-                failure_time = SL.get_cross_time(candle=cl,
-                                                 granularity=CONFIG.get('trade', 'granularity'))
+                failure_time = _cross_time(SL, candle=cl, fine=fine)
                 # sometimes there is a jump in the price and SL is not crossed
                 is_gap = False
                 if (self.type == "short" and cl['lowAsk'] > SL.price) or\
@@ -252,15 +567,10 @@ class Trade(object):
                     is_gap = True
                     failure_time = d
                 if (failure_time is not None and failure_time != 'n.a.') or is_gap is True:
-                    self.outcome = 'failure'
-                    self.end = failure_time
-                    self.exit = SL.price
-                    self.pips = float(calculate_pips(self.pair, abs(self.SL-self.entry)))*-1
-                    t_logger.info("S/L was hit")
+                    self.__set_failure(SL, failure_time)
                     break
                 # will be n.a. if cl does not cross TP
-                success_time = TP.get_cross_time(candle=cl,
-                                                 granularity=CONFIG.get('trade', 'granularity'))
+                success_time = _cross_time(TP, candle=cl, fine=fine)
                 # sometimes there is a jump in the price and TP is not crossed
                 is_gap = False
                 if (self.type == "short" and cl['highAsk'] < TP.price) or\
@@ -268,20 +578,128 @@ class Trade(object):
                     is_gap = True
                     success_time = d
                 if (success_time is not None and success_time !='n.a.') or is_gap is True:
-                    self.outcome = 'success'
-                    t_logger.info("T/P was hit")
-                    self.end = success_time
-                    self.exit = TP.price
-                    self.pips = float(calculate_pips(self.pair, abs(self.TP - self.entry)))
+                    self.__set_success(TP, success_time)
                     break
-        try:
-            assert getattr(self, 'outcome')
-        except:
-            t_logger.warning("No outcome could be calculated")
-            self.outcome = "n.a."
-            self.pips = 0
 
-        t_logger.info("Done run_trade")
+    def __resolve_vectorized(self, entry, SL, TP, date_list, chunks, expires):
+        '''
+        Find the first candle crossing the entry and then the first
+        one crossing the SL or the TP by using boolean masks over the
+        candles high/low arrays. The crossing time (which needs the
+        [trade] granularity candles) is only calculated for the candles
+        flagged by the masks, so the outcome is the same as the one
+        obtained with '__resolve_loop'
+
+        Parameters
+        ----------
+        entry : HArea
+        SL : HArea
+        TP : HArea
+        date_list : list with datetimes
+        chunks : iterable of lists with consecutive aligned candles
+                 covering date_list from its start
+        expires : int
+        '''
+        settings = get_settings()
+        fine = FineCandles(self.pair, self.timeframe, settings.trade.granularity)
+        hr_pips = settings.trade.hr_pips+1
+        offset = 0
+        chunks = iter(chunks)
+        while True:
+            # checked before pulling the next chunk, so it is not fetched
+            if self.entered is False and expires is not None and offset >= expires:
+                self.outcome = 'n.a.'
+                return
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            arrays = candle_arrays(chunk)
+            n = len(chunk)
+            entry_m = touch_mask(arrays, *area_bounds(self.pair, entry.price, hr_pips))
+            SL_m = touch_mask(arrays, *area_bounds(self.pair, SL.price, hr_pips))
+            TP_m = touch_mask(arrays, *area_bounds(self.pair, TP.price, hr_pips))
+            SL_gap, TP_gap = gap_masks(arrays, self.type, SL.price, TP.price)
+            exit_m = SL_m | SL_gap | TP_m | TP_gap
+            ix = 0
+            while ix < n:
+                if self.entered is False:
+                    if expires is not None and offset+ix >= expires:
+                        self.outcome = 'n.a.'
+                        return
+                    stop = n if expires is None else min(n, expires-offset)
+                    hit = first_index(entry_m, ix, stop)
+                    if hit is None:
+                        ix = stop
+                        continue
+                    entry_time = _cross_time(entry, candle=chunk[hit], fine=fine)
+                    if entry_time == 'n.a.':
+                        ix = hit+1
+                        continue
+                    t_logger.info("Trade entered")
+                    self.entry_time = entry_time.isoformat()
+                    self.entered = True
+                    ix = hit
+                hit = first_index(exit_m, ix)
+                if hit is None:
+                    break
+                cl = chunk[hit]
+                d = date_list[offset+hit]
+                failure_time = 'n.a.'
+                if SL_m[hit]:
+                    failure_time = _cross_time(SL, candle=cl, fine=fine)
+                if SL_gap[hit]:
+                    failure_time = d
+                if failure_time is not None and failure_time != 'n.a.':
+                    self.__set_failure(SL, failure_time)
+                    return
+                success_time = 'n.a.'
+                if TP_m[hit]:
+                    success_time = _cross_time(TP, candle=cl, fine=fine)
+                if TP_gap[hit]:
+                    success_time = d
+                if success_time is not None and success_time != 'n.a.':
+                    self.__set_success(TP, success_time)
+                    return
+                ix = hit+1
+            offset += n
+
+    def __set_failure(self, SL, failure_time):
+        self.outcome = 'failure'
+        self.end = failure_time
+        self.exit = SL.price
+        self.pips = float(calculate_pips(self.pair, abs(self.SL-self.entry)))*-1
+        t_logger.info("S/L was hit")
+
+    def __set_success(self, TP, success_time):
+        self.outcome = 'success'
+        t_logger.info("T/P was hit")
+        self.end = success_time
+        self.exit = TP.price
+        self.pips = float(calculate_pips(self.pair, abs(self.TP - self.entry)))
+
+    def __iter_candles(self, date_list, mode, history=None):
+        '''
+        Generator yielding one candle for each datetime in
+        'date_list'. Each candle is the one returned by
+        Connect.query(start=d, count=1)
+
+        Parameters
+        ----------
+        date_list : list with datetimes
+        mode : str
+               'candle' or 'bulk'. See 'run_trade'
+        history : list with candles. See 'run_trade'
+        '''
+        if mode == 'bulk':
+            for chunk in stream_window(self.pair, self.timeframe, date_list, candles=history):
+                for cl in chunk:
+                    yield cl
+        else:
+            conn = Connect(instrument=self.pair,
+                           granularity=self.timeframe)
+            for d in date_list:
+                t_logger.debug("Fetching data from API")
+                yield query_candle(self.pair, self.timeframe, d, conn=conn)
 
     def get_SLdiff(self):
         """
@@ -298,10 +716,60 @@ class Trade(object):
 
         return number_pips
 
+    def __setattr__(self, name, value):
+        if name in ('start', 'timeframe'):
+            try:
+                if object.__getattribute__(self, name) != value:
+                    self.invalidate()
+            except AttributeError:
+                pass
+        if name in _SLOTS:
+            object.__setattr__(self, name, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[name] = value
+
+    def __getattr__(self, name):
+        # only invoked when 'name' is not a slot or an unset slot
+        if name == '_extra':
+            raise AttributeError(name)
+        if self._extra is not None and name in self._extra:
+            return self._extra[name]
+        raise AttributeError("'Trade' object has no attribute '{0}'".format(name))
+
+    def __delattr__(self, name):
+        if name in _SLOTS:
+            object.__delattr__(self, name)
+        elif self._extra is not None and name in self._extra:
+            del self._extra[name]
+        else:
+            raise AttributeError(name)
+
+    def as_dict(self):
+        '''
+        Function to get the attributes that are set for this Trade
+
+        Returns
+        -------
+        dict
+        '''
+        d = {}
+        for key in FIELDS:
+            try:
+                # lazy attributes are only included if already calculated
+                d[key] = object.__getattribute__(self, '_'+key if key in _LAZY else key)
+            except AttributeError:
+                continue
+        if self._extra is not None:
+            d.update(self._extra)
+
+        return d
+
     def __str__(self):
         sb = []
-        for key in self.__dict__:
-            sb.append("{key}='{value}'".format(key=key, value=self.__dict__[key]))
+        for key, value in self.as_dict().items():
+            sb.append("{key}='{value}'".format(key=key, value=value))
 
         return ', '.join(sb)
 
@@ -5,14 +5,87 @@ import pdb
 import logging
 import math
 import re
+import asyncio
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from trade import Trade
-from openpyxl import load_workbook, Workbook
-from config import CONFIG
+from candle_source import fetch_range, window_end
+from journal_stats import breakdown, calc_stats
+from journal_writer import JournalWriter
+from journal_reader import read_chunks
+from journal_cache import load_cached, store_cached
+from indicators import INDICATORS, use_store
+from instrumentation import STATS, timed
+from features import calc_features
+from sweep import sweep
+from utils import periodToDelta
+from openpyxl import Workbook
+from config import CONFIG, get_settings
 
 # create logger
 tj_logger = logging.getLogger(__name__)
 tj_logger.setLevel(logging.INFO)
 
+# columns set by TradeJournal.run_all
+OUTCOME_COLS = ['outcome', 'entered', 'entry_time', 'end', 'exit', 'pips']
+
+def _init_trade(t):
+    '''
+    Calculate the 'period' and 'trend_i' of a Trade. Used by
+    TradeJournal.fetch_trades in the worker processes. They are read
+    here, as they are calculated on first access and the Trade is
+    sent back to the main process
+
+    Returns
+    -------
+    Trade object (None if it failed)
+    str with the error message (None if it did not fail)
+    '''
+    try:
+        (t.period, t.trend_i)
+        return t, None
+    except Exception as e:
+        return None, "{0}: {1}".format(type(e).__name__, e)
+
+def _run_trade(t, mode):
+    '''
+    Invoke Trade.run_trade. Used by TradeJournal.win_rate
+    in the worker processes
+
+    Returns
+    -------
+    Trade object (None if it failed)
+    str with the error message (None if it did not fail)
+    '''
+    try:
+        t.run_trade(expires=1, mode=mode)
+        return t, None
+    except Exception as e:
+        return None, "{0}: {1}".format(type(e).__name__, e)
+
+def _pool_call(func, enabled, item):
+    '''
+    Call 'func' with 'item' in a worker process of TradeJournal.__run_pool.
+    The counters and timers of the call are recorded in the worker's STATS
+    and returned, so they can be merged into the ones of the main process
+
+    Parameters
+    ----------
+    func : Function returning a tuple (result, error message)
+    enabled : bool
+              STATS.enabled in the main process
+    item : argument for 'func'
+
+    Returns
+    -------
+    tuple returned by 'func'
+    dict with the worker's STATS.stats() for this call
+    '''
+    STATS.enabled = enabled
+    STATS.reset()
+    return func(item), STATS.stats()
+
 class TradeJournal(object):
     '''
     Constructor
@@ -23,59 +96,115 @@ class TradeJournal(object):
     worksheet: str, Required
                Name of the worksheet that will be used to create the object.
                i.e. trading_journal
+    cache: bool, Optional
+           If true, then the parsed worksheet is cached in the user cache directory
+           and it is reused while the file does not change (see journal_cache.py).
+           Default: [trade_journal] cache (False if not defined)
     '''
 
-    def __init__(self, url, worksheet):
+    @timed('read_journal')
+    def __init__(self, url, worksheet, cache=None):
+        if cache is None:
+            cache = CONFIG.getboolean('trade_journal', 'cache', fallback=False)
         self.url = url
         self.worksheet = worksheet
+        self.errors = []
 
         #read-in the 'trading_journal' worksheet from a .xlsx file into a pandas dataframe
         try:
-            xls_file = pd.ExcelFile(url)
-            df = xls_file.parse(worksheet, converters={'start': str, 'end': str, 'trend_i': str})
-            if df.empty is True:
-                raise Exception("No trades fetched for url:{0} and worksheet:{1}".format(self.url, self.worksheet))
-            # replace n.a. string by NaN
-            df = df.replace('n.a.', np.NaN)
-            # remove trailing whitespaces from col names
-            df.columns = df.columns.str.rstrip()
+            df = None
+            if cache is True:
+                df = load_cached(url, worksheet)
+            if df is None:
+                xls_file = pd.ExcelFile(url)
+                df = xls_file.parse(worksheet, converters={'start': str, 'end': str, 'trend_i': str})
+                if df.empty is True:
+                    raise Exception("No trades fetched for url:{0} and worksheet:{1}".format(self.url, self.worksheet))
+                # replace n.a. string by NaN
+                df = df.replace('n.a.', np.NaN)
+                # remove trailing whitespaces from col names
+                df.columns = df.columns.str.rstrip()
+                if cache is True:
+                    store_cached(url, worksheet, df)
             self.df = df
         except FileNotFoundError:
             wb = Workbook()
             wb.create_sheet(worksheet)
             wb.save(str(self.url))
 
-    def fetch_trades(self, init_period=False):
+    def fetch_trades(self, init_period=False, workers=None):
         '''
         Function to fetch a list of Trade objects
 
         Parameter
         ---------
         init_period : bool
-                      If true, then the CandleList
-                      used for the 'period' class attribute
-                      will be initialized. Default: False
+                      If true, then the CandleList used for the 'period'
+                      class attribute and 'trend_i' will be initialized
+                      when they are first accessed (see Trade). The
+                      indicators are then calculated once for all the
+                      trades of each pair and timeframe. Default: False
+        workers : int, Optional
+                  If defined (and init_period is True), then the 'period' and
+                  'trend_i' of the trades are calculated ahead in a pool of
+                  'workers' processes. Trades failing to initialize are left
+                  out of the list and are reported in self.errors. Default: None
 
         Return
         ------
         list with trades
         '''
-        trade_list = []
-        args = {}
-        for index, row in self.df.iterrows():
-            pair = re.split(r'\.| ', row['id'])[0]
-            args = {'pair': pair}
-            for c in row.keys():
-                args[c] = row[c]
-            if init_period is True:
-                t = Trade(**args, init=True)
-            else:
-                t = Trade(**args)
-            trade_list.append(t)
+        trade_list = self.__trades(self.df, init=init_period)
+
+        if init_period is True and workers is not None:
+            res = self.__run_pool(_init_trade, trade_list, [t.id for t in trade_list], workers)
+            return [t for t in res if t is not None]
+
+        if init_period is True and use_store() is True:
+            self.__prepare_indicators(trade_list)
 
         return trade_list
 
-    def win_rate(self, strats):
+    def iter_chunks(self, columns=None, chunksize=1000):
+        '''
+        Read the worksheet in chunks without loading it
+        completely. See journal_reader.read_chunks
+
+        Parameters
+        ----------
+        columns : list, Optional
+                  Columns to read. Default: [trade_journal] colnames
+        chunksize : int, Optional
+                    Number of rows in each chunk. Default: 1000
+
+        Returns
+        -------
+        generator with DataFrames
+        '''
+        return read_chunks(self.url, self.worksheet, columns=columns, chunksize=chunksize)
+
+    def iter_trades(self, columns=None, chunksize=1000):
+        '''
+        Read the worksheet in chunks and create the Trade
+        objects for each chunk lazily
+
+        Parameters
+        ----------
+        columns : list, Optional
+                  See 'iter_chunks'
+        chunksize : int, Optional
+                    See 'iter_chunks'
+
+        Returns
+        -------
+        generator with Trade objects
+        '''
+        for chunk in self.iter_chunks(columns=columns, chunksize=chunksize):
+            for t in self.__trades(chunk):
+                yield t
+
+    @timed('win_rate')
+    def win_rate(self, strats, mode='candle', workers=None):
         '''
         Calculate win rate and pips balance
         for this TradeJournal. If outcome attrb is not
@@ -86,6 +215,13 @@ class TradeJournal(object):
         ----------
         strats : str
                  Comma-separated list of strategies to analyse: i.e. counter,counter_b1
+        mode : str
+               'mode' used for Trade.run_trade. Default: 'candle'
+        workers : int, Optional
+                  If defined, then the trades will be run in a pool
+                  of 'workers' processes. Trades failing to run are
+                  not counted and are reported in self.errors.
+                  Default: None
 
         Returns
         -------
@@ -96,16 +232,25 @@ class TradeJournal(object):
 
         strat_l = strats.split(",")
         number_s = number_f = tot_pips = 0
-        for index, row in self.df.iterrows():
-            pair = row['id'].split(" ")[0]
-            args = {'pair': pair}
-            for c in row.keys():
-                args[c] = row[c]
-            t = Trade(**args)
-            if t.strat not in strat_l:
+        sel = self.df[self.df['strat'].isin(strat_l)]
+        trade_list = self.__trades(sel)
+
+        to_run = [ix for ix, t in enumerate(trade_list)
+                  if not hasattr(t, 'outcome') or math.isnan(t.outcome)]
+        if workers is not None:
+            res = self.__run_pool(partial(_run_trade, mode=mode),
+                                  [trade_list[ix] for ix in to_run],
+                                  [trade_list[ix].id for ix in to_run],
+                                  workers)
+            for ix, t in zip(to_run, res):
+                trade_list[ix] = t
+        else:
+            for ix in to_run:
+                trade_list[ix].run_trade(expires=1, mode=mode)
+
+        for t in trade_list:
+            if t is None:
                 continue
-            if not hasattr(t, 'outcome') or math.isnan(t.outcome):
-                t.run_trade(expires=1)
             if t.outcome == 'success':
                 number_s += 1
             elif t.outcome == 'failure':
@@ -122,41 +267,302 @@ class TradeJournal(object):
 
         return number_s, number_f, tot_pips
 
-    def write_tradelist(self, trade_list, sheet_name):
+    @timed('calc_features')
+    def calc_features(self, names=None, workers=None, overwrite=False):
+        '''
+        Calculate features (see features.FEATURES) for all the trades
+        and add them as columns to self.df. Trades failing to calculate
+        a feature are reported in self.errors
+
+        Parameters
+        ----------
+        names : str, Optional
+                Comma-separated list of features: i.e. session,adr
+                Default: all features
+        workers : int, Optional
+                  If defined, then the trades will be processed in a pool
+                  of 'workers' processes. Default: None
+        overwrite : bool
+                    If False, then only missing values are calculated.
+                    Default: False
+
+        Returns
+        -------
+        DataFrame with the feature columns
+        '''
+        return calc_features(self, names=names.split(",") if names is not None else None,
+                             workers=workers, overwrite=overwrite)
+
+    @timed('stats')
+    def stats(self, by=None, strats=None):
+        '''
+        Calculate the statistics (win rate, pips balance, expectancy,
+        profit factor, max drawdown, longest losing streak and
+        R multiples) of the trades in this TradeJournal. See journal_stats.py
+
+        Parameters
+        ----------
+        by : str, Optional
+             Comma-separated list of columns used for grouping the trades:
+             i.e. strat,session. If not defined, then the statistics of
+             all the trades and the ones grouped by strat, pair,
+             timeframe and session are returned
+        strats : str, Optional
+                 Comma-separated list of strategies to analyse: i.e. counter,counter_b1
+                 Default: all strategies
+
+        Returns
+        -------
+        DataFrame
+        '''
+        sel = self.df
+        if strats is not None:
+            sel = sel[sel['strat'].isin(strats.split(","))]
+        if by is None:
+            return breakdown(sel)
+
+        return calc_stats(sel, by=by.split(","))
+
+    @timed('sweep')
+    def sweep(self, grid, strats=None, workers=None):
+        '''
+        Run a parameter sweep (RR, SL lookback, add_pips and expires)
+        over the trades in this TradeJournal. See sweep.py.
+        Trades failing to run are reported in self.errors
+
+        Parameters
+        ----------
+        grid : dict
+               Parameter name => list of values. i.e. {'RR': [1.5, 2], 'expires': [1, 2]}
+        strats : str, Optional
+                 Comma-separated list of strategies to analyse: i.e. counter,counter_b1
+                 Default: all strategies
+        workers : int, Optional
+                  If defined, then the trades will be processed in a pool
+                  of 'workers' processes. Default: None
+
+        Returns
+        -------
+        DataFrame with the statistics of each combination of parameters
+        '''
+        return sweep(self, grid, strats=strats.split(",") if strats is not None else None,
+                     workers=workers)
+
+    def __run_pool(self, func, items, ids, workers):
+        '''
+        Apply 'func' to each of the items in a pool of processes.
+        Errors are logged and recorded in self.errors
+        instead of aborting the run. The counters and timers
+        of the workers are merged into STATS
+
+        Parameters
+        ----------
+        func : Function returning a tuple (result, error message)
+        items : list with the arguments for 'func'
+        ids : list with the trade ids for each of the items
+        workers : int
+                  Number of processes
+
+        Returns
+        -------
+        list with the results in the same order as 'items'.
+        None for the items that failed
+        '''
+        self.errors = []
+        results = []
+        pool_func = partial(_pool_call, func, STATS.enabled)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for tid, ((res, error), stats) in zip(ids, executor.map(pool_func, items)):
+                STATS.merge(stats)
+                if error is not None:
+                    tj_logger.error("Trade with id: {0} failed: {1}".format(tid, error))
+                    self.errors.append((tid, error))
+                results.append(res)
+
+        return results
+
+    @timed('run_all')
+    def run_all(self, strats=None, expires=1, mode='vectorized', overwrite=False):
+        '''
+        Run all the trades in this TradeJournal. Trades are grouped
+        by pair and timeframe and the candle history for each group
+        is fetched only once and shared by all the trades in the group.
+        The results are added as columns to self.df
+
+        Parameters
+        ----------
+        strats : str, Optional
+                 Comma-separated list of strategies to run: i.e. counter,counter_b1
+                 Default: all strategies
+        expires : int
+                  'expires' used for Trade.run_trade. Default: 1
+        mode : str
+               'mode' used for Trade.run_trade ('bulk' or 'vectorized').
+               Default: 'vectorized'
+        overwrite : bool
+                    If False, then only trades without an outcome will be run.
+                    Default: False
+
+        Returns
+        -------
+        DataFrame with the trades that were run
+        '''
+        sel = self.__select_torun(strats, overwrite)
+
+        groups = {}
+        for index, t in zip(sel.index, self.__torun_trades(sel)):
+            groups.setdefault((t.pair, t.timeframe), []).append((index, t))
+
+        numperiods = get_settings().trade.numperiods
+        for (pair, timeframe), group in groups.items():
+            starts = [t.start for index, t in group]
+            last = max(starts) + periodToDelta(numperiods-1, timeframe)
+            tj_logger.info("Fetching history for {0} {1} ({2} trades)".format(pair, timeframe, len(group)))
+            history = fetch_range(pair, timeframe, min(starts),
+                                  window_end([last], timeframe))
+            for index, t in group:
+                t.run_trade(expires=expires, mode=mode, history=history)
+                self.__store_outcome(index, t)
+
+        return self.df.loc[sel.index]
+
+    async def arun_all(self, conn, strats=None, expires=1, mode='vectorized', overwrite=False):
+        '''
+        Awaitable version of 'run_all'. The candles for all the trades
+        are requested at the same time through 'conn'. Trades failing to
+        run are reported in self.errors
+
+        Parameters
+        ----------
+        conn : AsyncConnect object
+        strats : str, Optional
+                 See 'run_all'
+        expires : int
+                  See 'run_all'. Default: 1
+        mode : str
+               See 'run_all'. Default: 'vectorized'
+        overwrite : bool
+                    See 'run_all'. Default: False
+
+        Returns
+        -------
+        DataFrame with the trades that were run
+        '''
+        sel = self.__select_torun(strats, overwrite)
+
+        trades = self.__torun_trades(sel)
+        res = await asyncio.gather(*[t.arun_trade(conn, expires=expires, mode=mode) for t in trades],
+                                   return_exceptions=True)
+        self.errors = []
+        for index, t, r in zip(sel.index, trades, res):
+            if isinstance(r, Exception):
+                tj_logger.error("Trade with id: {0} failed: {1}".format(t.id, r))
+                self.errors.append((t.id, "{0}: {1}".format(type(r).__name__, r)))
+                continue
+            self.__store_outcome(index, t)
+
+        return self.df.loc[sel.index]
+
+    def __select_torun(self, strats, overwrite):
+        '''
+        Select the trades that will be run by 'run_all' and
+        add the outcome columns to self.df if not present
+
+        Returns
+        -------
+        DataFrame with the selected rows
+        '''
+        for c in OUTCOME_COLS:
+            if c not in self.df.columns:
+                self.df[c] = np.nan
+            # results are of different types
+            self.df[c] = self.df[c].astype(object)
+
+        sel = self.df
+        if strats is not None:
+            sel = sel[sel['strat'].isin(strats.split(","))]
+        if overwrite is False:
+            sel = sel[sel['outcome'].isnull()]
+
+        return sel
+
+    def __trades(self, df, init=False):
+        '''
+        Create the Trade objects for the rows in 'df' (see Trade.from_columns).
+        'start' is parsed and 'pair' is normalized once per column. The
+        other columns (i.e. 'end') keep the values read from the journal
+
+        Parameters
+        ----------
+        df : DataFrame with rows of self.df
+        init : Bool, Optional
+               See Trade. Default: False
+
+        Returns
+        -------
+        list with Trade objects
+        '''
+        columns = {}
+        if 'pair' not in df.columns:
+            columns['pair'] = df['id'].str.split(r'\.| ', regex=True).str[0]
+        for c in df.columns:
+            columns[c] = df[c]
+        columns['pair'] = columns['pair'].str.replace('/', '_')
+        columns['start'] = pd.to_datetime(df['start'], format='%Y-%m-%d %H:%M:%S').dt.to_pydatetime()
+
+        return Trade.from_columns(columns, init=init)
+
+    def __prepare_indicators(self, trade_list):
+        '''
+        Reserve the time range covering the periods of all the trades
+        for each pair and timeframe, so the indicators (see indicators.py)
+        are calculated once for all of them when first needed
+
+        Parameters
+        ----------
+        trade_list : list with Trade objects
+        '''
+        groups = {}
+        for t in trade_list:
+            groups.setdefault((t.pair, t.timeframe), []).append(t.start)
+        period_range = get_settings().trade_bot.period_range
+        for (pair, timeframe), starts in groups.items():
+            start = min(starts) - periodToDelta(period_range, timeframe)
+            end = min(max(starts) + periodToDelta(1, timeframe),
+                      datetime.now().replace(microsecond=0))
+            INDICATORS.reserve(pair, timeframe, start, end)
+
+    def __torun_trades(self, df):
+        trade_list = self.__trades(df)
+        for t in trade_list:
+            t.outcome = None
+        return trade_list
+
+    def __store_outcome(self, index, t):
+        for c in OUTCOME_COLS:
+            self.df.at[index, c] = getattr(t, c, np.nan)
+
+    def write_tradelist(self, trade_list, sheet_name, sidecar=None, append=False):
         '''
         Write the TradeList to the Excel spreadsheet
-        pointed by the trade_journal
+        pointed by the trade_journal. The worksheet is replaced
+        if it already exists, unless 'append' is True
 
         Parameters
         ----------
         trade_list : List of Trade objects, Required
         sheet_name : worksheet name
+        sidecar : str, Optional
+                  Path to a .csv file the trades will be appended to instead
+                  of the .xlsx file. See JournalWriter.export
+        append : bool, Optional
+                 If True, then the trades are appended to the worksheet
+                 in the columns with the same name. Default: False
 
         Returns
         -------
         Nothing
         '''
-        colnames = CONFIG.get("trade_journal", "colnames").split(",")
-
-        data = []
-        for t in trade_list:
-            row = []
-            for key in colnames:
-                # some keys are not defined for some of the Trade
-                # objects
-                if key in t.__dict__:
-                    row.append(t.__dict__[key])
-                else:
-                    row.append("n.a.")
-            data.append(row)
-
-        df = pd.DataFrame(data, columns=colnames)
-
-        book = load_workbook(self.url)
-        writer = pd.ExcelWriter(self.url, engine='openpyxl')
-        writer.book = book
-        writer.sheets = dict((ws.title, ws) for ws in book.worksheets)
-        tj_logger.info("Creating new worksheet with trades with name: {0}".
-                       format(sheet_name))
-        df.to_excel(writer, sheet_name)
-        writer.save()
+        with JournalWriter(self.url, sheet_name, sidecar=sidecar, append=append) as writer:
+            for t in trade_list:
+                writer.add(t)
@@ -3,9 +3,14 @@ import logging
 import pdb
 import datetime as dt
 
+import numpy as np
+import pandas as pd
+
 from utils import *
 from harea import HArea
-from config import CONFIG
+from config import CONFIG, get_settings
+from indicators import INDICATORS, use_store
+from instrumentation import timed
 from candle.candlelist_utils import *
 from trade import Trade
 
@@ -13,9 +18,12 @@ from trade import Trade
 t_logger = logging.getLogger(__name__)
 t_logger.setLevel(logging.INFO)
 
+@timed('is_entry_onrsi')
 def is_entry_onrsi(trade):
     '''
-    Function to check if tObj.start is on RSI
+    Function to check if tObj.start is on RSI. If [indicators] use_store
+    is True, then the RSI is taken from the precomputed series (see indicators.py)
+    instead of from trade.period
 
     Parameter
     ---------
@@ -27,11 +35,16 @@ def is_entry_onrsi(trade):
     True if tObj.start is on RSI (i.e. RSI>=70 or RSI<=30)
     False otherwise
     '''
-    if trade.period.data['candles'][-1]['rsi'] >= 70 or trade.period.data['candles'][-1]['rsi'] <= 30:
+    if use_store() is True:
+        rsi = INDICATORS.rsi(trade.pair, trade.timeframe, *trade.period_bounds())[-1]
+    else:
+        rsi = trade.period.data['candles'][-1]['rsi']
+    if rsi >= 70 or rsi <= 30:
         return True
     else:
         return False
 
+@timed('get_lasttime')
 def get_lasttime(trade):
         '''
         Function to calculate the last time price has been above/below
@@ -51,16 +64,19 @@ def get_lasttime(trade):
         # instantiate an HArea object representing the self.SR in order to calculate the lasttime
         # price has been above/below SR
         resist = HArea(price=trade.SR,
-                       pips=CONFIG.getint('harea', 'hr_pips'),
+                       pips=get_settings().harea.hr_pips,
                        instrument=trade.pair,
                        granularity=trade.timeframe)
 
         return trade.period.get_lasttime(resist)
 
+@timed('get_max_min_rsi')
 def get_max_min_rsi(trade):
     """
     Function to calculate the max or min RSI for CandleList slice
     going from trade.start-CONFIG.getint('counter', rsi_period') to trade.start.
+    If [indicators] use_store is True, then the RSI is taken from the
+    precomputed series (see indicators.py) instead of from trade.period
 
     Returns
     -------
@@ -69,9 +85,12 @@ def get_max_min_rsi(trade):
     """
     t_logger.debug("Running set_max_min_rsi")
 
-    ix = CONFIG.getint('counter', 'rsi_period')
-    sub_clist = trade.period.data['candles'][-ix:]
-    rsi_list = [x['rsi'] for x in sub_clist]
+    ix = get_settings().counter.rsi_period
+    if use_store() is True:
+        rsi_list = INDICATORS.rsi(trade.pair, trade.timeframe, *trade.period_bounds())[-ix:].tolist()
+    else:
+        sub_clist = trade.period.data['candles'][-ix:]
+        rsi_list = [x['rsi'] for x in sub_clist]
     first = None
     for x in reversed(rsi_list):
         if first is None:
@@ -87,6 +106,7 @@ def get_max_min_rsi(trade):
 
     return round(first, 2)
 
+@timed('calc_trade_session')
 def calc_trade_session(trade):
     '''
     Function to calculate the trade session (European, Asian,
@@ -102,38 +122,94 @@ def calc_trade_session(trade):
     str Comma-separated string with different sessions: i.e. european,asian
                                                         or namerican, etc...
     I will return n.a. if self.entry_time is not defined
+
+    The sessions are the same as the ones calculated by calc_trade_sessions
+    for a column of entry times, but without building a Series for each trade
     '''
     if not hasattr(trade, 'entry_time'):
         return "n.a."
     dtime = dt.datetime.strptime(trade.entry_time, '%Y-%m-%dT%H:%M:%S')
-    # define the different sessions time boundaries
-    a_u2 = dt.time(int(7), int(0), int(0))
-    a_l2 = dt.time(int(0), int(0), int(0))
-    a_u1 = dt.time(int(23), int(59), int(59))
-    a_l1 = dt.time(int(23), int(0), int(0))
-    e_u = dt.time(int(15), int(0), int(0))
-    e_l = dt.time(int(7), int(0), int(0))
-    na_u = dt.time(int(19), int(0), int(0))
-    na_l = dt.time(int(12), int(0), int(0))
-
-    sessions = []
-    session_seen = False
-    if dtime.time() >= a_l1 and dtime.time() <= a_u1:
-        sessions.append('asian')
-        session_seen = True
-    if dtime.time() >= a_l2 and dtime.time() <= a_u2:
-        sessions.append('asian')
-        session_seen = True
-    if dtime.time() >= e_l and dtime.time() <= e_u:
-        sessions.append('european')
-        session_seen = True
-    if dtime.time() >= na_l and dtime.time() <= na_u:
-        sessions.append('namerican')
-        session_seen = True
-    if session_seen is False:
-        sessions.append('nosession')
-    return ",".join(sessions)
+    sessions = get_settings().sessions
+    if sessions.tz:
+        dtime = pd.Timestamp(dtime).tz_localize('UTC').tz_convert(sessions.tz)
+    secs = dtime.hour*3600+dtime.minute*60+dtime.second
+
+    names = []
+    for name, start, end in sessions.windows:
+        if start <= end:
+            inside = start <= secs <= end
+        else:
+            inside = secs >= start or secs <= end
+        if inside:
+            names.append(name)
+
+    return ",".join(names) if names else 'nosession'
+
+def session_windows():
+    '''
+    Function to get the session windows defined in
+    [sessions] windows. i.e. asian=23:00-07:00,european=07:00-15:00
 
+    Returns
+    -------
+    list with (name, start, end) tuples. 'start' and 'end' are
+    seconds from midnight. Windows with start > end go over midnight
+    '''
+    return list(get_settings().sessions.windows)
+
+def calc_trade_sessions(entry_times, windows=None, tz=None):
+    '''
+    Function to calculate the sessions (European, Asian,
+    NAmerican) for a column of entry times
+
+    Parameters
+    ----------
+    entry_times : list, array or Series with datetimes or str (i.e. 2018-12-04T08:00:00)
+    windows : list, Optional
+              (name, start, end) tuples. Both bounds are included
+              Default: session_windows()
+    tz : str, Optional
+         Time zone of the windows (i.e. Europe/London). If defined, then
+         the entry times (UTC) are converted to it, so the windows follow
+         the daylight saving time. Default: [sessions] tz
+
+    Returns
+    -------
+    Series with comma-separated strings with the sessions: i.e. european,namerican
+    'nosession' if not in any session and 'n.a.' if the entry time is not defined
+    '''
+    if windows is None:
+        windows = session_windows()
+    if tz is None:
+        tz = get_settings().sessions.tz
+
+    if not isinstance(entry_times, pd.Series):
+        entry_times = pd.Series(entry_times)
+    times = pd.to_datetime(entry_times, errors='coerce')
+    if tz:
+        times = times.dt.tz_localize('UTC').dt.tz_convert(tz)
+    secs = (times.dt.hour*3600+times.dt.minute*60+times.dt.second).to_numpy(dtype=float, na_value=np.nan)
+
+    # each window sets a bit of the code of each time
+    codes = np.zeros(len(secs), dtype=np.int64)
+    with np.errstate(invalid='ignore'):
+        for bit, (name, start, end) in enumerate(windows):
+            if start <= end:
+                mask = (secs >= start) & (secs <= end)
+            else:
+                mask = (secs >= start) | (secs <= end)
+            codes |= mask.astype(np.int64) << bit
+
+    labels = {}
+    for code in np.unique(codes):
+        names = [name for bit, (name, start, end) in enumerate(windows) if code >> bit & 1]
+        labels[code] = ",".join(names) if names else 'nosession'
+    res = pd.Series(codes, index=times.index).map(labels)
+    res[np.isnan(secs)] = 'n.a.'
+
+    return res
+
+@timed('calc_pips_c_trend')
 def calc_pips_c_trend(trade):
     '''
     Function to calculate the pips_c_trend value.
@@ -189,6 +265,7 @@ def get_trade_type(dt, clObj):
     else:
         raise Exception("Could not guess the file type")
 
+@timed('calc_adr')
 def calc_adr(trade):
     """
     Function to calculate the ATR (avg timeframe rate)
@@ -203,7 +280,7 @@ def calc_adr(trade):
     -------
     float : ATR for selected period
     """
-    delta_period = periodToDelta(CONFIG.getint('trade', 'period_atr'),
+    delta_period = periodToDelta(get_settings().trade.period_atr,
                                  trade.timeframe)
     delta_1 = periodToDelta(1, trade.timeframe)
     start = trade.start - delta_period  # get the start datetime
@@ -213,6 +290,37 @@ def calc_adr(trade):
 
     return calc_atr(c_list)
 
+def add_pips2trade(pair, type, entry, SL, add_pips):
+    '''
+    Function to move the entry and the SL 'add_pips' pips
+    away from the S/R. Used by 'prepare_trade' and by the
+    parameter sweep (see sweep.trade_prices)
+
+    Parameters
+    ----------
+    pair : str, Required
+           Currency pair. i.e. AUD_USD
+    type : str, Required
+           Type of trade. 'short' or 'long'
+    entry : float, Required
+    SL : float, Required
+    add_pips : int, Required
+               Number of pips above/below SL and entry
+
+    Returns
+    -------
+    float : entry
+    float : SL
+    '''
+    if type == 'short':
+        SL = round(add_pips2price(pair, SL, add_pips), 4)
+        entry = round(substract_pips2price(pair, entry, add_pips), 4)
+    elif type == 'long':
+        entry = add_pips2price(pair, entry, add_pips)
+        SL = substract_pips2price(pair, SL, add_pips)
+
+    return entry, SL
+
 def prepare_trade(tb_obj, type, SL, ic, harea_sel, delta, add_pips):
     '''
     Prepare a Trade object
@@ -238,23 +346,16 @@ def prepare_trade(tb_obj, type, SL, ic, harea_sel, delta, add_pips):
     -------
     Trade object
     '''
+    settings = get_settings()
     startO = ic.time + delta
     if type == 'short':
         # entry price will be the low of IC
-        entry_p = getattr(ic, "low{0}".format(CONFIG.get('general', 'bit')))
-        if add_pips is not None:
-            SL = round(add_pips2price(tb_obj.pair,
-                                      SL, add_pips), 4)
-            entry_p = round(substract_pips2price(tb_obj.pair,
-                                                 entry_p, add_pips), 4)
+        entry_p = getattr(ic, "low{0}".format(settings.general.bit))
     elif type == 'long':
         # entry price will be the high of IC
-        entry_p = getattr(ic, "high{0}".format(CONFIG.get('general', 'bit')))
-        if add_pips is not None:
-            entry_p = add_pips2price(tb_obj.pair,
-                                     entry_p, add_pips)
-            SL = substract_pips2price(tb_obj.pair,
-                                      SL, add_pips)
+        entry_p = getattr(ic, "high{0}".format(settings.general.bit))
+    if add_pips is not None:
+        (entry_p, SL) = add_pips2trade(tb_obj.pair, type, entry_p, SL, add_pips)
 
     startO = ic.time+delta
     t = Trade(
@@ -266,7 +367,7 @@ def prepare_trade(tb_obj, type, SL, ic, harea_sel, delta, add_pips):
         entry=entry_p,
         SR=harea_sel.price,
         SL=SL,
-        RR=CONFIG.getfloat('trade_bot', 'RR'),
+        RR=settings.trade_bot.RR,
         strat='counter')
 
     return t
@@ -290,10 +391,11 @@ def adjust_SL(type, clObj, number=7):
     float: adjusted SL
     '''
 
+    bit = get_settings().general.bit
     if type == 'short':
-        part = 'high{0}'.format(CONFIG.get('general', 'bit'))
+        part = 'high{0}'.format(bit)
     elif type == 'long':
-        part = 'low{0}'.format(CONFIG.get('general', 'bit'))
+        part = 'low{0}'.format(bit)
     SL = None
     ix = 0
     for c in reversed(clObj.data['candles']):
@@ -1,7 +1,16 @@
 import datetime
+import numbers
 import re
 import pdb
+from configparser import ConfigParser
+from dataclasses import replace
 from datetime import datetime,timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from config import Settings
+from time_index import TimeIndex
 
 def try_parsing_date(text):
     '''
@@ -19,6 +28,88 @@ def try_parsing_date(text):
             pass
     raise ValueError('no valid date format found')
 
+def candle_time(candle):
+    '''
+    Function to get the datetime of a candle
+    returned by Connect.query
+
+    Parameters
+    ----------
+    candle : dict
+             Candle as returned in the 'candles' list
+
+    Returns
+    -------
+    datetime object
+    '''
+    ctime = candle['time']
+    if isinstance(ctime, datetime):
+        return ctime
+    # i.e. 2017-04-10T21:00:00.000000Z
+    return try_parsing_date(ctime.split('.')[0].rstrip('Z'))
+
+@lru_cache(maxsize=None)
+def pip_size(pair):
+    '''
+    Function to get the pip size of a pair. Results
+    are cached, so the pair is only parsed once
+
+    Parameters
+    ----------
+    pair : str, Required
+           Currency pair. i.e. AUD_USD
+
+    Returns
+    -------
+    int : number of pips per unit of price (100 for JPY pairs, 10000 otherwise)
+    int : number of decimals of a price rounded to pips (2 for JPY pairs, 4 otherwise)
+    '''
+    (first, second) = pair.split("_")
+    if first == 'JPY' or second == 'JPY':
+        return 100, 2
+    return 10000, 4
+
+def pip_sizes(pairs):
+    '''
+    Function to get the pip sizes (see 'pip_size') of an array of pairs
+
+    Parameters
+    ----------
+    pairs : str or list/array of str
+
+    Returns
+    -------
+    int array : number of pips per unit of price
+    int array : number of decimals
+    '''
+    if isinstance(pairs, str):
+        (divisor, round_number) = pip_size(pairs)
+        return np.array([divisor]), np.array([round_number])
+    (uniq, inverse) = np.unique(np.asarray(pairs, dtype=object).astype(str), return_inverse=True)
+    table = np.array([pip_size(p) for p in uniq], dtype=np.int64).reshape(-1, 2)
+    return table[inverse, 0], table[inverse, 1]
+
+def round_prices(prices, round_numbers):
+    '''
+    Function to round each price to its number of decimals
+
+    Parameters
+    ----------
+    prices : float array
+    round_numbers : int array with the decimals (broadcastable to prices)
+
+    Returns
+    -------
+    float array
+    '''
+    prices = np.asarray(prices, dtype=float)
+    round_numbers = np.broadcast_to(round_numbers, prices.shape)
+    rounded = np.empty_like(prices)
+    for n in np.unique(round_numbers):
+        mask = round_numbers == n
+        rounded[mask] = np.round(prices[mask], int(n))
+    return rounded
+
 def calculate_pips(pair, price):
     '''
     Function to calculate the number of pips
@@ -28,24 +119,37 @@ def calculate_pips(pair, price):
     ----------
     pair : str, Required
            Currency pair used in the trade. i.e. AUD_USD
-    price : float
+    price : float (a Python or numpy number)
 
     Returns
     -------
-    float
-          Number of pips
+    str
+          Number of pips with 1 decimal. i.e. '24.2'
     '''
 
-    assert price == float, "Error price needs to be float"
-    pips = None
-    (first, second) = pair.split("_")
-    if first == 'JPY' or second == 'JPY':
-        pips = price * 100
-    else:
-        pips = price * 10000
+    assert isinstance(price, numbers.Real), "Error price needs to be float"
+    (divisor, round_number) = pip_size(pair)
+    pips = price * divisor
 
     return '%.1f' % pips
 
+def calculate_pips_array(pairs, prices):
+    '''
+    Function to calculate the number of pips
+    for an array of prices
+
+    Parameters
+    ----------
+    pairs : str or list/array with the pair of each price
+    prices : list/array of floats
+
+    Returns
+    -------
+    float array with the number of pips rounded to 1 decimal
+    '''
+    (divisors, round_numbers) = pip_sizes(pairs)
+    return np.round(np.asarray(prices, dtype=float)*divisors, 1)
+
 def add_pips2price(pair, price, pips):
     '''
     Function that gets a price value and adds
@@ -63,22 +167,31 @@ def add_pips2price(pair, price, pips):
     -------
     float value
     '''
-
-    (first, second) = pair.split("_")
-    round_number = None
-    divisor = None
-    if first == 'JPY' or second == 'JPY':
-        round_number = 2
-        divisor = 100
-    else:
-        round_number = 4
-        divisor = 10000
+    (divisor, round_number) = pip_size(pair)
     price = round(price, round_number)
 
     iprice = price + (pips / divisor)
 
     return iprice
 
+def add_pips2prices(pairs, prices, pips):
+    '''
+    Function that gets an array of prices and adds
+    a certain number of pips to each price
+
+    Parameters
+    ----------
+    pairs : str or list/array with the pair of each price
+    prices : list/array of floats
+    pips : int or array with the number of pips to increase
+
+    Returns
+    -------
+    float array
+    '''
+    (divisors, round_numbers) = pip_sizes(pairs)
+    return round_prices(prices, round_numbers) + np.asarray(pips)/divisors
+
 def substract_pips2price(pair, price, pips):
     '''
     Function that gets a price value and substracts
@@ -96,22 +209,31 @@ def substract_pips2price(pair, price, pips):
     -------
     float value
     '''
-
-    (first, second) = pair.split("_")
-    round_number = None
-    divisor = None
-    if first == 'JPY' or second == 'JPY':
-        round_number = 2
-        divisor = 100
-    else:
-        round_number = 4
-        divisor = 10000
+    (divisor, round_number) = pip_size(pair)
     price = round(price, round_number)
 
     dprice = price - (pips / divisor)
 
     return dprice
 
+def substract_pips2prices(pairs, prices, pips):
+    '''
+    Function that gets an array of prices and substracts
+    a certain number of pips to each price
+
+    Parameters
+    ----------
+    pairs : str or list/array with the pair of each price
+    prices : list/array of floats
+    pips : int or array with the number of pips to decrease
+
+    Returns
+    -------
+    float array
+    '''
+    (divisors, round_numbers) = pip_sizes(pairs)
+    return round_prices(prices, round_numbers) - np.asarray(pips)/divisors
+
 def periodToDelta(ncandles, timeframe):
     '''
     Function that receives an int representing a number of candles using the 'ncandles' param
@@ -121,7 +243,7 @@ def periodToDelta(ncandles, timeframe):
     ----------
     ncandles: Number of candles for which the timedelta will be retrieved. Required
     timeframe: str, Required
-               Timeframe used for getting the delta object. Possible values are: 2D,D,H12,H10,H8,H4
+               Timeframe used for getting the delta object. Possible values are: 2D,D,H12,H10,H8,H4,M30,M15,...
 
     Returns
     -------
@@ -135,6 +257,8 @@ def periodToDelta(ncandles, timeframe):
         raise Exception("{0} is not valid. Oanda rest service does not take it".format(timeframe))
     elif timeframe=='D':
         delta = timedelta(hours=24 * ncandles)
+    elif timeframe.startswith('M'):
+        delta = timedelta(minutes=int(timeframe[1:]) * ncandles)
     else:
         fgran = timeframe.replace('H', '')
         delta = timedelta(hours=int(fgran) * ncandles)
@@ -154,23 +278,28 @@ def get_ixfromdatetimes_list(datetimes_list, d):
 
     Returns
     -------
-    int with index of the closest datetime to d
+    int with index of the closest datetime to d. If several
+    datetimes are equally close, then the lowest index
     '''
+    return TimeIndex(datetimes_list).nearest(d)
 
-    sel_ix=None
-    diff=None
-    ix=0
-    for ad in datetimes_list:
-        if diff is None:
-            diff=abs(ad-d)
-            sel_ix=ix
-        else:
-            if abs(ad-d)<diff:
-                sel_ix=ix
-                diff=abs(ad-d)
-        ix+=1
+def get_ixfromdatetimes_batch(datetimes_list, ds):
+    '''
+    Function to get the index of the element that is closest
+    to each of the passed datetimes. The list is only indexed once
 
-    return sel_ix
+    Parameters
+    ----------
+    datetimes_list : list
+                     List with datetimes
+    ds : list with datetimes
+
+    Returns
+    -------
+    list with the index of the closest datetime
+    to each datetime in ds
+    '''
+    return TimeIndex(datetimes_list).nearest_batch(ds).tolist()
 
 def pairwise(iterable):
     "s -> (s0, s1), (s2, s3), (s4, s5), ..."
@@ -181,28 +310,40 @@ def correct_timeframe(settings, timeframe):
     """
     This utility function is used for correcting
     all the pips-related settings depending
-    on the selected timeframe
+    on the selected timeframe. 'settings' is not
+    modified, a corrected copy is returned instead
 
     Parameters
     ----------
-    settings: ConfigParser object
+    settings: ConfigParser or config.Settings object
     timeframe : D,H12,H8,4
 
     Returns
     -------
-    settings : ConfigParser object timeframe corrected
+    settings : ConfigParser or config.Settings object timeframe corrected
     """
     timeframe = int(timeframe.replace('H', ''))
     ratio = round(timeframe/24, 2)
 
+    def correct(value):
+        return int(round(ratio*int(value), 0))
+
+    if isinstance(settings, Settings):
+        # [trade] hr_pips is not corrected
+        return replace(settings,
+                       harea=replace(settings.harea, hr_pips=correct(settings.harea.hr_pips)),
+                       trade_bot=replace(settings.trade_bot, add_pips=correct(settings.trade_bot.add_pips)))
+
     p = re.compile('.*pips')
 
-    for section_name in settings.sections():
-        for key, value in settings.items(section_name):
+    corrected = ConfigParser()
+    corrected.read_dict({section_name: dict(settings.items(section_name, raw=True))
+                         for section_name in settings.sections()})
+    for section_name in corrected.sections():
+        for key, value in corrected.items(section_name, raw=True):
             if section_name == 'trade' and key == 'hr_pips':
                 continue
             if p.match(key):
-                new_pips = int(round(ratio*int(value), 0))
-                settings.set(section_name, key, str(new_pips))
+                corrected.set(section_name, key, str(correct(value)))
 
-    return settings
+    return corrected